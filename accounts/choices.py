@@ -14,6 +14,11 @@ class AccountType(models.TextChoices):
     SUPPLIER = "SUPPLIER", "Supplier"
 
 
+class SearchRollupPeriodChoice(models.TextChoices):
+    HOUR = "HOUR", "Hour"
+    DAY = "DAY", "Day"
+
+
 class TimeZoneChoice(models.TextChoices):
     UTC = "UTC", "Coordinate Universal Time"
     EST = "EST", "Eastern Standard Time"
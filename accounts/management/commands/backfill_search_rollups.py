@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from utils.search_utils.search_utils import SearchUtils
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the hourly and daily search rollups of searches made before the "
+        "rollups existed from SearchHistory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of search history rows processed per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        backfilled = SearchUtils.backfill_rollups(batch_size=kwargs["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Added {backfilled} searches to the search rollups")
+        )
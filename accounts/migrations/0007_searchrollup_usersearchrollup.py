@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_alter_deliveryaddress_options_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("query", models.CharField(max_length=255)),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("HOUR", "Hour"), ("DAY", "Day")], max_length=10
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("search_count", models.IntegerField(default=0)),
+                ("unique_users", models.IntegerField(default=0)),
+                ("last_searched", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["period", "bucket"],
+                        name="accounts_se_period_af9af5_idx",
+                    )
+                ],
+                "unique_together": {("query", "period", "bucket")},
+            },
+        ),
+        migrations.CreateModel(
+            name="UserSearchRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("query", models.CharField(max_length=255)),
+                ("bucket", models.DateTimeField()),
+                ("search_count", models.IntegerField(default=0)),
+                ("last_searched", models.DateTimeField(blank=True, null=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "bucket"], name="accounts_us_user_id_ca0b4d_idx"
+                    )
+                ],
+                "unique_together": {("user", "query", "bucket")},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_searchrollup_usersearchrollup"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="searchhistory",
+            name="last_searched",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="searchhistory",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -9,7 +9,7 @@ from django.contrib.auth.models import (
 NULL = {"blank": True, "null": True}
 
 from phonenumber_field.modelfields import PhoneNumberField
-from accounts.choices import GenderChoice, AccountType
+from accounts.choices import GenderChoice, AccountType, SearchRollupPeriodChoice
 from django.utils import timezone
 
 
@@ -134,18 +134,49 @@ class Verification(models.Model):
 class SearchHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     query = models.CharField(max_length=255)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so flushed searches keep the time they were searched at
+    timestamp = models.DateTimeField(default=timezone.now)
     # result_count = models.IntegerField(null=True, blank=True)
     search_type = models.CharField(max_length=100, null=True, blank=True)
     deleted = models.BooleanField(default=False)
     search_count = models.IntegerField(default=1)
     search_frequency = models.IntegerField(default=1)
-    last_searched = models.DateTimeField(auto_now=True)
+    # Not auto_now, for the same reason
+    last_searched = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-timestamp"]
 
 
+class SearchRollup(models.Model):
+    """Searches per query across all users, per hour or day."""
+
+    query = models.CharField(max_length=255)
+    period = models.CharField(max_length=10, choices=SearchRollupPeriodChoice.choices)
+    bucket = models.DateTimeField()
+    search_count = models.IntegerField(default=0)
+    unique_users = models.IntegerField(default=0)
+    last_searched = models.DateTimeField(**NULL)
+
+    class Meta:
+        unique_together = ["query", "period", "bucket"]
+        indexes = [models.Index(fields=["period", "bucket"])]
+
+
+class UserSearchRollup(models.Model):
+    """Searches per query of a single user, per hour."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    query = models.CharField(max_length=255)
+    bucket = models.DateTimeField()
+    search_count = models.IntegerField(default=0)
+    last_searched = models.DateTimeField(**NULL)
+
+    class Meta:
+        unique_together = ["user", "query", "bucket"]
+        indexes = [models.Index(fields=["user", "bucket"])]
+
+
 class DeliveryAddress(models.Model):
     ADDRESS_TYPES = [
         ('home', 'Home'),
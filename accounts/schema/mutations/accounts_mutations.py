@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 
 import graphene
-from django.core.cache import cache
 from django.db.models import Q
 from django.utils import timezone
 from django_graphql_ratelimit import ratelimit
@@ -24,6 +23,7 @@ from accounts.schema.inputs.accounts_inputs import ProfilePictureInputType
 from accounts.schema.types.accounts_type import UserType, DeliveryAddressType
 from security.inputs.security_inputs import SmsActionChoicesEnum
 from utils.security.otp_service import OTPManager
+from utils.security.token_revocation import revoked_tokens
 
 
 class LogoutMutation(graphene.Mutation):
@@ -50,10 +50,10 @@ class LogoutMutation(graphene.Mutation):
                     payload = jwt_decode(token)
                     exp = payload.get("exp", 0)
                     current_time = datetime.utcnow().timestamp()
-                    ttl = exp - current_time
 
-                    # Blacklist access token
-                    cache.set(f"blacklisted_token:{token}", True, timeout=ttl)
+                    # Blacklist access token until it expires
+                    if exp > current_time:
+                        revoked_tokens.revoke(token, exp)
 
             if refresh_token:
                 refresh_token_obj = RefreshToken.objects.filter(
@@ -1,3 +1,360 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.choices import SearchRollupPeriodChoice
+from accounts.models import SearchHistory, SearchRollup, User, UserSearchRollup
+from products.models import Product
+from src.middleware import JWTBlacklistMiddleware
+from src.schemas import schema
+from utils.account_utils.presence_service import PresenceService
+from utils.non_modular_utils.write_buffer import get_write_buffer
+from utils.search_utils.search_utils import SearchUtils
+from utils.search_utils.trending_searches import SpaceSavingSketch, TrendingSearches
+from utils.security.token_revocation import RevokedTokens
+
+
+class FakeSortedSetRedis:
+    """Just enough of the Redis client for `RevokedTokens`."""
+
+    def __init__(self):
+        self.members = {}
+
+    def pipeline(self):
+        return self
+
+    def zadd(self, name, mapping):
+        self.members.update(mapping)
+
+    def zremrangebyscore(self, name, minimum, maximum):
+        pass
+
+    def execute(self):
+        pass
+
+    def zrangebyscore(self, name, minimum, maximum, withscores=False):
+        return [
+            (member.encode(), score)
+            for member, score in sorted(self.members.items(), key=lambda item: item[1])
+            if score >= minimum
+        ]
+
+
+@override_settings(REVOKED_TOKENS_SYNC_INTERVAL=3600)
+class RevokedTokensTestCase(TestCase):
+    def setUp(self):
+        self.redis = FakeSortedSetRedis()
+        patcher = mock.patch.object(
+            RevokedTokens, "client", new_callable=mock.PropertyMock
+        )
+        patcher.start().return_value = self.redis
+        self.addCleanup(patcher.stop)
+
+    def test_revocations_reach_other_processes_on_sync(self):
+        revoking, other = RevokedTokens(), RevokedTokens()
+        other.sync()
+
+        revoking.revoke("token", expires_at=4102444800)
+        self.assertTrue(revoking.is_revoked("token"))
+        # Within the sync interval the other process answers from memory
+        self.assertFalse(other.is_revoked("token"))
+
+        other.sync(force=True)
+        self.assertTrue(other.is_revoked("token"))
+        self.assertFalse(other.is_revoked("another-token"))
+
+    def test_expired_revocations_are_dropped(self):
+        revoked_tokens = RevokedTokens()
+        revoked_tokens.revoke("token", expires_at=1)
+        self.assertFalse(revoked_tokens.is_revoked("token"))
+
+    def test_token_is_checked_once_per_request(self):
+        seller = User.objects.create(
+            username="seller", email="seller@example.com", first_name="Seller"
+        )
+        for index in range(5):
+            Product.objects.create(
+                name=f"Product {index}",
+                seller=seller,
+                description="Description",
+                price=index,
+            )
+
+        request = RequestFactory().post("/graphql/", HTTP_AUTHORIZATION="Bearer token")
+        request.user = AnonymousUser()
+
+        with mock.patch(
+            "src.middleware.revoked_tokens.is_revoked", return_value=False
+        ) as is_revoked:
+            result = schema.execute(
+                "{ allProducts { id name price } }",
+                context_value=request,
+                middleware=[JWTBlacklistMiddleware()],
+            )
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data["allProducts"]), 5)
+        is_revoked.assert_called_once_with("token")
+
+
+@override_settings(
+    WRITE_BUFFER_BACKEND="memory",
+    LAST_SEEN_THROTTLE=0,
+    LAST_SEEN_FLUSH_INTERVAL=3600,
+    ONLINE_NOW_WINDOW=300,
+)
+class PresenceTestCase(TestCase):
+    def setUp(self):
+        get_write_buffer().clear()
+        self.users = [
+            User.objects.create(
+                username=f"user-{index}",
+                email=f"user-{index}@example.com",
+                first_name="User",
+            )
+            for index in range(3)
+        ]
+
+    def test_last_seen_is_flushed_in_one_update(self):
+        for user in self.users[:2]:
+            PresenceService.record_seen(user.id)
+
+        self.assertIsNone(User.objects.get(id=self.users[0].id).last_seen)
+        with self.assertNumQueries(1):
+            self.assertEqual(PresenceService.flush_last_seen(), 2)
+
+        last_seen = dict(User.objects.values_list("id", "last_seen"))
+        self.assertIsNotNone(last_seen[self.users[0].id])
+        self.assertIsNotNone(last_seen[self.users[1].id])
+        self.assertIsNone(last_seen[self.users[2].id])
+
+    def test_failed_flush_keeps_the_drained_activity(self):
+        PresenceService.record_seen(self.users[0].id)
+
+        with mock.patch.object(User.objects, "filter", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                PresenceService.flush_last_seen()
+
+        self.assertEqual(PresenceService.flush_last_seen(), 1)
+        self.assertIsNotNone(User.objects.get(id=self.users[0].id).last_seen)
+
+    def test_presence_is_answered_without_the_database(self):
+        PresenceService.record_seen(self.users[0].id)
+
+        with self.assertNumQueries(0):
+            online = PresenceService.get_online_user_ids(
+                [user.id for user in self.users]
+            )
+        self.assertEqual(online, {self.users[0].id})
+
+        with override_settings(ONLINE_NOW_WINDOW=-1):
+            self.assertFalse(PresenceService.is_online(self.users[0].id))
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory", SEARCH_HISTORY_FLUSH_INTERVAL=3600)
+class SearchHistoryTestCase(TestCase):
+    def setUp(self):
+        get_write_buffer().clear()
+        self.user = User.objects.create(
+            username="user", email="user@example.com", first_name="User"
+        )
+
+    def test_searches_are_buffered_and_upserted(self):
+        with self.assertNumQueries(0):
+            for query in ("red dress", "red dress", "jeans:blue"):
+                SearchUtils.save_search_query(self.user, query, "PRODUCT")
+
+        self.assertEqual(SearchUtils.flush_search_history(), 2)
+        SearchUtils.save_search_query(self.user, "red dress", "PRODUCT")
+        self.assertEqual(SearchUtils.flush_search_history(), 1)
+
+        history = dict(
+            SearchHistory.objects.filter(user=self.user).values_list(
+                "query", "search_count"
+            )
+        )
+        self.assertEqual(history, {"red dress": 3, "jeans:blue": 1})
+        self.assertEqual(
+            SearchHistory.objects.get(query="red dress").search_frequency, 300
+        )
+
+    def test_failed_flush_keeps_the_drained_searches(self):
+        SearchUtils.save_search_query(self.user, "red dress", "PRODUCT")
+
+        with mock.patch.object(
+            SearchUtils, "write_searches", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                SearchUtils.flush_search_history()
+        SearchUtils.save_search_query(self.user, "red dress", "PRODUCT")
+
+        self.assertEqual(SearchUtils.flush_search_history(), 1)
+        self.assertEqual(SearchHistory.objects.get(user=self.user).search_count, 2)
+
+    def test_frequency_only_counts_searches_of_the_window(self):
+        now = timezone.now()
+        SearchUtils.write_searches(
+            {(self.user.id, "red dress"): (6, now - timedelta(days=90), "PRODUCT")}
+        )
+        search_history = SearchHistory.objects.get(user=self.user)
+
+        SearchUtils.write_searches({(self.user.id, "red dress"): (3, now, "PRODUCT")})
+        search_history.refresh_from_db()
+        self.assertEqual(search_history.search_count, 9)
+        # 3 searches over the last 30 days
+        self.assertEqual(search_history.search_frequency, 10)
+
+        # A query first searched yesterday averages over two days
+        self.assertEqual(
+            SearchUtils.get_search_frequency(6, now - timedelta(days=1), now), 300
+        )
+
+    def test_new_searches_keep_their_search_time(self):
+        searched_at = timezone.now() - timedelta(hours=1)
+        SearchUtils.write_searches(
+            {
+                (self.user.id, "red dress"): (1, searched_at, "PRODUCT"),
+                (self.user.id, "jeans"): (1, searched_at + timedelta(minutes=5), None),
+            }
+        )
+
+        self.assertEqual(
+            list(
+                SearchHistory.objects.values_list("query", "timestamp", "last_searched")
+            ),
+            [
+                (
+                    "jeans",
+                    searched_at + timedelta(minutes=5),
+                    searched_at + timedelta(minutes=5),
+                ),
+                ("red dress", searched_at, searched_at),
+            ],
+        )
+
+    @override_settings(SEARCH_HISTORY_FLUSH_INTERVAL=0)
+    def test_failing_to_save_a_search_does_not_fail_it(self):
+        with mock.patch.object(
+            SearchUtils, "write_searches", side_effect=DatabaseError
+        ), self.assertLogs("utils.search_utils.search_utils", "ERROR"):
+            SearchUtils.save_search_query(self.user, "red dress", "PRODUCT")
+
+        self.assertEqual(SearchUtils.flush_search_history(), 1)
+
+
+class SearchRollupTestCase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create(
+                username=f"user-{index}",
+                email=f"user-{index}@example.com",
+                first_name="User",
+            )
+            for index in range(2)
+        ]
+        self.now = timezone.now().replace(minute=30)
+
+    def search(self, user, query, count, searched_at):
+        SearchUtils.write_searches({(user.id, query): (count, searched_at, "PRODUCT")})
+
+    def test_rollups_count_searches_and_unique_users(self):
+        self.search(self.users[0], "dress", 2, self.now)
+        self.search(self.users[0], "dress", 1, self.now)
+        self.search(self.users[1], "dress", 1, self.now)
+        self.search(self.users[1], "jeans", 1, self.now - timedelta(hours=1))
+
+        hourly = SearchRollup.objects.get(
+            query="dress",
+            period=SearchRollupPeriodChoice.HOUR,
+            bucket=SearchUtils.get_bucket(self.now, SearchRollupPeriodChoice.HOUR),
+        )
+        self.assertEqual((hourly.search_count, hourly.unique_users), (4, 2))
+        self.assertEqual(
+            UserSearchRollup.objects.get(
+                user=self.users[0], query="dress"
+            ).search_count,
+            3,
+        )
+
+        top_searches = list(SearchUtils.get_top_searches_by_frequency(days=1))
+        self.assertEqual(top_searches[0]["query"], "dress")
+        self.assertEqual(top_searches[0]["total_searches"], 4)
+        self.assertEqual(top_searches[0]["unique_users"], 2)
+
+    def test_user_search_patterns_come_from_rollups(self):
+        self.search(self.users[0], "dress", 2, self.now)
+        self.search(self.users[0], "jeans", 1, self.now)
+
+        patterns = SearchUtils.get_user_search_patterns(self.users[0])
+        self.assertEqual(patterns["total_searches"], 3)
+        self.assertEqual(patterns["unique_queries"], 2)
+        self.assertEqual(patterns["top_queries"][0]["query"], "dress")
+        self.assertEqual(
+            list(patterns["search_times"]), [{"hour": self.now.hour, "count": 3}]
+        )
+
+    def test_backfill_buckets_searches_made_before_the_rollups(self):
+        first_searched = self.now - timedelta(days=3)
+        for user in self.users:
+            SearchHistory.objects.create(user=user, query="dress", search_count=3)
+        SearchHistory.objects.update(
+            timestamp=first_searched, last_searched=self.now - timedelta(days=1)
+        )
+        # A later search is rolled up as it is written
+        self.search(self.users[0], "dress", 1, self.now)
+        SearchHistory.objects.filter(user=self.users[0]).update(search_count=4)
+
+        self.assertEqual(SearchUtils.backfill_rollups(batch_size=1), 6)
+        self.assertEqual(SearchUtils.backfill_rollups(), 0)
+
+        def hour(moment):
+            return SearchUtils.get_bucket(moment, SearchRollupPeriodChoice.HOUR)
+
+        hourly = {
+            bucket: (search_count, unique_users)
+            for bucket, search_count, unique_users in SearchRollup.objects.filter(
+                query="dress", period=SearchRollupPeriodChoice.HOUR
+            ).values_list("bucket", "search_count", "unique_users")
+        }
+        # The user who searched since only has their other searches bucketed
+        # before the rollups started
+        self.assertEqual(
+            hourly,
+            {
+                hour(first_searched): (2, 2),
+                hour(self.now - timedelta(days=1)): (2, 1),
+                hour(self.now - timedelta(hours=1)): (2, 1),
+                hour(self.now): (1, 1),
+            },
+        )
+        self.assertEqual(
+            SearchUtils.get_user_search_patterns(self.users[0])["total_searches"], 4
+        )
+
+
+class TrendingSearchesTestCase(TestCase):
+    def test_sketch_keeps_heavy_hitters(self):
+        sketch = SpaceSavingSketch(capacity=3)
+        for query in ["a"] * 10 + ["b"] * 5 + ["c", "d", "e", "f"]:
+            sketch.add(query)
+
+        self.assertEqual(sketch.counts["a"], 10)
+        self.assertEqual(sketch.counts["b"], 5)
+        self.assertEqual(len(sketch.counts), 3)
+
+    def test_previous_hour_fades_out_of_the_window(self):
+        trending = TrendingSearches()
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for _ in range(10):
+            trending.add("Dress", now=start)
+        trending.add("jeans", now=start + timedelta(hours=1))
+
+        self.assertEqual(
+            trending.top(now=start + timedelta(hours=1, minutes=30)),
+            [("dress", 5), ("jeans", 1)],
+        )
+        self.assertEqual(trending.top(now=start + timedelta(hours=3)), [])
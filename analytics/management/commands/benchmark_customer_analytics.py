@@ -0,0 +1,233 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User
+from analytics.models import CustomerAnalytics
+from orders.models import Order, OrderItem, Wishlist
+from products.models import Product, ProductView
+from reviews.models import Review
+from utils.analytics_utils.customer_analytics_service import CustomerAnalyticsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-customer CustomerAnalytics refresh against the bulk "
+        "refresher on seeded customers. Most customers place a few orders, a "
+        "few business buyers place hundreds. The per-customer refresh is timed "
+        "on the business buyers and a sample of the others, and extrapolated. "
+        "Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=100_000)
+        parser.add_argument(
+            "--business-buyers",
+            type=int,
+            default=20,
+            help="Customers with hundreds of orders",
+        )
+        parser.add_argument(
+            "--sample",
+            type=int,
+            default=500,
+            help="Regular customers timed with the per-customer refresh",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of customers per bulk refresh batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            started = time.perf_counter()
+            customers = self.seed(kwargs["customers"], kwargs["business_buyers"])
+            self.stdout.write(
+                f"Seeded {len(customers)} customers in "
+                f"{time.perf_counter() - started:.1f} s"
+            )
+            CustomerAnalytics.objects.bulk_create(
+                [CustomerAnalytics(user_id=user_id) for user_id in customers],
+                batch_size=5000,
+            )
+
+            # Business buyers come first
+            business_buyers = customers[: kwargs["business_buyers"]]
+            regular = customers[kwargs["business_buyers"] :]
+            estimate = 0
+            for label, sample, count in [
+                ("business buyer", business_buyers, len(business_buyers)),
+                ("regular", regular[: kwargs["sample"]], len(regular)),
+            ]:
+                rows = CustomerAnalytics.objects.filter(
+                    user_id__in=sample
+                ).select_related("user")
+                queries = []
+                with connection.execute_wrapper(self.count_queries(queries)):
+                    started = time.perf_counter()
+                    for row in rows:
+                        self.legacy_update_analytics(row)
+                    elapsed = time.perf_counter() - started
+                estimate += elapsed / len(sample) * count
+                self.stdout.write(
+                    f"  {label:<16} {elapsed / len(sample) * 1000:8.2f} ms and "
+                    f"{len(queries) / len(sample):6.1f} queries per customer"
+                )
+            self.stdout.write(
+                f"  per-customer refresh of all customers: ~{estimate:.0f} s"
+            )
+
+            queries = []
+            with connection.execute_wrapper(self.count_queries(queries)):
+                started = time.perf_counter()
+                CustomerAnalyticsService.refresh(customers, kwargs["batch_size"])
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  bulk refresh of all customers: {elapsed:.0f} s in "
+                f"{len(queries)} queries"
+            )
+
+            transaction.set_rollback(True)
+
+    def count_queries(self, queries):
+        def wrapper(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        return wrapper
+
+    def seed(self, customer_count, business_buyers):
+        seller = User.objects.create(
+            username="analytics-benchmark",
+            email="analytics-benchmark@example.com",
+            first_name="Benchmark",
+        )
+        Product.objects.bulk_create(
+            Product(
+                name=f"Product {i}",
+                seller=seller,
+                description="",
+                price=random.randint(1, 500),
+            )
+            for i in range(1000)
+        )
+        product_ids = list(
+            Product.objects.filter(seller=seller).values_list("id", flat=True)
+        )
+
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f"analytics-benchmark-{i}",
+                    email=f"analytics-benchmark-{i}@example.com",
+                    first_name="Benchmark",
+                    last_login=timezone.now(),
+                )
+                for i in range(customer_count)
+            ),
+            batch_size=5000,
+        )
+        customers = list(
+            User.objects.filter(username__startswith="analytics-benchmark-")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        orders, views, wishlists, reviews = [], [], [], []
+        for position, customer_id in enumerate(customers):
+            order_count = (
+                random.randint(200, 400)
+                if position < business_buyers
+                else random.randint(0, 4)
+            )
+            for _ in range(order_count):
+                total = Decimal(random.randint(10, 1000))
+                orders.append(
+                    Order(
+                        order_number=f"BENCHMARK-{len(orders)}",
+                        customer_id=customer_id,
+                        status="delivered",
+                        subtotal=total,
+                        total_amount=total,
+                    )
+                )
+            for product_id in random.sample(product_ids, random.randint(0, 5)):
+                views.append(
+                    ProductView(product_id=product_id, viewed_by_id=customer_id)
+                )
+            for product_id in random.sample(product_ids, random.randint(0, 2)):
+                wishlists.append(Wishlist(product_id=product_id, user_id=customer_id))
+            if order_count and random.random() < 0.3:
+                reviews.append(
+                    Review(
+                        product_id=random.choice(product_ids),
+                        user_id=customer_id,
+                        rating=random.randint(1, 5),
+                    )
+                )
+
+        Order.objects.bulk_create(orders, batch_size=5000)
+        ProductView.objects.bulk_create(views, batch_size=5000)
+        Wishlist.objects.bulk_create(wishlists, batch_size=5000)
+        Review.objects.bulk_create(reviews, batch_size=5000)
+
+        items = []
+        for order_id in Order.objects.filter(
+            order_number__startswith="BENCHMARK-"
+        ).values_list("id", flat=True):
+            for product_id in random.sample(product_ids, random.randint(1, 3)):
+                items.append(
+                    OrderItem(
+                        order_id=order_id,
+                        product_id=product_id,
+                        quantity=1,
+                        unit_price=10,
+                        total_price=10,
+                        product_name="Product",
+                    )
+                )
+        OrderItem.objects.bulk_create(items, batch_size=5000)
+
+        return customers
+
+    def legacy_update_analytics(self, analytics):
+        """The row-by-row CustomerAnalytics.update_analytics this replaced."""
+        orders = Order.objects.filter(customer=analytics.user)
+        analytics.total_orders = orders.count()
+        analytics.total_spent = sum(order.total_amount for order in orders)
+        analytics.average_order_value = (
+            analytics.total_spent / analytics.total_orders
+            if analytics.total_orders > 0
+            else 0
+        )
+
+        analytics.total_products_viewed = ProductView.objects.filter(
+            viewed_by=analytics.user
+        ).count()
+        analytics.total_products_purchased = sum(
+            order.items.count() for order in orders
+        )
+        analytics.total_products_wishlisted = Wishlist.objects.filter(
+            user=analytics.user
+        ).count()
+
+        reviews = Review.objects.filter(user=analytics.user)
+        analytics.total_reviews_given = reviews.count()
+        if reviews.exists():
+            analytics.average_rating_given = (
+                sum(review.rating for review in reviews) / reviews.count()
+            )
+
+        analytics.last_login = analytics.user.last_login
+        if analytics.user.last_login:
+            analytics.days_since_last_order = (
+                timezone.now() - analytics.user.last_login
+            ).days
+
+        analytics.save()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from utils.analytics_utils.customer_analytics_service import CustomerAnalyticsService
+
+
+class Command(BaseCommand):
+    help = "Recompute the analytics of every customer with grouped queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of customers processed per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        refreshed = CustomerAnalyticsService.refresh(batch_size=kwargs["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed the analytics of {refreshed} customers")
+        )
@@ -1,5 +1,4 @@
 from django.db import models
-from django.utils import timezone
 from accounts.models import User
 from products.models import Product
 from orders.models import Order
@@ -40,29 +39,11 @@ class CustomerAnalytics(models.Model):
     
     def update_analytics(self):
         """Update all analytics data for this customer"""
-        # Order statistics
-        orders = Order.objects.filter(customer=self.user)
-        self.total_orders = orders.count()
-        self.total_spent = sum(order.total_amount for order in orders)
-        self.average_order_value = self.total_spent / self.total_orders if self.total_orders > 0 else 0
-        
-        # Product statistics
-        self.total_products_viewed = ProductView.objects.filter(viewed_by=self.user).count()
-        self.total_products_purchased = sum(
-            order.items.count() for order in orders
-        )
-        self.total_products_wishlisted = Wishlist.objects.filter(user=self.user).count()
-        
-        # Review statistics
-        reviews = Review.objects.filter(user=self.user)
-        self.total_reviews_given = reviews.count()
-        if reviews.exists():
-            self.average_rating_given = sum(review.rating for review in reviews) / reviews.count()
-        
-        # Activity statistics
-        self.last_login = self.user.last_login
-        if self.user.last_login:
-            self.days_since_last_order = (timezone.now() - self.user.last_login).days
+        from utils.analytics_utils.customer_analytics_service import CustomerAnalyticsService
+
+        metrics = CustomerAnalyticsService.compute_metrics([self.user_id])
+        for field, value in metrics[self.user_id].items():
+            setattr(self, field, value)
         
         self.save()
 
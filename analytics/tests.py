@@ -0,0 +1,95 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from analytics.models import CustomerAnalytics
+from orders.models import Order, OrderItem, Wishlist
+from products.models import Product, ProductView
+from reviews.models import Review
+from utils.analytics_utils.customer_analytics_service import CustomerAnalyticsService
+
+
+class CustomerAnalyticsTestCase(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create(
+            username="seller", email="seller@example.com", first_name="Seller"
+        )
+        self.buyer = User.objects.create(
+            username="buyer",
+            email="buyer@example.com",
+            first_name="Buyer",
+            last_login=timezone.now(),
+        )
+        self.idle = User.objects.create(
+            username="idle", email="idle@example.com", first_name="Idle"
+        )
+        product = Product.objects.create(
+            name="Product", seller=self.seller, description="", price=10
+        )
+
+        for index, total in enumerate([30, 50]):
+            order = Order.objects.create(
+                order_number=f"ORDER-{index}",
+                customer=self.buyer,
+                subtotal=total,
+                total_amount=total,
+            )
+            for _ in range(2):
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=1, unit_price=total
+                )
+        Order.objects.filter(order_number="ORDER-1").update(
+            created_at=timezone.now() - timedelta(days=3)
+        )
+        Order.objects.filter(order_number="ORDER-0").update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        ProductView.objects.create(product=product, viewed_by=self.buyer)
+        Wishlist.objects.create(product=product, user=self.buyer)
+        Review.objects.create(product=product, user=self.buyer, rating=4)
+        other_product = Product.objects.create(
+            name="Other product", seller=self.seller, description="", price=20
+        )
+        Review.objects.create(product=other_product, user=self.buyer, rating=5)
+
+    def test_refresh_computes_every_customer_in_bulk(self):
+        # The user ids, one grouped query per source and the upsert
+        with self.assertNumQueries(8):
+            self.assertEqual(CustomerAnalyticsService.refresh(batch_size=10), 3)
+
+        analytics = CustomerAnalytics.objects.get(user=self.buyer)
+        self.assertEqual(analytics.total_orders, 2)
+        self.assertEqual(analytics.total_spent, Decimal("80.00"))
+        self.assertEqual(analytics.average_order_value, Decimal("40.00"))
+        self.assertEqual(analytics.total_products_viewed, 1)
+        self.assertEqual(analytics.total_products_purchased, 4)
+        self.assertEqual(analytics.total_products_wishlisted, 1)
+        self.assertEqual(analytics.total_reviews_given, 2)
+        self.assertEqual(analytics.average_rating_given, Decimal("4.50"))
+        self.assertEqual(analytics.days_since_last_order, 3)
+        self.assertEqual(analytics.last_login, self.buyer.last_login)
+
+        idle = CustomerAnalytics.objects.get(user=self.idle)
+        self.assertEqual(idle.total_orders, 0)
+        self.assertIsNone(idle.days_since_last_order)
+
+        Order.objects.create(
+            order_number="ORDER-2", customer=self.idle, subtotal=20, total_amount=20
+        )
+        CustomerAnalyticsService.refresh([self.idle.id])
+        idle.refresh_from_db()
+        self.assertEqual(idle.total_orders, 1)
+        self.assertEqual(idle.days_since_last_order, 0)
+
+    def test_update_analytics_matches_the_bulk_refresh(self):
+        analytics = CustomerAnalytics.objects.create(user=self.buyer)
+
+        with self.assertNumQueries(7):
+            analytics.update_analytics()
+
+        analytics.refresh_from_db()
+        self.assertEqual(analytics.total_spent, Decimal("80.00"))
+        self.assertEqual(analytics.total_products_purchased, 4)
@@ -21,7 +21,7 @@ from utils.jobs.base import only_one, BaseTaskWithRetry
 class CreateNotification(object):
 
     @shared_task(bind=True, base=BaseTaskWithRetry, name="create_notification")
-    @only_one
+    @only_one(key="user_id")
     @staticmethod
     def create_notification(
         self,
@@ -7,12 +7,10 @@ from notifications.schema.types.notification_types import (
 
 from graphql_jwt.decorators import login_required
 
-from utils.non_modular_utils.database_utils import DatabaseUtil
+from utils.non_modular_utils.database_utils import DatabaseUtil, PaginationContext
 
 
 class Query(graphene.ObjectType):
-    pagination_result = None
-
     notifications = graphene.List(
         NotificationType,
         page_count=graphene.Int(),
@@ -36,17 +34,14 @@ class Query(graphene.ObjectType):
         #     )
 
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            notifications, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "notifications", notifications, page_count, page_number
         )
-        Query.pagination_result = (result, total_pages, total_items)
-        return result
+        return pagination.items
 
     @login_required
     def resolve_notifications_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items("notifications")
 
     @login_required
     def resolve_notification_preference(self, info):
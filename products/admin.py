@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from products.models import Category, rebuild_category_tree
+from utils.product_utils.reference_data import invalidate_reference_data
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ["full_path", "slug"]
+    search_fields = ["name", "slug"]
+    readonly_fields = ["full_path", "depth", "has_children"]
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip Category.delete, so rematerialize the tree
+        super().delete_queryset(request, queryset)
+        rebuild_category_tree()
+        invalidate_reference_data()
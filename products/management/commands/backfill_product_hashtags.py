@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from utils.product_utils.product_utils import ProductUtils
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hashtag index (ProductHashtag) from Product.hashtags"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of products indexed per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        products = Product.objects.only("id", "hashtags").order_by("id")
+
+        indexed, postings, last_id = 0, 0, 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            postings += ProductUtils.index_hashtags(batch)
+            indexed += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Indexed {indexed} products")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {postings} hashtags of {indexed} products")
+        )
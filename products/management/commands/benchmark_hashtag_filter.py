@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User
+from products.models import Product
+from utils.product_utils.product_utils import ProductUtils
+from utils.utils import get_product_ids_with_hashtags
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare hashtag filtering over the Product.hashtags JSON column against "
+        "the hashtag index. Products are generated inside a transaction that is "
+        "rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1_000_000],
+            help="Catalog sizes to benchmark",
+        )
+        parser.add_argument(
+            "--vocabulary",
+            type=int,
+            default=5000,
+            help="Number of distinct hashtags",
+        )
+        parser.add_argument(
+            "--page-count", type=int, default=50, help="Products per page"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per measurement"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of products inserted per bulk_create",
+        )
+
+    def handle(self, *args, **kwargs):
+        tags = [f"#tag{index}" for index in range(kwargs["vocabulary"])]
+        # A few popular tags and a long tail, like real hashtags
+        weights = [1 / (rank + 1) for rank in range(len(tags))]
+
+        for size in kwargs["sizes"]:
+            with transaction.atomic():
+                self.seed_products(size, kwargs["batch_size"], tags, weights)
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{size} products"))
+
+                for label, elapsed in self.run_benchmarks(
+                    tags, kwargs["page_count"], kwargs["repeat"]
+                ):
+                    self.stdout.write(f"  {label:<40} {elapsed:10.2f} ms")
+
+                transaction.set_rollback(True)
+
+    def seed_products(self, size, batch_size, tags, weights):
+        seller = User.objects.create(
+            username="hashtag-benchmark",
+            email="hashtag-benchmark@example.com",
+            first_name="Benchmark",
+        )
+
+        for offset in range(0, size, batch_size):
+            products = Product.objects.bulk_create(
+                Product(
+                    name=f"Benchmark product {index}",
+                    seller=seller,
+                    description="Benchmark product",
+                    price=random.randint(1, 500),
+                    hashtags=random.choices(tags, weights, k=random.randint(1, 6)),
+                )
+                for index in range(offset, min(offset + batch_size, size))
+            )
+            ProductUtils.index_hashtags(products)
+
+    def run_benchmarks(self, tags, page_count, repeat):
+        queries = {
+            "popular tag": tags[:1],
+            "two popular tags": tags[:2],
+            "rare tag": tags[-1:],
+        }
+
+        for name, query_tags in queries.items():
+            json_filter = Q()
+            for hashtag in query_tags:
+                json_filter |= Q(hashtags__icontains=hashtag)
+
+            feeds = {
+                "json scan (any)": lambda: Product.objects.filter(
+                    id__in=list(
+                        Product.objects.filter(json_filter).values_list("id", flat=True)
+                    )
+                ),
+                "index (any)": lambda: Product.objects.filter(
+                    id__in=get_product_ids_with_hashtags(query_tags)
+                ),
+                "index (all)": lambda: Product.objects.filter(
+                    id__in=get_product_ids_with_hashtags(query_tags, match_all=True)
+                ),
+            }
+
+            for label, feed in feeds.items():
+                yield f"{name}: {label}", self.measure(
+                    lambda: list(feed().order_by("-id")[:page_count]), repeat
+                )
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from products.choices import StatusChoices
+from products.models import Product
+from utils.non_modular_utils.database_utils import DatabaseUtil
+from utils.product_utils.product_utils import ProductUtils
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare order_by('?') against the shuffled product feed. Products are "
+        "generated inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[100_000, 1_000_000],
+            help="Catalog sizes to benchmark",
+        )
+        parser.add_argument(
+            "--page-count", type=int, default=50, help="Products per page"
+        )
+        parser.add_argument(
+            "--page-number",
+            type=int,
+            default=400,
+            help="Deep page to measure alongside the first page",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per measurement"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of products inserted per bulk_create",
+        )
+
+    def handle(self, *args, **kwargs):
+        for size in kwargs["sizes"]:
+            with transaction.atomic():
+                self.seed_products(size, kwargs["batch_size"])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{size} products"))
+
+                for label, elapsed in self.run_benchmarks(
+                    kwargs["page_count"], kwargs["page_number"], kwargs["repeat"]
+                ):
+                    self.stdout.write(f"  {label:<40} {elapsed:10.2f} ms")
+
+                transaction.set_rollback(True)
+
+    def seed_products(self, size, batch_size):
+        seller = User.objects.create(
+            username="feed-benchmark",
+            email="feed-benchmark@example.com",
+            first_name="Benchmark",
+        )
+
+        for offset in range(0, size, batch_size):
+            Product.objects.bulk_create(
+                Product(
+                    name=f"Benchmark product {index}",
+                    seller=seller,
+                    description="Benchmark product",
+                    price=random.randint(1, 500),
+                    status=StatusChoices.ACTIVE,
+                )
+                for index in range(offset, min(offset + batch_size, size))
+            )
+
+    def run_benchmarks(self, page_count, page_number, repeat):
+        products = Product.objects.filter(status=StatusChoices.ACTIVE, deleted=False)
+        offset = (page_number - 1) * page_count
+
+        feeds = {
+            "random": products.order_by("?"),
+            "shuffled": ProductUtils.shuffle_products(products),
+            "shuffled (seeded)": ProductUtils.shuffle_products(products, "benchmark"),
+        }
+
+        for name, feed in feeds.items():
+            yield f"{name}: first page", self.measure(
+                lambda: list(feed[:page_count]), repeat
+            )
+            yield f"{name}: page {page_number} (offset)", self.measure(
+                lambda: list(feed[offset : offset + page_count]), repeat
+            )
+
+            if name == "random":
+                continue
+
+            ordering = DatabaseUtil.get_keyset_ordering(feed)
+            cursor = DatabaseUtil.encode_cursor(feed[offset - 1], ordering)
+            yield f"{name}: page {page_number} (cursor)", self.measure(
+                lambda: DatabaseUtil.paginate_by_cursor(feed, page_count, cursor),
+                repeat,
+            )
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
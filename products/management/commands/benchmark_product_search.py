@@ -0,0 +1,187 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User
+from products.models import Brand, Product
+from utils.product_utils.product_utils import ProductUtils
+from utils.search_utils.search_backends import (
+    ElasticsearchSearchBackend,
+    EmbeddedSearchBackend,
+)
+from utils.search_utils.search_index import tokenize
+
+COLORS = ["red", "blue", "black", "white", "green", "pink", "navy", "beige"]
+STYLES = ["vintage", "summer", "leather", "denim", "oversized", "floral", "wool"]
+ITEMS = ["dress", "jacket", "shirt", "trainers", "skirt", "jeans", "coat", "boots"]
+BRANDS = ["Nike", "Zara", "Levi's", "Adidas", "Mango", "Gucci", "Uniqlo", "Prada"]
+FILLER = ["great", "condition", "worn", "once", "size", "fits", "true", "soft"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare product search latency and relevance of icontains matching "
+        "against the search backends. Products are generated inside a "
+        "transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[100_000],
+            help="Catalog sizes to benchmark",
+        )
+        parser.add_argument(
+            "--page-count", type=int, default=50, help="Products per page"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per measurement"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of products inserted per bulk_create",
+        )
+        parser.add_argument(
+            "--elasticsearch",
+            action="store_true",
+            help="Also index into and query the Elasticsearch document",
+        )
+
+    def handle(self, *args, **kwargs):
+        queries = ["red dress", "vintage leather jacket", "nike trainers", "jaket"]
+
+        for size in kwargs["sizes"]:
+            with transaction.atomic(), tempfile.TemporaryDirectory() as directory:
+                self.seed_products(size, kwargs["batch_size"])
+
+                backends = {
+                    "embedded": EmbeddedSearchBackend(
+                        os.path.join(directory, "search_index.pickle")
+                    )
+                }
+                if kwargs["elasticsearch"]:
+                    backends["elasticsearch"] = ElasticsearchSearchBackend()
+
+                for name, backend in backends.items():
+                    started = time.perf_counter()
+                    self.build_index(backend, kwargs["batch_size"])
+                    self.stdout.write(
+                        f"Built {name} index in {time.perf_counter() - started:.1f} s"
+                    )
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{size} products"))
+                self.stdout.write(
+                    f"  {'query':<40} {'ms':>10} {'precision':>10} {'recall':>8}"
+                )
+                for query in queries:
+                    for label, elapsed, precision, recall in self.run_benchmarks(
+                        query, backends, kwargs["page_count"], kwargs["repeat"]
+                    ):
+                        self.stdout.write(
+                            f"  {query + ': ' + label:<40} {elapsed:10.2f} "
+                            f"{precision:10.2f} {recall:8.2f}"
+                        )
+
+                transaction.set_rollback(True)
+
+    def seed_products(self, size, batch_size):
+        seller = User.objects.create(
+            username="search-benchmark",
+            email="search-benchmark@example.com",
+            first_name="Benchmark",
+        )
+        brands = [Brand.objects.get_or_create(name=name)[0] for name in BRANDS]
+
+        for offset in range(0, size, batch_size):
+            Product.objects.bulk_create(
+                Product(
+                    name=" ".join(
+                        random.sample(
+                            [random.choice(COLORS), random.choice(STYLES)],
+                            k=random.randint(0, 2),
+                        )
+                        + random.sample(STYLES, k=random.randint(0, 1))
+                        + [random.choice(ITEMS)]
+                    ).title(),
+                    seller=seller,
+                    brand=random.choice(brands),
+                    description=" ".join(random.choices(FILLER + ITEMS, k=12)),
+                    price=random.randint(1, 500),
+                )
+                for _ in range(offset, min(offset + batch_size, size))
+            )
+
+    def build_index(self, backend, batch_size):
+        products = Product.objects.select_related("brand").order_by("id")
+        last_id = 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            backend.index_products(batch)
+            last_id = batch[-1].id
+        backend.save()
+
+    def get_relevant_ids(self, query):
+        """Products whose name and brand contain every query word, allowing the "jaket" typo."""
+        words = [word.replace("jaket", "jacket") for word in tokenize(query)]
+        relevant = set()
+        for product_id, name, brand in Product.objects.values_list(
+            "id", "name", "brand__name"
+        ).iterator():
+            tokens = set(tokenize(f"{name} {brand}"))
+            if all(word in tokens for word in words):
+                relevant.add(product_id)
+        return relevant
+
+    def run_benchmarks(self, query, backends, page_count, repeat):
+        relevant = self.get_relevant_ids(query)
+
+        def icontains():
+            products = Product.objects.filter(
+                Q(name__icontains=query) | Q(brand__name__icontains=query)
+            )
+            return list(products.order_by("-id")[:page_count]), set(
+                products.values_list("id", flat=True)
+            )
+
+        feeds = {"icontains": icontains}
+        for name, backend in backends.items():
+
+            def search(backend=backend):
+                ranked_ids = backend.search(query)
+                products = ProductUtils.order_by_relevance(
+                    Product.objects.filter(id__in=ranked_ids), ranked_ids
+                )
+                return list(products[:page_count]), set(ranked_ids)
+
+            feeds[name] = search
+
+        for label, feed in feeds.items():
+            elapsed = self.measure(lambda: feed()[0], repeat)
+            page, matched = feed()
+            precision = (
+                sum(product.id in relevant for product in page) / len(page)
+                if page
+                else 0.0
+            )
+            recall = len(matched & relevant) / len(relevant) if relevant else 0.0
+            yield label, elapsed, precision, recall
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,162 @@
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User
+from products.models import Brand, Category, Product, ProductLike
+from utils.product_utils import recommendation_service
+from utils.product_utils.product_utils import ProductUtils
+from utils.product_utils.recommendation_service import RecommendationService
+
+STYLES = ["CASUAL", "VINTAGE", "PARTY_OUTFIT", "STREETWEAR", "WORKWEAR"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency and hit rate of recommended products on seeded "
+        "data. Every user likes products mostly from one category and brand; "
+        "one like per user is held out, and a hit is the held-out product "
+        "showing up in the user's first page. Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=20_000)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--likes-per-user", type=int, default=8)
+        parser.add_argument(
+            "--page-count", type=int, default=50, help="Products per page"
+        )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            users, holdout = self.seed(
+                kwargs["products"], kwargs["users"], kwargs["likes_per_user"]
+            )
+
+            started = time.perf_counter()
+            RecommendationService.refresh_affinities()
+            self.stdout.write(
+                f"Built affinities in {time.perf_counter() - started:.1f} s"
+            )
+            started = time.perf_counter()
+            recommendation_service._index = None
+            recommendation_service.get_recommendation_index()
+            self.stdout.write(
+                f"Built the product index in {time.perf_counter() - started:.1f} s"
+            )
+
+            feeds = {
+                "legacy": lambda user: self.legacy_recommendations(user),
+                "pipeline": lambda user: ProductUtils.recommend_products(user),
+            }
+            self.stdout.write(
+                f"  {'feed':<20} {'p50 ms':>8} {'p95 ms':>8} {'hit rate':>9}"
+            )
+            for label, feed in feeds.items():
+                for cached in [False, True]:
+                    if label == "legacy" and cached:
+                        continue
+
+                    timings, hits = [], 0
+                    for user in users:
+                        if not cached:
+                            cache.delete(RecommendationService.cache_key(user.id))
+                        started = time.perf_counter()
+                        page = list(
+                            feed(user).values_list("id", flat=True)[
+                                : kwargs["page_count"]
+                            ]
+                        )
+                        timings.append((time.perf_counter() - started) * 1000)
+                        hits += holdout[user.id] in page
+
+                    name = f"{label} (cached)" if cached else label
+                    self.stdout.write(
+                        f"  {name:<20} {statistics.median(timings):8.2f} "
+                        f"{statistics.quantiles(timings, n=20)[-1]:8.2f} "
+                        f"{hits / len(users):9.2f}"
+                    )
+
+            transaction.set_rollback(True)
+
+    def seed(self, product_count, user_count, likes_per_user):
+        seller = User.objects.create(
+            username="recommendation-benchmark",
+            email="recommendation-benchmark@example.com",
+            first_name="Benchmark",
+        )
+        categories = [
+            Category.objects.create(name=f"Category {i}", slug=f"benchmark-{i}")
+            for i in range(40)
+        ]
+        brands = [
+            Brand.objects.get_or_create(name=f"Benchmark Brand {i}")[0]
+            for i in range(200)
+        ]
+
+        Product.objects.bulk_create(
+            (
+                Product(
+                    name=f"Product {i}",
+                    seller=seller,
+                    description="",
+                    price=random.randint(1, 500),
+                    category=random.choice(categories),
+                    brand=random.choice(brands),
+                    style=random.choice(STYLES),
+                    likes=random.randint(0, 50),
+                )
+                for i in range(product_count)
+            ),
+            batch_size=5000,
+        )
+        all_ids, by_taste = [], {}
+        for product_id, category_id, brand_id in Product.objects.filter(
+            seller=seller
+        ).values_list("id", "category_id", "brand_id"):
+            all_ids.append(product_id)
+            by_taste.setdefault(category_id, []).append(product_id)
+            by_taste.setdefault((category_id, brand_id), []).append(product_id)
+
+        users, holdout, likes = [], {}, []
+        for i in range(user_count):
+            user = User.objects.create(
+                username=f"recommendation-benchmark-{i}",
+                email=f"recommendation-benchmark-{i}@example.com",
+                first_name="Benchmark",
+            )
+            category, brand = random.choice(categories), random.choice(brands)
+            taste = by_taste.get((category.id, brand.id)) or by_taste[category.id]
+            liked = set()
+            while len(liked) < likes_per_user + 1:
+                # Mostly on taste, with some noise
+                pool = taste if random.random() < 0.5 else by_taste[category.id]
+                liked.add(random.choice(pool if random.random() < 0.9 else all_ids))
+            liked = list(liked)
+            holdout[user.id] = liked.pop()
+            likes += [
+                ProductLike(user=user, product_id=product_id) for product_id in liked
+            ]
+            users.append(user)
+
+        ProductLike.objects.bulk_create(likes, batch_size=5000)
+        return users, holdout
+
+    def legacy_recommendations(self, user):
+        """The category/brand OR query that recommended products used to run."""
+        liked = ProductLike.objects.filter(user=user, deleted=False)
+        category_ids = set(liked.values_list("product__category_id", flat=True))
+        brand_ids = set(liked.values_list("product__brand_id", flat=True))
+        return (
+            Product.objects.filter(
+                Q(category_id__in=category_ids) | Q(brand_id__in=brand_ids)
+            )
+            .distinct()
+            .order_by("-created_at")
+            .exclude(deleted=True)
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.product_utils.similarity_service import SimilarityService
+
+
+class Command(BaseCommand):
+    help = "Precompute the most similar products of every listed product"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=settings.SIMILAR_PRODUCTS_TOP_K,
+            help="Number of neighbours stored per product",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=256,
+            help="Number of products compared with the catalog at a time",
+        )
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        stored = SimilarityService.rebuild(kwargs["top_k"], kwargs["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored the neighbours of {stored} products in "
+                f"{time.perf_counter() - started:.1f} s"
+            )
+        )
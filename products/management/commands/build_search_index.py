@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.models import Product
+from utils.search_utils.search_backends import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Index products in the configured product search backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of products indexed per batch",
+        )
+        parser.add_argument(
+            "--since-minutes",
+            type=int,
+            help="Only index products updated in the last given minutes",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        backend = get_search_backend()
+
+        products = Product.objects.select_related("brand").order_by("id")
+        if kwargs["since_minutes"] is not None:
+            products = products.filter(
+                updated_at__gte=timezone.now()
+                - timedelta(minutes=kwargs["since_minutes"])
+            )
+
+        indexed, last_id = 0, 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            backend.index_products(batch)
+            indexed += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Indexed {indexed} products")
+
+        backend.save()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products"))
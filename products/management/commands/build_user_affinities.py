@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from utils.product_utils.recommendation_service import RecommendationService
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's product feature affinities for recommendations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users processed per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        refreshed = RecommendationService.refresh_affinities(kwargs["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} user affinities"))
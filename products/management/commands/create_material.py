@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from products.models import Material
+from utils.product_utils.reference_data import invalidate_reference_data
 
 
 class Command(BaseCommand):
@@ -102,6 +103,7 @@ class Command(BaseCommand):
             Material.objects.bulk_create(
                 new_materials, batch_size=5000
             )  # Adjust batch size if necessary
+            invalidate_reference_data()
             self.stdout.write(
                 self.style.SUCCESS(f"Created {len(new_materials)} new materials")
             )
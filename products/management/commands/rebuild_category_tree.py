@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Category, rebuild_category_tree
+from utils.product_utils.reference_data import invalidate_reference_data
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized category paths and the closure table"
+
+    def handle(self, *args, **kwargs):
+        rebuild_category_tree()
+        invalidate_reference_data()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the tree of {Category.objects.count()} categories"
+            )
+        )
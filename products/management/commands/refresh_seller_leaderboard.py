@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from utils.product_utils.seller_leaderboard_service import SellerLeaderboardService
+
+
+class Command(BaseCommand):
+    help = "Recompute the recommended sellers leaderboard"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every seller instead of the ones changed since the last refresh",
+        )
+
+    def handle(self, *args, **kwargs):
+        refreshed = SellerLeaderboardService.refresh(full=kwargs["full"])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} sellers"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from utils.product_utils.product_utils import ProductUtils
+
+
+class Command(BaseCommand):
+    help = "Re-roll the shuffle keys that order the default product feed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of product ids updated per statement",
+        )
+
+    def handle(self, *args, **kwargs):
+        updated = ProductUtils.reshuffle_products(batch_size=kwargs["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Reshuffled {updated} products"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from utils.non_modular_utils.write_buffer import get_write_buffer
+from utils.search_utils.search_sync_service import SearchSyncService
+
+
+class Command(BaseCommand):
+    help = "Index the products queued by product changes in the product search backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retry-dead-letters",
+            action="store_true",
+            help="Queue products that exhausted their indexing attempts again first",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["retry_dead_letters"]:
+            retried = SearchSyncService.retry_dead_letters()
+            self.stdout.write(f"Queued {retried} dead-lettered products")
+
+        indexed = SearchSyncService.flush()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products"))
+
+        dead = get_write_buffer().size(SearchSyncService.DEAD_LETTER_NAME)
+        if dead:
+            self.stdout.write(
+                self.style.WARNING(f"{dead} products are in the dead-letter list")
+            )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:42
+
+import products.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Random
+
+
+def randomize_shuffle_keys(apps, schema_editor):
+    # AddField gives every existing row the same default value
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(shuffle_key=Random())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_alter_product_color"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="shuffle_key",
+            field=models.FloatField(default=products.models.generate_shuffle_key),
+        ),
+        migrations.RunPython(randomize_shuffle_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["status", "shuffle_key", "id"],
+                name="products_pr_status_b39249_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_product_shuffle_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recentlyviewedproduct",
+            name="viewed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_alter_recentlyviewedproduct_viewed_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductHashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tag", models.CharField(max_length=100)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtag_postings",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("tag", "product")},
+            },
+        ),
+    ]
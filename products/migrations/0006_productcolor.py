@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_producthashtag"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductColor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("color", models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "price"], name="products_pr_categor_47b724_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productcolor",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="color_postings",
+                to="products.product",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="productcolor",
+            unique_together={("color", "product")},
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:59
+
+import django.db.models.deletion
+import products.models
+from django.db import migrations, models
+
+
+def materialize_category_tree(apps, schema_editor):
+    products.models.rebuild_category_tree(
+        apps.get_model("products", "Category"),
+        apps.get_model("products", "CategoryClosure"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_productcolor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="full_path",
+            field=models.CharField(blank=True, default="", max_length=1000),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="has_children",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="CategoryClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveSmallIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="products.category",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="products.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["descendant", "depth"],
+                        name="products_ca_descend_c38652_idx",
+                    )
+                ],
+                "unique_together": {("ancestor", "descendant")},
+            },
+        ),
+        migrations.RunPython(materialize_category_tree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_category_tree"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSimilarity",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="similarity",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                ("similar_product_ids", models.JSONField(default=list)),
+                ("scores", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_searchrollup_usersearchrollup"),
+        ("products", "0008_productsimilarity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserAffinity",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="affinity",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("features", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_searchrollup_usersearchrollup"),
+        ("products", "0009_useraffinity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SellerLeaderboard",
+            fields=[
+                (
+                    "seller",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="leaderboard",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "total_sales",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "total_shop_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("product_views", models.IntegerField(default=0)),
+                ("active_listings", models.IntegerField(default=0)),
+                (
+                    "seller_score",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-seller_score", "seller"],
+                        name="products_se_seller__393613_idx",
+                    )
+                ],
+            },
+        ),
+    ]
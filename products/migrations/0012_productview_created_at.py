@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_productlike_created_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productview",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
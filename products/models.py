@@ -1,5 +1,7 @@
+import random
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from accounts.models import User
 
 from products.choices import (
@@ -14,12 +16,20 @@ from products.choices import (
 NULL = {"null": True, "blank": True}
 
 
+def generate_shuffle_key():
+    return random.random()
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
     parent = models.ForeignKey(
         "self", on_delete=models.CASCADE, **NULL, related_name="children"
     )
+    # Materialized from the hierarchy on save, see `rebuild_category_tree`
+    full_path = models.CharField(max_length=1000, blank=True, default="")
+    depth = models.PositiveSmallIntegerField(default=0)
+    has_children = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -31,10 +41,134 @@ class Category(models.Model):
 
     def get_full_path(self):
         """Returns the full path of category from root to this node"""
+        if self.full_path:
+            return self.full_path
         if self.parent:
             return f"{self.parent.get_full_path()} > {self.name}"
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Keep the materialized hierarchy up to date. Adding a leaf only writes
+        its own closure rows; renaming or moving a category rebuilds the tree.
+        """
+        previous = None
+        if not self._state.adding:
+            previous = (
+                Category.objects.filter(pk=self.pk).values("name", "parent_id").first()
+            )
+
+        parent = self.parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.full_path = (
+            f"{parent.get_full_path()} > {self.name}" if parent else self.name
+        )
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if previous is None:
+                closure = [CategoryClosure(ancestor=self, descendant=self, depth=0)]
+                if parent:
+                    closure += [
+                        CategoryClosure(
+                            ancestor_id=ancestor_id, descendant=self, depth=depth + 1
+                        )
+                        for ancestor_id, depth in CategoryClosure.objects.filter(
+                            descendant=parent
+                        ).values_list("ancestor_id", "depth")
+                    ]
+                    if not parent.has_children:
+                        Category.objects.filter(pk=parent.pk).update(has_children=True)
+                        parent.has_children = True
+                CategoryClosure.objects.bulk_create(closure, ignore_conflicts=True)
+            elif previous != {"name": self.name, "parent_id": self.parent_id}:
+                rebuild_category_tree()
+
+        reference_data_changed()
+
+    def delete(self, *args, **kwargs):
+        parent_id = self.parent_id
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if parent_id:
+                Category.objects.filter(pk=parent_id).update(
+                    has_children=Category.objects.filter(parent_id=parent_id).exists()
+                )
+
+        reference_data_changed()
+        return result
+
+
+class CategoryClosure(models.Model):
+    """Closure table of the category tree: one row per (ancestor, descendant) pair, including each category with itself."""
+
+    ancestor = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="descendant_links"
+    )
+    descendant = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="ancestor_links"
+    )
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ["ancestor", "descendant"]
+        indexes = [
+            models.Index(fields=["descendant", "depth"]),
+        ]
+
+
+def rebuild_category_tree(category_model=Category, closure_model=CategoryClosure):
+    """
+    Recompute every category's path, depth and children flag and the closure
+    table from the parent links, in a few bulk queries. Takes the models so
+    migrations can run it with their historical models.
+    """
+    categories = {
+        category.id: category
+        for category in category_model.objects.only("id", "name", "parent_id")
+    }
+    parent_ids = {category.parent_id for category in categories.values()}
+
+    ancestors = {}
+
+    def get_ancestors(category):
+        # Ids from the category up to its root
+        if category.id not in ancestors:
+            parent = categories.get(category.parent_id)
+            ancestors[category.id] = [category.id] + (
+                get_ancestors(parent) if parent else []
+            )
+        return ancestors[category.id]
+
+    closure = []
+    for category in categories.values():
+        path = get_ancestors(category)
+        category.depth = len(path) - 1
+        category.full_path = " > ".join(
+            categories[category_id].name for category_id in reversed(path)
+        )
+        category.has_children = category.id in parent_ids
+        closure += [
+            closure_model(
+                ancestor_id=ancestor_id, descendant_id=category.id, depth=depth
+            )
+            for depth, ancestor_id in enumerate(path)
+        ]
+
+    with transaction.atomic():
+        category_model.objects.bulk_update(
+            categories.values(), ["depth", "full_path", "has_children"], batch_size=1000
+        )
+        closure_model.objects.all().delete()
+        closure_model.objects.bulk_create(closure, batch_size=1000)
+
+
+def reference_data_changed():
+    from utils.product_utils.reference_data import invalidate_reference_data
+
+    invalidate_reference_data()
+
 
 class Size(models.Model):
     name = models.CharField(max_length=50)
@@ -46,6 +180,15 @@ class Size(models.Model):
     def __str__(self):
         return f"{self.name} ({self.size_type})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        reference_data_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        reference_data_changed()
+        return result
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -77,13 +220,94 @@ class Product(models.Model):
     hashtags = models.JSONField(default=list, blank=True)
     is_featured = models.BooleanField(default=False)
     deleted = models.BooleanField(default=False)
+    # Random position in the shuffled feed, re-rolled periodically
+    shuffle_key = models.FloatField(default=generate_shuffle_key)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "shuffle_key", "id"]),
+            models.Index(fields=["category", "price"]),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ProductHashtag(models.Model):
+    """Inverted index of Product.hashtags: one row per normalized tag of a product."""
+
+    tag = models.CharField(max_length=100)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="hashtag_postings"
+    )
+
+    class Meta:
+        unique_together = ["tag", "product"]
+
+
+class ProductColor(models.Model):
+    """Index of Product.color: one row per normalized color of a product."""
+
+    color = models.CharField(max_length=50)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="color_postings"
+    )
+
+    class Meta:
+        unique_together = ["color", "product"]
+
+
+class ProductSimilarity(models.Model):
+    """
+    Precomputed nearest neighbours of a product, most similar first, rebuilt
+    offline by the build_product_similarity command.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="similarity"
+    )
+    similar_product_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class UserAffinity(models.Model):
+    """
+    A user's taste over product features, from the products they liked and
+    viewed, as [block, value, weight] triples. Rebuilt by the
+    build_user_affinities command.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="affinity"
+    )
+    features = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SellerLeaderboard(models.Model):
+    """
+    A seller's recommended-sellers score and its components, kept for sellers
+    with active listings. Refreshed by the refresh_seller_leaderboard task.
+    """
+
+    seller = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="leaderboard"
+    )
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_shop_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    product_views = models.IntegerField(default=0)
+    active_listings = models.IntegerField(default=0)
+    seller_score = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Start of the refresh that last computed the row
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["-seller_score", "seller"])]
+
+
 class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True)
 
@@ -93,6 +317,15 @@ class Brand(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        reference_data_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        reference_data_changed()
+        return result
+
 
 class Material(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -103,12 +336,22 @@ class Material(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        reference_data_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        reference_data_changed()
+        return result
+
 
 class ProductLike(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     deleted = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # When the product was last liked, set by the like flush
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-created_at"]
@@ -117,7 +360,8 @@ class ProductLike(models.Model):
 class ProductView(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     viewed_by = models.ForeignKey(User, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # When the product was last viewed, set by the view flush
+    created_at = models.DateTimeField(default=timezone.now)
 
 
 class Banner(models.Model):
@@ -144,7 +388,8 @@ class Banner(models.Model):
 class RecentlyViewedProduct(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so synced views keep the time they were viewed at
+    viewed_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-viewed_at"]
@@ -26,6 +26,9 @@ ALL_PRODUCTS = """
     Parameters:
     - `page_count`: The number of products to return per page (optional).
     - `page_number`: The page number for pagination (optional).
+    - `cursor`: Switches to keyset pagination (optional). Pass an empty string for the first page,
+      then the value of `allProductsNextCursor` for each following page. Cursor pages skip the
+      OFFSET scan, so deep pages cost the same as the first one.
     - `filters`: A dictionary of optional filters that can be applied to the product search. 
       Possible keys in the `filters` dictionary include:
       - `name`: Filter products by name.
@@ -40,15 +43,19 @@ ALL_PRODUCTS = """
       - `style`: Filter products by style.
       - `status`: Filter products by status (e.g., "available", "out of stock").
       - `discount_price`: Filter products with a discount price.
-      - `hashtags`: Filter products that contain specific hashtags.
-    - `search`: A string to search for in the product name.
+      - `hashtags`: Filter products that contain specific hashtags (case-insensitive, with or without `#`).
+      - `match_all_hashtags`: Only return products that contain all of `hashtags`, rather than any of them.
+      - `colors`: Filter products that have all of the specified colors (case-insensitive).
+    - `search`: A string to search for in the product and brand names. With a full-text
+      `PRODUCT_SEARCH_BACKEND`, it is matched against name, brand, hashtags and description,
+      tolerating typos, and results without a `sort` are ordered by relevance.
+    - `seed`: A per-session value for the shuffled feed used when no `sort` is given (optional).
+      The same seed always returns the same order, so pages never repeat products.
 
     Returns:
     - A paginated list of products matching the filters and search criteria.
-    - `pagination_result`: A tuple containing:
-      - `result`: A list of products for the current page.
-      - `total_pages`: Total number of pages based on the current `page_count`.
-      - `total_items`: Total number of products matching the filters and search criteria.
+    - `allProductsTotalNumber`: Total number of products matching the filters and search criteria.
+      The total is only counted when this field is selected, so omit it when it is not needed.
 
     This method also handles pagination of the results to ensure efficient retrieval of large datasets.
     """
@@ -79,6 +86,24 @@ PRODUCT = """
     - The `Product` object corresponding to the given ID if it exists and is not deleted, otherwise raises an error.
     """
 
+PRODUCT_FACETS = """
+    Returns how many products match each value of the brand, category, size, condition,
+    style, color and price facets, for the same `filters` and `search` as `allProducts`.
+    Use it to show counts such as "Nike (123)" or "Size M (45)" next to the filters.
+
+    Parameters:
+    - `filters`: The `allProducts` filters.
+    - `search`: The `allProducts` search term (optional).
+
+    Returns:
+    - `total`: The number of matching products.
+    - One list per facet of `{value, label, count}`, by descending count, capped at 50 values.
+      `value` is what the matching filter takes (an ID for brands, categories and sizes);
+      price buckets are "0-10", "10-25", "25-50", "50-100", "100-250" and "250+".
+
+    Counts are cached per filter set for a minute, so they can lag behind new listings.
+    """
+
 RECOMMENDED_SELLERS = """
     The seller recommendation system works by evaluating different metrics related
     to the seller's performance over the last 30 days. Here's how it works:
@@ -94,6 +119,9 @@ RECOMMENDED_SELLERS = """
     5.  Seller Score: It combines all these metrics (sales, shop value, and views) into one score. 
         The total sales are given the most weight (50%), the shop value is given a smaller weight (30%),
         and product views are given the least weight (20%).
+
+    The scores are precomputed every few minutes, so a seller's latest activity can take a
+    few minutes to show up.
 """
 
 OFFER_OVERVIEW = """
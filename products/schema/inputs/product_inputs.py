@@ -35,6 +35,7 @@ class ProductFiltersInput(graphene.InputObjectType):
     condition = graphene.Argument(ConditionEnum)
     discount_price = graphene.Boolean()
     hashtags = graphene.List(graphene.String)
+    match_all_hashtags = graphene.Boolean()
     colors = graphene.List(graphene.String)
 
 
@@ -1,19 +1,16 @@
 import re
 import graphene
-from products.choices import SizeSubTypeChoices, SizeTypeChoices, StatusChoices
+from products.choices import SizeSubTypeChoices, SizeTypeChoices
 from products.models import (
     Banner,
     Brand,
-    Category,
     Material,
     Product,
-    ProductLike,
-    RecentlyViewedProduct,
-    Size,
 )
 from products.schema.api_descriptions import (
     ALL_PRODUCTS,
     PRODUCT,
+    PRODUCT_FACETS,
     RECOMMENDED_SELLERS,
     USER_PRODUCT_GROUPING,
     USER_PRODUCTS,
@@ -26,31 +23,47 @@ from products.schema.types.product_types import (
     CategoryGroupType,
     CategoryTypes,
     LikedProductType,
+    ProductFacetsType,
     ProductType,
     RecommendedSellerType,
     SizeType,
 )
-from utils.decorators import cache_categories, cache_sizes
-from utils.non_modular_utils.database_utils import DatabaseUtil
+from utils.dataloader_utils.dataloader_utils import ProductLoaders
+from utils.decorators import cache_categories
+from utils.non_modular_utils.database_utils import DatabaseUtil, PaginationContext
+from utils.non_modular_utils.errors import ErrorException
+from utils.product_utils.autocomplete_service import get_autocomplete_index
+from utils.product_utils.facet_service import FacetService
+from utils.product_utils.like_service import LikeService
 from utils.product_utils.product_utils import ProductUtils
+from utils.product_utils.recently_viewed_service import RecentlyViewedService
+from utils.product_utils.reference_data import get_reference_data
+from utils.product_utils.seller_leaderboard_service import SellerLeaderboardService
 from graphql_jwt.decorators import login_required
-from django.db.models import Count, Q
+from django.db.models import Count
 from utils.utils import get_exclusion_queries
 
 
 class Query(graphene.ObjectType):
-    pagination_result = None
-
     all_products = graphene.List(
         ProductType,
         filters=graphene.Argument(ProductFiltersInput),
         sort=SortEnum(),
         search=graphene.String(),
+        seed=graphene.String(),
         page_count=graphene.Int(),
         page_number=graphene.Int(),
+        cursor=graphene.String(),
         description=ALL_PRODUCTS,
     )
 
+    product_facets = graphene.Field(
+        ProductFacetsType,
+        filters=graphene.Argument(ProductFiltersInput),
+        search=graphene.String(),
+        description=PRODUCT_FACETS,
+    )
+
     product = graphene.Field(
         ProductType,
         id=graphene.Int(required=True),
@@ -61,6 +74,7 @@ class Query(graphene.ObjectType):
         LikedProductType,
         page_count=graphene.Int(),
         page_number=graphene.Int(),
+        cursor=graphene.String(),
     )
 
     categories = graphene.List(CategoryTypes, parent_id=graphene.Int())
@@ -70,13 +84,27 @@ class Query(graphene.ObjectType):
         search=graphene.String(),
         page_count=graphene.Int(),
         page_number=graphene.Int(),
+        cursor=graphene.String(),
     )
     # popular_brands = graphene.List(BrandType, top=graphene.Int(required=True))
+    brand_suggestions = graphene.List(
+        BrandType,
+        prefix=graphene.String(required=True),
+        limit=graphene.Int(default_value=10),
+        description="Brands whose name starts with `prefix`, ignoring case and accents, most listed first.",
+    )
+    material_suggestions = graphene.List(
+        BrandType,
+        prefix=graphene.String(required=True),
+        limit=graphene.Int(default_value=10),
+        description="Materials whose name starts with `prefix`, ignoring case and accents, most used first.",
+    )
     materials = graphene.List(
         BrandType,
         search=graphene.String(),
         page_count=graphene.Int(),
         page_number=graphene.Int(),
+        cursor=graphene.String(),
     )
     similar_products = graphene.List(
         ProductType,
@@ -84,6 +112,7 @@ class Query(graphene.ObjectType):
         category_id=graphene.Int(),
         page_count=graphene.Int(),
         page_number=graphene.Int(),
+        cursor=graphene.String(),
     )
     recommend_products = graphene.List(
         ProductType, page_count=graphene.Int(), page_number=graphene.Int()
@@ -91,50 +120,68 @@ class Query(graphene.ObjectType):
     recently_viewed_products = graphene.List(
         ProductType,
     )
-    # favorite_brand_products = graphene.List(
-    #     ProductType, top=graphene.Int(required=True)
-    # )
+    recommended_sellers = graphene.List(
+        RecommendedSellerType,
+        page_count=graphene.Int(),
+        page_number=graphene.Int(),
+        description=RECOMMENDED_SELLERS,
+    )
+    favorite_brand_products = graphene.List(
+        ProductType, top=graphene.Int(required=True)
+    )
 
     all_products_total_number = graphene.Int()
+    all_products_next_cursor = graphene.String()
+    brands_next_cursor = graphene.String()
+    materials_next_cursor = graphene.String()
+    liked_products_next_cursor = graphene.String()
+    similar_products_next_cursor = graphene.String()
+    recommended_sellers_total_number = graphene.Int()
     # brands_total_number = graphene.Int()
     # liked_products_total_number = graphene.Int()
     # materials_total_number = graphene.Int()
     # similar_products_total_number = graphene.Int()
-    # recommended_sellers_total_number = graphene.Int()
     # recommend_products_total_number = graphene.Int()
 
     # @login_required
     def resolve_all_products(self, info, **kwargs):
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
+        cursor = kwargs.get("cursor", None)
         user = info.context.user if info.context.user.is_authenticated else None
 
         try:
             products = ProductUtils.resolve_all_products(user, **kwargs)
-            
+
             # Ensure products is not None
             if products is None:
                 products = Product.objects.none()
 
             # Paginate result
-            result, total_pages, total_items = DatabaseUtil.paginate_query(
-                products, page_count, page_number
+            pagination = DatabaseUtil.paginate(
+                info.context, "all_products", products, page_count, page_number, cursor
             )
-            Query.pagination_result = (result, total_pages, total_items)
+            ProductLoaders.from_context(info.context).prime(pagination.items)
 
             # Ensure we always return a list, never None
-            return result if result is not None else []
-            
+            return pagination.items
+
+        except ErrorException:
+            # Client errors, such as an invalid cursor, reach the client
+            raise
         except Exception as e:
             # Log the error and return empty list
             print(f"Error in resolve_all_products: {e}")
-            Query.pagination_result = ([], 0, 0)
             return []
 
+    def resolve_product_facets(self, info, filters=None, search=None):
+        return FacetService.get_facets(filters or {}, search)
+
     def resolve_all_products_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items("all_products")
+
+    def resolve_all_products_next_cursor(self, info, **kwargs):
+        return PaginationContext.from_context(info.context).next_cursor("all_products")
 
     @login_required
     def resolve_user_products(self, info, **kwargs):
@@ -144,16 +191,16 @@ class Query(graphene.ObjectType):
         products = ProductUtils.resolve_user_products(info.context.user, **kwargs)
 
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            products, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "user_products", products, page_count, page_number
         )
-        Query.pagination_result = (result, total_pages, total_items)
+        ProductLoaders.from_context(info.context).prime(pagination.items)
 
-        return result
+        return pagination.items
 
     def resolve_product(self, info, **kwargs):
         product_id = kwargs.get("id")
-        
+
         # Allow viewing products without authentication
         user = info.context.user if info.context.user.is_authenticated else None
         product = ProductUtils.resolve_product(user, product_id)
@@ -165,18 +212,10 @@ class Query(graphene.ObjectType):
     def resolve_categories(self, info, **kwargs):
         parent_id = kwargs.get("parent_id", None)
 
-        queryset = Category.objects.annotate(children_count=Count("children"))
-
-        # Filter based on parent_id
-        if parent_id:
-            queryset = queryset.filter(parent_id=parent_id)
-        else:
-            queryset = queryset.filter(parent__isnull=True)
-
-        return queryset.order_by("name")
+        # Served from the in-memory tree, returns the roots without parent_id
+        return get_reference_data().categories.get_children(parent_id or None)
 
     @login_required
-    @cache_sizes(timeout=None)
     def resolve_sizes(
         self, info, **kwargs
     ):  # TODO: Might need to refactor this resolve function
@@ -190,7 +229,6 @@ class Query(graphene.ObjectType):
 
         path = path.split(" > ")[:2]
 
-        print("cache miss", path)
         try:
             if "Accessories" in path:
                 size_type = SizeTypeChoices.UNISEX
@@ -201,21 +239,14 @@ class Query(graphene.ObjectType):
         except KeyError:
             return []
 
-        sizes = Size.objects.filter(
-            size_type=size_type,
-            size_subtype=size_subtype,
-        ).only(
-            "id",
-            "name",
-        )
-
-        return sizes
+        return get_reference_data().get_sizes(size_type, size_subtype)
 
     # @login_required
     def resolve_brands(self, info, **kwargs):
         search_query = kwargs.get("search", None)
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
+        cursor = kwargs.get("cursor", None)
 
         brands = Brand.objects.all()
 
@@ -223,12 +254,18 @@ class Query(graphene.ObjectType):
             brands = brands.filter(name__istartswith=search_query)
 
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            brands, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "brands", brands, page_count, page_number, cursor
         )
-        Query.pagination_result = (result, total_pages, total_items)
 
-        return result
+        return pagination.items
+
+    def resolve_brand_suggestions(self, info, prefix, limit):
+        return get_autocomplete_index().brand_index.search(prefix, limit)
+
+    @login_required
+    def resolve_material_suggestions(self, info, prefix, limit):
+        return get_autocomplete_index().material_index.search(prefix, limit)
 
     @login_required
     def resolve_popular_brands(self, info, **kwargs):
@@ -238,15 +275,17 @@ class Query(graphene.ObjectType):
         )[:top]
 
     def resolve_brands_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items("brands")
+
+    def resolve_brands_next_cursor(self, info, **kwargs):
+        return PaginationContext.from_context(info.context).next_cursor("brands")
 
     @login_required
     def resolve_materials(self, info, **kwargs):
         search_query = kwargs.get("search", None)
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
+        cursor = kwargs.get("cursor", None)
 
         materials = Material.objects.all()
 
@@ -254,63 +293,90 @@ class Query(graphene.ObjectType):
             materials = materials.filter(name__icontains=search_query)
 
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            materials, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "materials", materials, page_count, page_number, cursor
         )
-        Query.pagination_result = (result, total_pages, total_items)
 
-        return result
+        return pagination.items
 
     @login_required
     def resolve_materials_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items("materials")
+
+    @login_required
+    def resolve_materials_next_cursor(self, info, **kwargs):
+        return PaginationContext.from_context(info.context).next_cursor("materials")
 
     @login_required
     def resolve_liked_products(self, info, **kwargs):
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
+        cursor = kwargs.get("cursor", None)
 
-        exclusion_conditions = get_exclusion_queries()
+        # Likes come from the liked set, so likes and unlikes that have not been
+        # flushed yet are already reflected, most recently liked first
+        liked_product_ids = LikeService.get_recently_liked_product_ids(
+            info.context.user.id
+        )
 
-        liked_products = ProductLike.objects.filter(user=info.context.user).exclude(
-            Q(exclusion_conditions) | Q(deleted=True)
+        liked_products = ProductUtils.order_by_relevance(
+            Product.objects.filter(id__in=liked_product_ids).exclude(
+                get_exclusion_queries("seller")
+            ),
+            liked_product_ids,
         )
 
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            liked_products, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context,
+            "liked_products",
+            liked_products,
+            page_count,
+            page_number,
+            cursor,
         )
-        Query.pagination_result = (result, total_pages, total_items)
-        return result
+        ProductLoaders.from_context(info.context).prime(pagination.items)
+        return [LikedProductType(product=product) for product in pagination.items]
 
     @login_required
     def resolve_liked_products_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items(
+            "liked_products"
+        )
+
+    @login_required
+    def resolve_liked_products_next_cursor(self, info, **kwargs):
+        return PaginationContext.from_context(info.context).next_cursor(
+            "liked_products"
+        )
 
     @login_required
     def resolve_similar_products(self, info, **kwargs):
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
+        cursor = kwargs.get("cursor", None)
 
         products = ProductUtils.resolve_similar_products(**kwargs)
 
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            products, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "similar_products", products, page_count, page_number, cursor
         )
-        Query.pagination_result = (result, total_pages, total_items)
+        ProductLoaders.from_context(info.context).prime(pagination.items)
 
-        return result
+        return pagination.items
 
     @login_required
     def resolve_similar_products_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items(
+            "similar_products"
+        )
+
+    @login_required
+    def resolve_similar_products_next_cursor(self, info, **kwargs):
+        return PaginationContext.from_context(info.context).next_cursor(
+            "similar_products"
+        )
 
     @login_required
     def resolve_filter_products_by_price(self, info, **kwargs):
@@ -320,18 +386,18 @@ class Query(graphene.ObjectType):
 
         products = Product.objects.filter(price__lte=price_limit).exclude(deleted=True)
         # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            products, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "filter_products_by_price", products, page_count, page_number
         )
-        Query.pagination_result = (result, total_pages, total_items)
+        ProductLoaders.from_context(info.context).prime(pagination.items)
 
-        return result
+        return pagination.items
 
     @login_required
     def resolve_filter_products_by_price_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items(
+            "filter_products_by_price"
+        )
 
     @login_required
     def resolve_user_product_grouping(self, info, **kwargs):
@@ -342,15 +408,10 @@ class Query(graphene.ObjectType):
 
     @login_required
     def resolve_recently_viewed_products(self, info, **kwargs):
-        # Get recently viewed products with timestamps
-        recently_viewed = (
-            RecentlyViewedProduct.objects.filter(user=info.context.user)
-            .select_related("product")
-            .order_by("-viewed_at")[:20]
+        products = RecentlyViewedService.get_recently_viewed_products(
+            info.context.user.id
         )
-
-        # Extract products while maintaining order
-        products = [rv.product for rv in recently_viewed]
+        ProductLoaders.from_context(info.context).prime(products)
 
         return products
 
@@ -362,25 +423,26 @@ class Query(graphene.ObjectType):
     def resolve_recommended_sellers(self, info, **kwargs):
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
-        # Query the Product model to aggregate sellers' performance
-        queryset = Product.objects.filter(status=StatusChoices.ACTIVE, deleted=False)
-
-        # Call get_queryset on Product model
-        recommended_seller = RecommendedSellerType.get_queryset(queryset, info)
 
-        # Paginate result
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            recommended_seller, page_count, page_number
+        # Precomputed by the refresh_seller_leaderboard task
+        pagination = DatabaseUtil.paginate(
+            info.context,
+            "recommended_sellers",
+            SellerLeaderboardService.get_top_sellers(),
+            page_count,
+            page_number,
+        )
+        ProductLoaders.from_context(info.context).seller.prime(
+            row.seller_id for row in pagination.items
         )
-        Query.pagination_result = (result, total_pages, total_items)
 
-        return result
+        return pagination.items
 
     @login_required
     def resolve_recommended_sellers_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items(
+            "recommended_sellers"
+        )
 
     @login_required
     def resolve_recommend_products(self, info, **kwargs):
@@ -390,43 +452,39 @@ class Query(graphene.ObjectType):
 
         products = ProductUtils.recommend_products(info.context.user)
 
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            products, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "recommend_products", products, page_count, page_number
         )
+        ProductLoaders.from_context(info.context).prime(pagination.items)
 
-        Query.pagination_result = (result, total_pages, total_items)
-
-        return products
+        return pagination.items
 
     @login_required
     def resolve_recommend_products_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return PaginationContext.from_context(info.context).total_items(
+            "recommend_products"
+        )
 
     @login_required
     def resolve_favorite_brand_products(self, info, **kwargs):
         top = kwargs.get("top", 10)
         user = info.context.user
 
-        return ProductUtils.favorite_brand_products(user, top)
+        products = ProductUtils.favorite_brand_products(user, top)
+        ProductLoaders.from_context(info.context).prime(products)
+
+        return products
 
     @login_required
     def resolve_user_orders(self, info, **kwargs):
         user = info.context.user
         page_count = kwargs.get("page_count", None)
         page_number = kwargs.get("page_number", None)
+        cursor = kwargs.get("cursor", None)
 
         orders = ProductUtils.user_orders(user, **kwargs)
-        result, total_pages, total_items = DatabaseUtil.paginate_query(
-            orders, page_count, page_number
+        pagination = DatabaseUtil.paginate(
+            info.context, "user_orders", orders, page_count, page_number, cursor
         )
-        Query.pagination_result = (result, total_pages, total_items)
-
-        return result
 
-    @login_required
-    def resolve_user_orders_total_number(self, info, **kwargs):
-        if not Query.pagination_result:
-            return 0
-        return Query.pagination_result[2]
+        return pagination.items
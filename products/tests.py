@@ -1,3 +1,1576 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import redis
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from orders.models import Order, OrderItem
+from products.choices import SizeSubTypeChoices, SizeTypeChoices, StatusChoices
+from products.models import (
+    Brand,
+    Category,
+    CategoryClosure,
+    Material,
+    Product,
+    ProductHashtag,
+    ProductLike,
+    ProductSimilarity,
+    ProductView,
+    RecentlyViewedProduct,
+    SellerLeaderboard,
+    Size,
+    UserAffinity,
+)
+from src.schemas import schema
+from utils.jobs import base as jobs_base
+from utils.jobs.base import COALESCE, SKIP, only_one
+from utils.dataloader_utils.dataloader_utils import MaterialsLoader
+from utils.non_modular_utils.database_utils import (
+    DatabaseUtil,
+    InvalidCursor,
+    PaginationContext,
+)
+from utils.non_modular_utils.write_buffer import get_write_buffer
+from utils.product_utils import (
+    autocomplete_service,
+    brand_popularity_service,
+    recommendation_service,
+    reference_data,
+)
+from utils.product_utils.autocomplete_service import AutocompleteService
+from utils.product_utils.brand_popularity_service import BrandPopularityService
+from utils.product_utils.reference_data import get_reference_data
+from utils.product_utils.like_service import LikeService
+from utils.product_utils.product_utils import ProductUtils
+from utils.product_utils.recently_viewed_service import RecentlyViewedService
+from utils.product_utils.recommendation_service import RecommendationService
+from utils.product_utils.seller_leaderboard_service import SellerLeaderboardService
+from utils.product_utils.similarity_service import SimilarityService, top_k_neighbours
+from utils.product_utils.view_counter_service import ViewCounterService
+from utils.utils import get_cold_start_brands
+from utils.search_utils.prefix_index import PrefixIndex
+from utils.search_utils.search_backends import (
+    EmbeddedSearchBackend,
+    get_search_backend,
+)
+from utils.search_utils.search_sync_service import SearchSyncService
+from utils.utils import build_product_filter_conditions, get_product_ids_with_hashtags
+
+
+def make_user(username, **fields):
+    fields.setdefault("email", f"{username}@example.com")
+    fields.setdefault("first_name", username.split("-")[0].capitalize())
+    return User.objects.create(username=username, **fields)
+
+
+def make_product(seller, name="Product", price=10, **fields):
+    fields.setdefault("description", "")
+    return Product.objects.create(name=name, seller=seller, price=price, **fields)
+
+
+def list_product(seller, description="", price=10, **fields):
+    """Create a product through ProductUtils, which also indexes it."""
+    return ProductUtils.create_product(
+        seller,
+        name="Product",
+        description=description,
+        price=price,
+        images_url=[],
+        **fields,
+    )
+
+
+class IsolatedStateMixin:
+    """
+    Start every test with an empty write buffer and cache, and without the
+    process-local snapshots named in `reset_globals`. The write buffer must be
+    the memory one.
+    """
+
+    # (module, global) pairs set to None for each test
+    reset_globals = ()
+
+    def setUp(self):
+        super().setUp()
+        for state in (get_write_buffer(), cache):
+            state.clear()
+            self.addCleanup(state.clear)
+        for module, name in self.reset_globals:
+            patcher = mock.patch.object(module, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+ALL_PRODUCTS_QUERY = """
+    query AllProducts($pageCount: Int) {
+        allProducts(pageCount: $pageCount, pageNumber: 1) {
+            id
+            seller { id }
+            brand { id name }
+            category { id name }
+            size { id name }
+            materials { id name }
+            userLiked
+        }
+    }
+"""
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory")
+class ProductLoadersTestCase(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = make_user("viewer")
+        self.material = Material.objects.create(name="Cotton")
+
+    def create_products(self, count):
+        products = []
+        for index in range(count):
+            seller = make_user(f"seller-{count}-{index}")
+            product = make_product(
+                seller,
+                name=f"Product {index}",
+                brand=Brand.objects.create(name=f"Brand {count}-{index}"),
+                category=Category.objects.create(
+                    name=f"Category {index}", slug=f"category-{count}-{index}"
+                ),
+                size=Size.objects.create(name=f"Size {index}"),
+            )
+            product.materials.add(self.material)
+            products.append(product)
+        return products
+
+    def execute_all_products(self, page_count):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.viewer
+
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(
+                ALL_PRODUCTS_QUERY,
+                context_value=request,
+                variables={"pageCount": page_count},
+            )
+
+        self.assertIsNone(result.errors)
+        return result.data["allProducts"], len(queries.captured_queries)
+
+    def test_query_count_is_independent_of_page_size(self):
+        self.create_products(3)
+        small_page, small_page_queries = self.execute_all_products(page_count=3)
+
+        Product.objects.all().delete()
+        get_write_buffer().clear()
+        self.create_products(25)
+        large_page, large_page_queries = self.execute_all_products(page_count=25)
+
+        self.assertEqual(len(small_page), 3)
+        self.assertEqual(len(large_page), 25)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_products_without_materials_get_their_own_lists(self):
+        seller = make_user("seller")
+        first, second = make_product(seller), make_product(seller)
+        loader = MaterialsLoader()
+        loader.prime([first.id, second.id])
+
+        loader.load(first.id).append(self.material)
+
+        self.assertEqual(loader.load(second.id), [])
+        self.assertEqual(MaterialsLoader().load(first.id), [])
+
+    def test_relations_are_resolved_per_product(self):
+        products = self.create_products(4)
+        ProductLike.objects.create(product=products[0], user=self.viewer)
+        ProductLike.objects.create(product=products[1], user=self.viewer, deleted=True)
+
+        data, _ = self.execute_all_products(page_count=10)
+        by_id = {int(item["id"]): item for item in data}
+
+        for product in products:
+            item = by_id[product.id]
+            self.assertEqual(int(item["seller"]["id"]), product.seller_id)
+            self.assertEqual(item["brand"]["name"], product.brand.name)
+            self.assertEqual(item["category"]["name"], product.category.name)
+            self.assertEqual(item["size"]["name"], product.size.name)
+            self.assertEqual([m["name"] for m in item["materials"]], ["Cotton"])
+
+        self.assertTrue(by_id[products[0].id]["userLiked"])
+        self.assertFalse(by_id[products[1].id]["userLiked"])
+        self.assertFalse(by_id[products[2].id]["userLiked"])
+
+
+class CursorPaginationTestCase(TestCase):
+    def setUp(self):
+        seller = make_user("seller")
+        # Repeated prices make the primary key tie-breaker matter
+        for index in range(7):
+            make_product(seller, f"Product {index}", index % 3)
+
+    def walk_pages(self, query_set, page_count):
+        items, cursor = [], ""
+        while cursor is not None:
+            page, cursor, _ = DatabaseUtil.paginate_by_cursor(
+                query_set, page_count, cursor
+            )
+            items.extend(page)
+        return items
+
+    def test_cursor_pages_match_offset_ordering(self):
+        for ordering in (("-price",), ("price",), ("-created_at",)):
+            query_set = Product.objects.order_by(*ordering)
+            expected = list(query_set.order_by(*ordering, "id"))
+            if ordering[0].startswith("-"):
+                expected = list(query_set.order_by(*ordering, "-id"))
+
+            self.assertEqual(self.walk_pages(query_set, page_count=3), expected)
+
+    def test_random_ordering_falls_back_to_primary_key(self):
+        items = self.walk_pages(Product.objects.order_by("?"), page_count=2)
+        self.assertEqual(
+            [product.id for product in items],
+            list(Product.objects.order_by("-id").values_list("id", flat=True)),
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            DatabaseUtil.paginate_by_cursor(Product.objects.all(), 2, "not-a-cursor")
+
+    def test_all_products_exposes_next_cursor(self):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        query = """
+            query Page($cursor: String) {
+                allProducts(sort: PRICE_ASC, pageCount: 4, cursor: $cursor) { id }
+                allProductsNextCursor
+            }
+        """
+
+        first = schema.execute(query, context_value=request, variables={"cursor": ""})
+        self.assertIsNone(first.errors)
+        self.assertEqual(len(first.data["allProducts"]), 4)
+
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        cursor = first.data["allProductsNextCursor"]
+        second = schema.execute(
+            query, context_value=request, variables={"cursor": cursor}
+        )
+        self.assertIsNone(second.errors)
+        self.assertEqual(len(second.data["allProducts"]), 3)
+        self.assertIsNone(second.data["allProductsNextCursor"])
+
+    def test_all_products_rejects_an_invalid_cursor(self):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        result = schema.execute(
+            '{ allProducts(sort: PRICE_ASC, cursor: "not-a-cursor") { id } }',
+            context_value=request,
+        )
+
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn("Invalid cursor", result.errors[0].message)
+        self.assertEqual(result.errors[0].original_error.context["code"], 400)
+
+
+class PaginationContextTestCase(TestCase):
+    def setUp(self):
+        seller = make_user("seller")
+        for index in range(5):
+            make_product(seller, f"Product {index}", index)
+
+    def execute(self, query):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(query, context_value=request)
+
+        self.assertIsNone(result.errors)
+        count_queries = [
+            query["sql"]
+            for query in queries.captured_queries
+            if "COUNT(" in query["sql"].upper()
+        ]
+        return result.data, count_queries, request
+
+    def test_total_is_only_counted_when_selected(self):
+        _, count_queries, _ = self.execute("{ allProducts(pageCount: 2) { id } }")
+        self.assertEqual(count_queries, [])
+
+        data, count_queries, _ = self.execute(
+            "{ allProducts(pageCount: 2) { id } allProductsTotalNumber }"
+        )
+        self.assertEqual(data["allProductsTotalNumber"], 5)
+        self.assertEqual(len(count_queries), 1)
+
+    def test_totals_are_scoped_to_the_request(self):
+        _, _, first_request = self.execute(
+            "{ allProducts(filters: {maxPrice: 1}) { id } allProductsTotalNumber }"
+        )
+        _, _, second_request = self.execute("{ allProducts { id } }")
+
+        self.assertEqual(
+            PaginationContext.from_context(first_request).total_items("all_products"),
+            2,
+        )
+        self.assertEqual(
+            PaginationContext.from_context(second_request).total_items("all_products"),
+            5,
+        )
+
+    def test_out_of_range_page_returns_last_page(self):
+        result = DatabaseUtil.paginate_page(
+            Product.objects.order_by("price"), page_count=2, page_number=9
+        )
+        self.assertEqual([product.price for product in result.items], [4])
+        self.assertEqual(result.total_pages, 3)
+
+
+class ShuffledFeedTestCase(TestCase):
+    def setUp(self):
+        seller = make_user("seller")
+        for index in range(12):
+            make_product(seller, f"Product {index}", index)
+
+    def feed_pages(self, seed=None, page_count=5):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        query = """
+            query Feed($seed: String, $pageNumber: Int) {
+                allProducts(seed: $seed, pageCount: 5, pageNumber: $pageNumber) { id }
+            }
+        """
+        ids = []
+        for page_number in (1, 2, 3):
+            result = schema.execute(
+                query,
+                context_value=request,
+                variables={"seed": seed, "pageNumber": page_number},
+            )
+            self.assertIsNone(result.errors)
+            ids.extend(int(item["id"]) for item in result.data["allProducts"])
+        return ids
+
+    def test_pages_are_stable_and_do_not_repeat(self):
+        for seed in (None, "session-a"):
+            ids = self.feed_pages(seed)
+            self.assertEqual(
+                sorted(ids), sorted(Product.objects.values_list("id", flat=True))
+            )
+            self.assertEqual(ids, self.feed_pages(seed))
+
+    def test_seeded_feed_wraps_around_the_key_space(self):
+        start = ProductUtils.get_shuffle_start("session-a")
+        keys = [
+            Product.objects.get(id=product_id).shuffle_key
+            for product_id in self.feed_pages("session-a")
+        ]
+        head = [key for key in keys if key >= start]
+
+        self.assertEqual(keys[: len(head)], sorted(head))
+        self.assertEqual(keys[len(head) :], sorted(key for key in keys if key < start))
+
+    def test_reshuffle_rerolls_keys(self):
+        before = dict(Product.objects.values_list("id", "shuffle_key"))
+        self.assertEqual(ProductUtils.reshuffle_products(batch_size=5), 12)
+        after = dict(Product.objects.values_list("id", "shuffle_key"))
+        self.assertNotEqual(before, after)
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory", PRODUCT_VIEW_FLUSH_INTERVAL=3600)
+class ViewCounterTestCase(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user("seller")
+        self.viewers = [make_user(f"viewer-{index}") for index in range(3)]
+        self.product = make_product(self.seller)
+
+    def test_views_are_buffered_and_deduplicated(self):
+        with CaptureQueriesContext(connection) as queries:
+            for viewer in self.viewers + self.viewers[:1]:
+                ProductUtils.resolve_product(viewer, self.product.id)
+            ProductUtils.resolve_product(self.seller, self.product.id)
+
+        self.assertFalse(
+            any("FOR UPDATE" in query["sql"] for query in queries.captured_queries)
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 0)
+
+        self.assertEqual(ViewCounterService.flush_views(), 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 3)
+        self.assertEqual(ProductView.objects.filter(product=self.product).count(), 3)
+
+    def test_repeat_viewers_only_refresh_the_view_time(self):
+        ProductUtils.resolve_product(self.viewers[0], self.product.id)
+        ViewCounterService.flush_views()
+        first_viewed_at = ProductView.objects.get(viewed_by=self.viewers[0]).created_at
+
+        ProductUtils.resolve_product(self.viewers[0], self.product.id)
+        ProductUtils.resolve_product(self.viewers[1], self.product.id)
+        ViewCounterService.flush_views()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 2)
+        self.assertGreater(
+            ProductView.objects.get(viewed_by=self.viewers[0]).created_at,
+            first_viewed_at,
+        )
+
+    def test_new_views_keep_their_view_time(self):
+        viewed_at = timezone.now() - timedelta(days=40)
+        ViewCounterService.write_views(
+            {(self.product.id, self.viewers[0].id): viewed_at.timestamp()}
+        )
+
+        self.assertEqual(ProductView.objects.get().created_at, viewed_at)
+
+    def test_failed_flush_keeps_the_drained_views(self):
+        ProductUtils.resolve_product(self.viewers[0], self.product.id)
+        ProductUtils.resolve_product(self.viewers[1], self.product.id)
+
+        with mock.patch.object(
+            ProductView.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                ViewCounterService.flush_views()
+
+        self.assertEqual(ViewCounterService.flush_views(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 2)
+
+    @override_settings(PRODUCT_VIEW_FLUSH_INTERVAL=0)
+    def test_local_buffer_flushes_itself_once_the_window_elapses(self):
+        ProductUtils.resolve_product(self.viewers[0], self.product.id)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 1)
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory", PRODUCT_LIKE_FLUSH_INTERVAL=3600)
+class LikePipelineTestCase(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user("seller")
+        self.users = [make_user(f"user-{index}") for index in range(3)]
+        self.product = make_product(self.seller)
+        notify = mock.patch.object(LikeService, "notify_sellers")
+        self.notify_sellers = notify.start()
+        self.addCleanup(notify.stop)
+
+    def test_likes_are_applied_as_net_deltas(self):
+        for user in self.users:
+            self.assertTrue(ProductUtils.like_product(user, self.product.id))
+        # Liking twice in a window nets out to an unlike
+        self.assertFalse(ProductUtils.like_product(self.users[0], self.product.id))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(LikeService.flush_likes(), 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes, 2)
+        self.assertEqual(
+            set(
+                ProductLike.objects.filter(deleted=False).values_list(
+                    "user_id", flat=True
+                )
+            ),
+            {self.users[1].id, self.users[2].id},
+        )
+        self.assertEqual(len(self.notify_sellers.call_args[0][0]), 2)
+
+    def test_flushing_the_same_state_twice_is_idempotent(self):
+        ProductUtils.like_product(self.users[0], self.product.id)
+        LikeService.write_likes(
+            {(self.product.id, self.users[0].id): timezone.now().timestamp()}
+        )
+        LikeService.flush_likes()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes, 1)
+        self.assertEqual(ProductLike.objects.count(), 1)
+
+    def test_failed_flush_keeps_the_drained_likes(self):
+        ProductUtils.like_product(self.users[0], self.product.id)
+        ProductUtils.like_product(self.users[1], self.product.id)
+
+        with mock.patch.object(
+            ProductLike.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                LikeService.flush_likes()
+        # Newer states buffered after the failure win over the restored ones
+        ProductUtils.like_product(self.users[1], self.product.id)
+
+        self.assertEqual(LikeService.flush_likes(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes, 1)
+
+    def test_liked_state_is_read_without_querying_likes(self):
+        ProductLike.objects.create(product=self.product, user=self.users[0])
+        self.assertEqual(
+            LikeService.get_liked_product_ids(self.users[0].id), {self.product.id}
+        )
+
+        ProductUtils.like_product(self.users[0], self.product.id)
+        with CaptureQueriesContext(connection) as queries:
+            liked_ids = LikeService.get_liked_product_ids(self.users[0].id)
+
+        self.assertEqual(liked_ids, set())
+        self.assertEqual(len(queries.captured_queries), 0)
+
+    def test_liked_products_lists_likes_before_they_are_flushed(self):
+        products = [make_product(self.seller, f"Liked {index}") for index in range(2)]
+        # A flushed like, then a re-like of it and a new like, both unflushed
+        liked_at = timezone.now() - timedelta(days=1)
+        ProductLike.objects.create(
+            product=self.product, user=self.users[0], created_at=liked_at
+        )
+        ProductLike.objects.create(
+            product=products[0], user=self.users[0], created_at=liked_at, deleted=True
+        )
+        ProductUtils.like_product(self.users[0], products[0].id)
+        ProductUtils.like_product(self.users[0], products[1].id)
+
+        request = RequestFactory().post("/graphql/")
+        request.user = self.users[0]
+        query = "{ likedProducts { product { id } } }"
+        result = schema.execute(query, context_value=request)
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            [liked["product"]["id"] for liked in result.data["likedProducts"]],
+            [str(products[1].id), str(products[0].id), str(self.product.id)],
+        )
+
+        # Flushing keeps the like times, so the order survives a reload
+        LikeService.flush_likes()
+        get_write_buffer().clear()
+        self.assertEqual(
+            LikeService.get_recently_liked_product_ids(self.users[0].id),
+            [products[1].id, products[0].id, self.product.id],
+        )
+
+
+class FakeLock:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def acquire(self, blocking=True):
+        if self.name in self.client.locks:
+            return False
+        self.client.locks.add(self.name)
+        return True
+
+    def reacquire(self):
+        return True
+
+    def release(self):
+        self.client.locks.discard(self.name)
+
+
+class FakeRedis:
+    """Just enough of the Redis client for `only_one`."""
+
+    def __init__(self):
+        self.locks = set()
+        self.values = {}
+
+    def lock(self, name, timeout=None):
+        return FakeLock(self, name)
+
+    def set(self, name, value, ex=None):
+        self.values[name] = value
+
+    def delete(self, name):
+        return int(self.values.pop(name, None) is not None)
+
+    def pipeline(self):
+        return mock.MagicMock()
+
+
+class OnlyOneTestCase(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(jobs_base, "REDIS_CLIENT", self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_keyed_locks_only_serialize_the_same_key(self):
+        @only_one(key="user_id", mode=SKIP)
+        def task(self, user_id, product_id):
+            calls.append((user_id, product_id))
+            # Re-entering for another user runs, for the same user it is skipped
+            if product_id == 1:
+                task(None, user_id + 1, 2)
+                task(None, user_id, 3)
+
+        calls = []
+        task(None, 1, 1)
+        self.assertEqual(calls, [(1, 1), (2, 2)])
+
+    def test_coalesced_calls_rerun_once_after_the_holder_finishes(self):
+        @only_one(mode=COALESCE)
+        def flush():
+            runs.append(len(runs))
+            if len(runs) == 1:
+                self.assertIsNone(flush())
+                self.assertIsNone(flush())
+
+        runs = []
+        flush()
+        self.assertEqual(runs, [0, 1])
+        self.assertEqual(self.redis.locks, set())
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory", RECENTLY_VIEWED_SYNC_INTERVAL=3600)
+class RecentlyViewedTestCase(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        seller = make_user("seller")
+        self.viewer = make_user("viewer")
+        self.products = [
+            make_product(seller, name=f"Product {index}", price=index)
+            for index in range(RecentlyViewedService.MAX_RECENTLY_VIEWED + 5)
+        ]
+
+    def test_list_is_capped_and_most_recent_first(self):
+        for product in self.products:
+            RecentlyViewedService.record_view(self.viewer.id, product.id)
+        RecentlyViewedService.record_view(self.viewer.id, self.products[10].id)
+
+        expected = [self.products[10]] + [
+            product
+            for product in reversed(self.products[5:])
+            if product.id != self.products[10].id
+        ]
+        with self.assertNumQueries(1):
+            products = RecentlyViewedService.get_recently_viewed_products(
+                self.viewer.id
+            )
+        self.assertEqual(products, expected)
+        self.assertEqual(RecentlyViewedProduct.objects.count(), 0)
+
+    def test_sync_mirrors_the_list_and_rebuilds_it(self):
+        RecentlyViewedProduct.objects.create(user=self.viewer, product=self.products[0])
+        for product in self.products[1:4]:
+            RecentlyViewedService.record_view(self.viewer.id, product.id)
+
+        self.assertEqual(RecentlyViewedService.sync_recently_viewed(), 1)
+        self.assertEqual(
+            list(
+                RecentlyViewedProduct.objects.filter(user=self.viewer).values_list(
+                    "product_id", flat=True
+                )
+            ),
+            [product.id for product in reversed(self.products[:4])],
+        )
+
+        get_write_buffer().clear()
+        self.assertEqual(
+            RecentlyViewedService.get_recently_viewed_products(self.viewer.id),
+            list(reversed(self.products[:4])),
+        )
+
+
+class HashtagIndexTestCase(TestCase):
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.category = Category.objects.create(name="Dresses", slug="dresses")
+
+    def filter_products(self, hashtags, match_all=False):
+        return set(
+            Product.objects.filter(
+                id__in=get_product_ids_with_hashtags(hashtags, match_all)
+            ).values_list("id", flat=True)
+        )
+
+    def test_any_and_all_tag_queries(self):
+        summer = list_product(
+            self.seller, "Light dress #Summer #beach", category=self.category.id
+        )
+        beach = list_product(self.seller, "Towel #beach", category=self.category.id)
+        winter = list_product(self.seller, "Coat #winter", category=self.category.id)
+
+        self.assertEqual(self.filter_products(["#summer"]), {summer.id})
+        self.assertEqual(
+            self.filter_products(["beach", "winter"]), {summer.id, beach.id, winter.id}
+        )
+        self.assertEqual(
+            self.filter_products(["summer", "#BEACH"], match_all=True), {summer.id}
+        )
+
+    def test_index_follows_updates_and_duplicates(self):
+        product = list_product(self.seller, "Dress #summer", category=self.category.id)
+
+        ProductUtils.update_product(
+            self.seller, product_id=product.id, description="Dress #autumn"
+        )
+        self.assertEqual(
+            list(ProductHashtag.objects.values_list("tag", flat=True)), ["autumn"]
+        )
+
+        duplicate = ProductUtils.duplicate_product(self.seller, product.id)
+        self.assertEqual(self.filter_products(["autumn"]), {product.id, duplicate.id})
+
+
+class ColorIndexTestCase(TestCase):
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.dresses = Category.objects.create(name="Dresses", slug="dresses")
+        self.shoes = Category.objects.create(name="Shoes", slug="shoes")
+
+    def filter_products(self, filters):
+        return set(
+            Product.objects.filter(
+                build_product_filter_conditions(None, filters)
+            ).values_list("id", flat=True)
+        )
+
+    def test_colors_combine_with_category_and_price(self):
+        red_blue = list_product(
+            self.seller, color=["Red", "Blue"], category=self.dresses.id
+        )
+        red = list_product(self.seller, color=[" red "], category=self.dresses.id)
+        list_product(
+            self.seller, price=50, color=["Red", "Blue"], category=self.dresses.id
+        )
+        list_product(self.seller, color=["Red", "Blue"], category=self.shoes.id)
+
+        self.assertEqual(
+            self.filter_products(
+                {"colors": ["red"], "category": self.dresses.id, "max_price": 20}
+            ),
+            {red_blue.id, red.id},
+        )
+        self.assertEqual(
+            self.filter_products(
+                {
+                    "colors": ["RED", "blue"],
+                    "category": self.dresses.id,
+                    "max_price": 20,
+                }
+            ),
+            {red_blue.id},
+        )
+
+    def test_index_follows_color_updates(self):
+        product = list_product(self.seller, color=["Red"], category=self.dresses.id)
+
+        ProductUtils.update_product(self.seller, product_id=product.id, color=["Green"])
+
+        self.assertEqual(self.filter_products({"colors": ["red"]}), set())
+        self.assertEqual(self.filter_products({"colors": ["green"]}), {product.id})
+
+
+@override_settings(REFERENCE_DATA_CHECK_INTERVAL=0)
+class CategoryTreeTestCase(TestCase):
+    def setUp(self):
+        self.men = Category.objects.create(name="Men", slug="men")
+        self.clothing = Category.objects.create(
+            name="Clothing", slug="men-clothing", parent=self.men
+        )
+        self.tops = Category.objects.create(
+            name="Tops", slug="men-clothing-tops", parent=self.clothing
+        )
+        self.women = Category.objects.create(name="Women", slug="women")
+
+    def test_hierarchy_is_materialized_on_save(self):
+        self.men.refresh_from_db()
+        self.tops.refresh_from_db()
+
+        self.assertTrue(self.men.has_children)
+        self.assertEqual(self.tops.full_path, "Men > Clothing > Tops")
+        self.assertEqual(self.tops.depth, 2)
+        self.assertEqual(
+            set(
+                CategoryClosure.objects.filter(ancestor=self.men).values_list(
+                    "descendant_id", "depth"
+                )
+            ),
+            {(self.men.id, 0), (self.clothing.id, 1), (self.tops.id, 2)},
+        )
+
+    def test_moving_a_category_rebuilds_its_subtree(self):
+        self.clothing.parent = self.women
+        self.clothing.save()
+
+        self.tops.refresh_from_db()
+        self.men.refresh_from_db()
+        self.assertEqual(self.tops.full_path, "Women > Clothing > Tops")
+        self.assertFalse(self.men.has_children)
+        self.assertEqual(
+            set(
+                CategoryClosure.objects.filter(descendant=self.tops).values_list(
+                    "ancestor_id", flat=True
+                )
+            ),
+            {self.women.id, self.clothing.id, self.tops.id},
+        )
+
+    def test_parent_category_filter_reads_descendants(self):
+        seller = make_user("seller")
+        men_product = make_product(seller, "Shirt", category=self.tops)
+        make_product(seller, "Dress", category=self.women)
+
+        conditions = build_product_filter_conditions(
+            None, {"parent_category": mock.Mock(value="MEN")}
+        )
+
+        self.assertEqual(list(Product.objects.filter(conditions)), [men_product])
+
+    def test_tree_snapshot_serves_lookups_from_memory(self):
+        with mock.patch(
+            "utils.product_utils.reference_data._get_version", return_value=b"1"
+        ):
+            get_reference_data().categories
+
+            with self.assertNumQueries(0):
+                tree = get_reference_data().categories
+                roots = tree.get_children()
+                descendant_ids = tree.get_descendant_ids(self.men.id)
+                full_path = tree.get_full_path(self.tops.id)
+
+        self.assertEqual([root.name for root in roots], ["Men", "Women"])
+        self.assertEqual(
+            set(descendant_ids), {self.men.id, self.clothing.id, self.tops.id}
+        )
+        self.assertEqual(full_path, "Men > Clothing > Tops")
+
+
+@override_settings(REFERENCE_DATA_CHECK_INTERVAL=60)
+class ReferenceDataTestCase(TestCase):
+    SIZES_QUERY = """
+        query Sizes($path: String!) {
+            sizes(path: $path) { id name }
+        }
+    """
+
+    def setUp(self):
+        self.viewer = make_user("viewer")
+        self.small = Size.objects.create(
+            name="S",
+            size_type=SizeTypeChoices.MEN,
+            size_subtype=SizeSubTypeChoices.CLOTHING,
+        )
+        Size.objects.create(
+            name="42",
+            size_type=SizeTypeChoices.MEN,
+            size_subtype=SizeSubTypeChoices.SHOES,
+        )
+        self.brand = Brand.objects.create(name="Brand")
+
+    def execute_sizes(self, path):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.viewer
+        return schema.execute(
+            self.SIZES_QUERY, variable_values={"path": path}, context_value=request
+        )
+
+    def test_sizes_are_served_from_memory(self):
+        with mock.patch(
+            "utils.product_utils.reference_data._get_version", return_value=b"1"
+        ):
+            self.execute_sizes("Men > Clothing > Tops")
+
+            with self.assertNumQueries(0):
+                result = self.execute_sizes("Men > Clothing > Tops")
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["sizes"], [{"id": self.small.id, "name": "S"}])
+
+    def test_snapshot_reloads_on_change(self):
+        with mock.patch(
+            "utils.product_utils.reference_data._get_version", return_value=b"1"
+        ):
+            self.assertEqual(get_reference_data().brands[self.brand.id].name, "Brand")
+
+            self.brand.name = "Renamed"
+            self.brand.save()
+
+            self.assertEqual(get_reference_data().brands[self.brand.id].name, "Renamed")
+
+    def test_snapshot_reloads_when_another_process_bumps_the_version(self):
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0), mock.patch(
+            "utils.product_utils.reference_data._get_version"
+        ) as get_version:
+            get_version.return_value = b"1"
+            get_reference_data()
+            Brand.objects.filter(id=self.brand.id).update(name="Renamed")
+
+            self.assertEqual(get_reference_data().brands[self.brand.id].name, "Brand")
+
+            get_version.return_value = b"2"
+            self.assertEqual(get_reference_data().brands[self.brand.id].name, "Renamed")
+
+    def test_snapshot_expires_while_the_version_cannot_be_read(self):
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0), mock.patch(
+            "utils.product_utils.reference_data._get_version",
+            side_effect=redis.ConnectionError,
+        ), mock.patch.object(reference_data, "_warned_at", None), self.assertLogs(
+            "utils.product_utils.reference_data", "WARNING"
+        ) as logs:
+            get_reference_data()
+            Brand.objects.filter(id=self.brand.id).update(name="Renamed")
+
+            self.assertEqual(get_reference_data().brands[self.brand.id].name, "Renamed")
+
+        self.assertEqual(len(logs.records), 1)
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory")
+class PrefixIndexTestCase(IsolatedStateMixin, TestCase):
+    reset_globals = ((autocomplete_service, "_index"),)
+
+    BRAND_SUGGESTIONS_QUERY = """
+        query BrandSuggestions($prefix: String!, $limit: Int) {
+            brandSuggestions(prefix: $prefix, limit: $limit) { id name }
+        }
+    """
+
+    def test_matches_fold_case_and_accents_and_rank_by_popularity(self):
+        index = PrefixIndex(
+            [("Élan", 1, "elan"), ("Elegant", 5, "elegant"), ("Ember", 9, "ember")]
+        )
+
+        self.assertEqual(index.search("el"), ["elegant", "elan"])
+        self.assertEqual(index.search("ÉLA"), ["elan"])
+        self.assertEqual(index.search("e", limit=2), ["ember", "elegant"])
+        self.assertEqual(index.search("x"), [])
+
+    def test_brand_suggestions_query(self):
+        seller = make_user("seller")
+        nike = Brand.objects.create(name="Nike")
+        Brand.objects.create(name="Nikon")
+        make_product(seller, "Trainers", brand=nike)
+
+        self.assertEqual(self.suggest_brands("nik"), ["Nike", "Nikon"])
+
+    def test_suggestions_are_ranked_by_refreshed_product_counts(self):
+        seller = make_user("seller")
+        nike = Brand.objects.create(name="Nike")
+        nikon = Brand.objects.create(name="Nikon")
+        make_product(seller, "Camera", brand=nikon)
+        self.assertEqual(self.suggest_brands("nik"), ["Nikon", "Nike"])
+
+        # New listings count once the shared counts are refreshed, and a
+        # reference data change keeps the counts it has
+        make_product(seller, "Trainers", brand=nike)
+        make_product(seller, "Shorts", brand=nike)
+        Brand.objects.create(name="Nikko")
+        self.assertEqual(self.suggest_brands("nik"), ["Nikon", "Nike", "Nikko"])
+
+        AutocompleteService.refresh()
+        with override_settings(AUTOCOMPLETE_POPULARITY_TTL=0):
+            self.assertEqual(self.suggest_brands("nik"), ["Nike", "Nikon", "Nikko"])
+
+    def suggest_brands(self, prefix):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        result = schema.execute(
+            self.BRAND_SUGGESTIONS_QUERY,
+            variable_values={"prefix": prefix, "limit": 5},
+            context_value=request,
+        )
+
+        self.assertIsNone(result.errors)
+        return [brand["name"] for brand in result.data["brandSuggestions"]]
+
+
+class ProductSearchTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "search_index.pickle")
+
+        self.seller = make_user("seller")
+        self.jacket = make_product(
+            self.seller, "Vintage Leather Jacket", description="Barely worn"
+        )
+        self.coat = make_product(
+            self.seller, "Wool Coat", description="Goes well with a leather jacket"
+        )
+        self.dress = make_product(
+            self.seller, "Summer Dress", description="Light and flowy"
+        )
+
+    def build_index(self):
+        backend = EmbeddedSearchBackend(self.path)
+        backend.index_products(Product.objects.all())
+        backend.save()
+        return backend
+
+    def test_ranks_name_matches_first_and_matches_typos(self):
+        backend = self.build_index()
+
+        self.assertEqual(
+            backend.search("leather jacket"), [self.jacket.id, self.coat.id]
+        )
+        self.assertEqual(backend.search("jaket"), [self.jacket.id, self.coat.id])
+        self.assertEqual(backend.search("sumer dres"), [self.dress.id])
+        self.assertEqual(backend.search("boots"), [])
+
+    def test_index_is_updated_incrementally_and_reloaded_from_disk(self):
+        self.build_index()
+
+        writer = EmbeddedSearchBackend(self.path)
+        self.dress.name = "Leather Dress"
+        self.dress.save()
+        self.coat.deleted = True
+        self.coat.save()
+        writer.index_products([self.dress, self.coat])
+        writer.save()
+
+        reader = EmbeddedSearchBackend(self.path)
+        self.assertEqual(set(reader.search("leather")), {self.jacket.id, self.dress.id})
+
+    def test_all_products_are_ordered_by_relevance(self):
+        self.build_index()
+
+        with override_settings(
+            PRODUCT_SEARCH_BACKEND="embedded", SEARCH_INDEX_PATH=self.path
+        ), mock.patch.dict("utils.search_utils.search_backends._backends", clear=True):
+            products = ProductUtils.resolve_all_products(None, search="leather jacket")
+
+            self.assertEqual(list(products), [self.jacket, self.coat])
+
+
+@override_settings(
+    WRITE_BUFFER_BACKEND="memory",
+    PRODUCT_SEARCH_BACKEND="memory",
+    SEARCH_INDEX_FLUSH_INTERVAL=3600,
+    SEARCH_INDEX_BATCH_SIZE=2,
+    SEARCH_INDEX_MAX_ATTEMPTS=2,
+)
+class SearchSyncTestCase(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(
+            "utils.search_utils.search_backends._backends", clear=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = get_search_backend()
+
+        self.seller = make_user("seller")
+        self.products = [
+            make_product(self.seller, name)
+            for name in ["Leather Jacket", "Wool Coat", "Leather Boots"]
+        ]
+
+    def enqueue(self, products):
+        with self.captureOnCommitCallbacks(execute=True):
+            SearchSyncService.enqueue(product.id for product in products)
+
+    def test_changes_are_indexed_once_in_bulk_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SearchSyncService.enqueue([self.products[0].id])
+            self.products[0].name = "Black Leather Jacket"
+            self.products[0].save()
+            SearchSyncService.enqueue([self.products[0].id])
+        self.assertEqual(get_write_buffer().size(SearchSyncService.QUEUE_NAME), 1)
+
+        # Reaching the batch size flushes the local queue inline
+        self.enqueue(self.products[1:])
+
+        jacket, coat, boots = [product.id for product in self.products]
+        self.assertEqual(
+            self.backend.bulk_requests,
+            [[("index", jacket), ("index", coat)], [("index", boots)]],
+        )
+        self.assertEqual(self.backend.search("leather"), [boots, jacket])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductUtils.delete_product(self.seller, boots)
+        SearchSyncService.flush()
+
+        self.assertEqual(self.backend.bulk_requests[-1], [("delete", boots)])
+        self.assertEqual(self.backend.search("leather"), [jacket])
+
+    def test_failed_batches_are_retried_then_dead_lettered(self):
+        self.backend.fail_requests = 2
+        self.enqueue(self.products[:1])
+
+        self.assertEqual(SearchSyncService.flush(), 0)
+        self.assertEqual(get_write_buffer().size(SearchSyncService.QUEUE_NAME), 1)
+        with self.assertLogs("utils.search_utils.search_sync_service", "ERROR"):
+            self.assertEqual(SearchSyncService.flush(), 0)
+        self.assertEqual(get_write_buffer().size(SearchSyncService.QUEUE_NAME), 0)
+        self.assertEqual(
+            get_write_buffer().get(
+                SearchSyncService.DEAD_LETTER_NAME, str(self.products[0].id)
+            ),
+            "Search backend unavailable",
+        )
+
+        self.assertEqual(SearchSyncService.retry_dead_letters(), 1)
+        self.assertEqual(SearchSyncService.flush(), 1)
+        self.assertEqual(self.backend.search("jacket"), [self.products[0].id])
+
+    @override_settings(PRODUCT_SEARCH_BACKEND="database")
+    def test_nothing_is_queued_for_the_database_backend(self):
+        self.enqueue(self.products)
+
+        self.assertEqual(get_write_buffer().size(SearchSyncService.QUEUE_NAME), 0)
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory")
+class ProductFacetsTestCase(IsolatedStateMixin, TestCase):
+    QUERY = """
+        query Facets($filters: ProductFiltersInput, $search: String) {
+            productFacets(filters: $filters, search: $search) {
+                total
+                brands { value label count }
+                categories { value label count }
+                conditions { value count }
+                colors { value count }
+                prices { value count }
+            }
+        }
+    """
+
+    def setUp(self):
+        super().setUp()
+        seller = make_user("seller")
+        self.nike = Brand.objects.create(name="Nike")
+        self.zara = Brand.objects.create(name="Zara")
+        self.dresses = Category.objects.create(name="Dresses", slug="dresses")
+        self.coats = Category.objects.create(name="Coats", slug="coats")
+
+        products = [
+            make_product(
+                seller,
+                name,
+                price,
+                brand=brand,
+                category=category,
+                condition="Good Condition",
+                color=colors,
+            )
+            for name, price, brand, category, colors in [
+                ("Red Dress", 8, self.nike, self.dresses, ["Red"]),
+                ("Blue Dress", 30, self.zara, self.dresses, ["Blue", "Red"]),
+                ("Long Coat", 120, self.nike, self.coats, ["Black"]),
+                ("Short Coat", 300, self.nike, self.coats, ["Black"]),
+            ]
+        ]
+        ProductUtils.index_colors(products)
+
+    def execute(self, filters=None, search=None):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        result = schema.execute(
+            self.QUERY,
+            context_value=request,
+            variables={"filters": filters, "search": search},
+        )
+        self.assertIsNone(result.errors)
+        return result.data["productFacets"]
+
+    def test_counts_every_facet_for_the_filter_set(self):
+        facets = self.execute(filters={"category": self.coats.id})
+        self.assertEqual(facets["total"], 2)
+        self.assertEqual(
+            facets["brands"],
+            [{"value": str(self.nike.id), "label": "Nike", "count": 2}],
+        )
+        self.assertEqual(facets["colors"], [{"value": "black", "count": 2}])
+        self.assertEqual(
+            facets["prices"],
+            [{"value": "100-250", "count": 1}, {"value": "250+", "count": 1}],
+        )
+
+        facets = self.execute(search="dress")
+        self.assertEqual(facets["total"], 2)
+        self.assertEqual(
+            facets["categories"],
+            [{"value": str(self.dresses.id), "label": "Dresses", "count": 2}],
+        )
+        self.assertEqual(
+            facets["colors"],
+            [{"value": "red", "count": 2}, {"value": "blue", "count": 1}],
+        )
+        self.assertEqual(
+            facets["conditions"], [{"value": "Good Condition", "count": 2}]
+        )
+
+    def test_equivalent_filter_sets_share_a_cache_entry(self):
+        self.execute(filters={"colors": ["Black", "red"]})
+
+        with CaptureQueriesContext(connection) as queries:
+            facets = self.execute(filters={"colors": ["RED", "black "]})
+
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertEqual(facets["total"], 0)
+
+
+class ProductSimilarityTestCase(TestCase):
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.nike = Brand.objects.create(name="Nike")
+        self.dresses = Category.objects.create(name="Dresses", slug="dresses")
+        self.coats = Category.objects.create(name="Coats", slug="coats")
+
+    def test_batched_neighbours_match_dense_cosine_similarity(self):
+        rng = np.random.default_rng(7)
+        products = [
+            (
+                product_id,
+                int(rng.integers(3)),
+                int(rng.integers(4)),
+                None,
+                None,
+                None,
+                list(rng.choice(["red", "blue", "black"], size=rng.integers(3))),
+                float(rng.integers(1, 300)),
+            )
+            for product_id in range(100, 140)
+        ]
+        likes = [(int(rng.integers(100, 140)), int(rng.integers(5))) for _ in range(60)]
+        product_ids, matrix = SimilarityService.build_features(products, likes)
+
+        dense = np.zeros(matrix.shape)
+        for row in range(matrix.shape[0]):
+            start, end = matrix.row_pointers[row], matrix.row_pointers[row + 1]
+            dense[row, matrix.row_columns[start:end]] = matrix.row_values[start:end]
+        expected = dense @ dense.T
+        np.fill_diagonal(expected, 0)
+
+        neighbours = list(top_k_neighbours(matrix, k=5, batch_size=7))
+        self.assertEqual(len(neighbours), len(product_ids))
+        for row, rows, scores in neighbours:
+            np.testing.assert_allclose(
+                scores, np.sort(expected[row])[::-1][:5], rtol=1e-5
+            )
+            np.testing.assert_allclose(expected[row][rows], scores, rtol=1e-5)
+
+    def test_similar_products_are_served_from_the_precomputed_neighbours(self):
+        dress = make_product(
+            self.seller, "Slip Dress", 40, category=self.dresses, brand=self.nike
+        )
+        twin = make_product(
+            self.seller, "Midi Dress", 45, category=self.dresses, brand=self.nike
+        )
+        cousin = make_product(self.seller, "Maxi Dress", 200, category=self.dresses)
+        make_product(self.seller, "Wool Coat", 300, category=self.coats)
+        sold = make_product(
+            self.seller,
+            "Wrap Dress",
+            40,
+            category=self.dresses,
+            brand=self.nike,
+            status="SOLD",
+        )
+
+        self.assertEqual(SimilarityService.rebuild(top_k=2), 4)
+        self.assertFalse(ProductSimilarity.objects.filter(product=sold).exists())
+        self.assertEqual(
+            SimilarityService.get_similar_product_ids(dress.id), [twin.id, cousin.id]
+        )
+
+        twin.deleted = True
+        twin.save()
+        with self.assertNumQueries(2):
+            similar = list(ProductUtils.resolve_similar_products(product_id=dress.id))
+        self.assertEqual(similar, [cousin])
+
+        # Products listed since the last build fall back to their brand
+        new = make_product(
+            self.seller, "Shirt Dress", 40, category=self.dresses, brand=self.nike
+        )
+        self.assertEqual(
+            list(ProductUtils.resolve_similar_products(product_id=new.id)),
+            [dress],
+        )
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory")
+class RecommendationTestCase(IsolatedStateMixin, TestCase):
+    reset_globals = ((recommendation_service, "_index"),)
+
+    def setUp(self):
+        super().setUp()
+
+        self.seller = make_user("seller")
+        self.shopper = make_user("shopper")
+        nike = Brand.objects.create(name="Nike")
+        zara = Brand.objects.create(name="Zara")
+        dresses = Category.objects.create(name="Dresses", slug="dresses")
+        coats = Category.objects.create(name="Coats", slug="coats")
+
+        self.liked = [
+            make_product(self.seller, "Slip Dress", 40, category=dresses, brand=nike),
+            make_product(self.seller, "Wrap Dress", 45, category=dresses, brand=nike),
+        ]
+        self.match = make_product(
+            self.seller, "Midi Dress", 42, category=dresses, brand=nike
+        )
+        self.partial = make_product(
+            self.seller, "Maxi Dress", 300, category=dresses, brand=zara
+        )
+        self.popular = make_product(
+            self.seller, "Wool Coat", 120, category=coats, brand=zara, likes=90
+        )
+        self.own = make_product(
+            self.shopper, "Own Dress", 40, category=dresses, brand=nike
+        )
+        for product in self.liked:
+            ProductLike.objects.create(user=self.shopper, product=product)
+
+    def test_products_are_ranked_by_affinity_then_popularity(self):
+        self.assertEqual(RecommendationService.refresh_affinities(), 1)
+
+        products = list(ProductUtils.recommend_products(self.shopper))
+        self.assertEqual(products, [self.match, self.partial, self.popular])
+
+        # Cold-start users get the most popular and freshest products
+        newcomer = make_user("newcomer")
+        self.assertEqual(
+            list(ProductUtils.recommend_products(newcomer))[0], self.popular
+        )
+
+    @override_settings(RECOMMENDATIONS_LIMIT=1)
+    def test_feed_goes_on_by_popularity_past_the_ranked_products(self):
+        self.assertEqual(
+            list(ProductUtils.recommend_products(self.shopper)),
+            [self.match, self.popular, self.partial],
+        )
+
+    def test_affinity_is_rebuilt_when_the_user_likes(self):
+        newcomer = make_user("newcomer")
+        self.assertEqual(
+            RecommendationService.recommend_product_ids(newcomer.id)[0], self.popular.id
+        )
+        self.assertEqual(UserAffinity.objects.get(user=newcomer).features, [])
+
+        # Unflushed likes count, and drop the cached ranking
+        ProductUtils.like_product(newcomer, self.liked[0].id)
+        ProductUtils.like_product(newcomer, self.liked[1].id)
+        self.assertEqual(
+            set(RecommendationService.recommend_product_ids(newcomer.id)[:2]),
+            {self.match.id, self.own.id},
+        )
+
+        # An affinity older than the latest like is rebuilt
+        UserAffinity.objects.create(
+            user=self.shopper, features=[["category", self.popular.category_id, 1.0]]
+        )
+        ProductUtils.like_product(self.shopper, self.partial.id)
+        RecommendationService.recommend_product_ids(self.shopper.id)
+        self.assertIn(
+            ["brand", self.partial.brand_id],
+            [
+                feature[:2]
+                for feature in UserAffinity.objects.get(user=self.shopper).features
+            ],
+        )
+
+    def test_ranked_ids_are_cached_per_user(self):
+        first = RecommendationService.recommend_product_ids(self.shopper.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                RecommendationService.recommend_product_ids(self.shopper.id), first
+            )
+        self.assertTrue(UserAffinity.objects.filter(user=self.shopper).exists())
+
+    def test_recommend_products_query_is_paginated(self):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.shopper
+
+        result = schema.execute(
+            "{ recommendProducts(pageCount: 1) { id } }", context_value=request
+        )
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["recommendProducts"], [{"id": str(self.match.id)}])
+
+
+class SellerLeaderboardTestCase(TestCase):
+    def setUp(self):
+        self.top = make_user("top")
+        self.runner_up = make_user("runner-up")
+        self.sold_out = make_user("sold-out")
+
+        self.listing = make_product(self.runner_up, price=100)
+        make_product(self.runner_up, price=50)
+        sold = make_product(self.runner_up, price=80, status=StatusChoices.SOLD)
+        make_product(self.top, price=500)
+        make_product(self.sold_out, price=20, status=StatusChoices.SOLD)
+
+        self.order = Order.objects.create(
+            order_number="ORDER-1",
+            customer=self.top,
+            status="delivered",
+            subtotal=80,
+            total_amount=80,
+        )
+        OrderItem.objects.create(
+            order=self.order, product=sold, quantity=1, unit_price=80
+        )
+        ProductView.objects.create(product=self.listing, viewed_by=self.top)
+
+    def test_leaderboard_ranks_sellers_with_active_listings(self):
+        self.assertEqual(SellerLeaderboardService.refresh(), 2)
+
+        runner_up = SellerLeaderboard.objects.get(seller=self.runner_up)
+        self.assertEqual(runner_up.total_sales, Decimal("80.00"))
+        self.assertEqual(runner_up.total_shop_value, Decimal("150.00"))
+        self.assertEqual(runner_up.product_views, 1)
+        self.assertEqual(runner_up.active_listings, 2)
+        # 80 * 0.5 + 150 * 0.3 + 1 * 0.2
+        self.assertEqual(runner_up.seller_score, Decimal("85.20"))
+        self.assertEqual(
+            list(SellerLeaderboardService.get_top_sellers()),
+            [SellerLeaderboard.objects.get(seller=self.top), runner_up],
+        )
+
+    def test_refresh_only_recomputes_changed_sellers(self):
+        SellerLeaderboardService.refresh()
+        past = timezone.now() - timedelta(days=2)
+        SellerLeaderboard.objects.update(refreshed_at=past)
+        Product.objects.update(updated_at=past - timedelta(days=1))
+        ProductView.objects.update(created_at=past - timedelta(days=1))
+        Order.objects.update(updated_at=past - timedelta(days=1))
+
+        self.assertEqual(SellerLeaderboardService.refresh(), 0)
+
+        # The delivered order leaves the 30 day window
+        Order.objects.update(created_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(SellerLeaderboardService.refresh(), 1)
+        runner_up = SellerLeaderboard.objects.get(seller=self.runner_up)
+        self.assertEqual(runner_up.total_sales, Decimal("0.00"))
+        self.assertEqual(
+            SellerLeaderboard.objects.get(seller=self.top).refreshed_at, past
+        )
+
+        # Deleting a seller's last listing drops them from the leaderboard
+        top_product = Product.objects.get(seller=self.top)
+        ProductUtils.delete_product(self.top, top_product.id)
+        self.assertEqual(SellerLeaderboardService.refresh(), 1)
+        self.assertFalse(SellerLeaderboard.objects.filter(seller=self.top).exists())
+
+    def test_recommended_sellers_query_batch_loads_sellers(self):
+        SellerLeaderboardService.refresh()
+        request = RequestFactory().post("/graphql/")
+        request.user = self.top
+
+        with self.assertNumQueries(2):
+            result = schema.execute(
+                "{ recommendedSellers { seller { username } sellerScore activeListings } }",
+                context_value=request,
+            )
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            result.data["recommendedSellers"],
+            [
+                {
+                    "seller": {"username": "top"},
+                    "sellerScore": 150.0,
+                    "activeListings": 1,
+                },
+                {
+                    "seller": {"username": "runner-up"},
+                    "sellerScore": 85.2,
+                    "activeListings": 2,
+                },
+            ],
+        )
+
+
+@override_settings(WRITE_BUFFER_BACKEND="memory")
+class BrandPopularityTestCase(IsolatedStateMixin, TestCase):
+    reset_globals = ((brand_popularity_service, "_popularity"),)
+
+    def setUp(self):
+        super().setUp()
+
+        self.seller = make_user("seller")
+        self.shopper = make_user("shopper")
+        self.nike = Brand.objects.create(name="Nike")
+        self.zara = Brand.objects.create(name="Zara")
+        self.gucci = Brand.objects.create(name="Gucci")
+        self.women = Category.objects.create(name="Women", slug="women")
+        self.dresses = Category.objects.create(
+            name="Dresses", slug="dresses", parent=self.women
+        )
+
+        self.nike_product = make_product(
+            self.seller, brand=self.nike, category=self.women, likes=10
+        )
+        self.zara_product = make_product(
+            self.seller, brand=self.zara, category=self.dresses, views=40
+        )
+        self.gucci_product = make_product(
+            self.seller,
+            brand=self.gucci,
+            category=self.dresses,
+            likes=100,
+            deleted=True,
+        )
+
+    def test_brands_are_ranked_overall_and_per_category(self):
+        self.assertEqual(
+            BrandPopularityService.get_top_brand_ids(), [self.zara.id, self.nike.id]
+        )
+        self.assertEqual(
+            BrandPopularityService.get_top_brand_ids(self.women.id),
+            [self.zara.id, self.nike.id],
+        )
+        self.assertEqual(
+            BrandPopularityService.get_top_brand_ids(self.dresses.id), [self.zara.id]
+        )
+
+    def test_cold_start_brands_are_served_from_memory(self):
+        get_cold_start_brands(self.shopper.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                get_cold_start_brands(self.shopper.id)["brand_ids"],
+                [self.zara.id, self.nike.id],
+            )
+
+    def test_favorite_brand_feed_is_cached_until_the_user_likes(self):
+        self.assertEqual(
+            BrandPopularityService.get_feed_product_ids(self.shopper.id),
+            [self.zara_product.id, self.nike_product.id],
+        )
+        with self.assertNumQueries(0):
+            BrandPopularityService.get_feed_product_ids(self.shopper.id)
+
+        other_nike = make_product(self.seller, brand=self.nike, category=self.women)
+        ProductUtils.like_product(self.shopper, self.nike_product.id)
+        ProductUtils.like_product(self.shopper, other_nike.id)
+
+        self.assertEqual(
+            BrandPopularityService.get_feed_product_ids(self.shopper.id),
+            [other_nike.id, self.nike_product.id],
+        )
+
+    def test_favorite_brand_products_query(self):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.shopper
+
+        result = schema.execute(
+            "{ favoriteBrandProducts(top: 1) { id } }", context_value=request
+        )
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            result.data["favoriteBrandProducts"], [{"id": str(self.zara_product.id)}]
+        )
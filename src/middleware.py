@@ -1,10 +1,12 @@
 import logging
 
 import jwt
-from django.core.cache import cache
 from graphql import GraphQLError
 from graphql_jwt.middleware import allow_any
 
+from utils.account_utils.presence_service import PresenceService
+from utils.security.token_revocation import revoked_tokens
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,35 +29,46 @@ class JWTBlacklistMiddleware:
             return next(root, info, **args)
 
         request = info.context
+
+        # Check the token once per request rather than once per resolved field
+        revocation_error = getattr(request, "jwt_revocation_error", None)
+        if revocation_error is None:
+            revocation_error = self.get_revocation_error(request)
+            request.jwt_revocation_error = revocation_error
+
+        if revocation_error:
+            raise GraphQLError(revocation_error)
+
+        return next(root, info, **args)
+
+    @staticmethod
+    def get_revocation_error(request):
+        """Return why the request's token is rejected, or an empty string."""
         auth_header = request.META.get("HTTP_AUTHORIZATION", "")
 
         if auth_header:
             try:
                 token_type, token = auth_header.split()
                 if token_type == "Bearer":
-                    if cache.get(f"blacklisted_token:{token}"):
-                        raise GraphQLError("Token has been revoked")
+                    if revoked_tokens.is_revoked(token):
+                        return "Token has been revoked"
 
             except jwt.ExpiredSignatureError:
-                raise GraphQLError("Token has expired")
+                return "Token has expired"
             except jwt.InvalidTokenError:
-                raise GraphQLError("Invalid token")
+                return "Invalid token"
 
-        return next(root, info, **args)
+        return ""
 
 
 class LastSeenMiddleware:
     def resolve(self, next, root, info, **kwargs):
         request = info.context
-        if request.user.is_authenticated:
-            from django.utils import timezone
-
-            current_time = timezone.now()
-            if (
-                not request.user.last_seen
-                or (current_time - request.user.last_seen).total_seconds() > 240
-            ):
-                request.user.last_seen = current_time
-                request.user.save(update_fields=["last_seen"])
+        if request.user.is_authenticated and not getattr(
+            request, "last_seen_recorded", False
+        ):
+            # Buffered and flushed in bulk by flush_last_seen, once per request
+            PresenceService.record_seen(request.user.id)
+            request.last_seen_recorded = True
 
         return next(root, info, **kwargs)
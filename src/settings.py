@@ -225,6 +225,54 @@ OUTFEATZ = "OUTFEATZ"
 UPLOAD_BASE_URL = f"https://{BUCKET}.s3.eu-west-2.amazonaws.com/"
 
 REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+# Write-behind buffers ("redis" or "memory" for a per-process buffer)
+WRITE_BUFFER_BACKEND = config("WRITE_BUFFER_BACKEND", default="redis")
+# Seconds between flushes of buffered product views
+PRODUCT_VIEW_FLUSH_INTERVAL = config("PRODUCT_VIEW_FLUSH_INTERVAL", default=60, cast=int)
+# Seconds between flushes of buffered product likes
+PRODUCT_LIKE_FLUSH_INTERVAL = config("PRODUCT_LIKE_FLUSH_INTERVAL", default=10, cast=int)
+# Seconds between syncs of recently viewed lists to the database
+RECENTLY_VIEWED_SYNC_INTERVAL = config("RECENTLY_VIEWED_SYNC_INTERVAL", default=300, cast=int)
+# Seconds a process may go without pulling new token revocations
+REVOKED_TOKENS_SYNC_INTERVAL = config("REVOKED_TOKENS_SYNC_INTERVAL", default=5, cast=int)
+# Seconds between recordings of a user's activity, per process
+LAST_SEEN_THROTTLE = config("LAST_SEEN_THROTTLE", default=60, cast=int)
+# Seconds between flushes of buffered last seen times
+LAST_SEEN_FLUSH_INTERVAL = config("LAST_SEEN_FLUSH_INTERVAL", default=120, cast=int)
+# Seconds since their last activity during which a user counts as online
+ONLINE_NOW_WINDOW = config("ONLINE_NOW_WINDOW", default=300, cast=int)
+# Seconds between flushes of buffered search history
+SEARCH_HISTORY_FLUSH_INTERVAL = config("SEARCH_HISTORY_FLUSH_INTERVAL", default=30, cast=int)
+# Seconds a process may serve its reference data snapshot without checking for changes
+REFERENCE_DATA_CHECK_INTERVAL = config("REFERENCE_DATA_CHECK_INTERVAL", default=30, cast=int)
+# Product search backend: "database", "embedded", "elasticsearch" or "memory"
+PRODUCT_SEARCH_BACKEND = config("PRODUCT_SEARCH_BACKEND", default="database")
+# File holding the embedded search index
+SEARCH_INDEX_PATH = config("SEARCH_INDEX_PATH", default=os.path.join(BASE_DIR, "search_index.pickle"))
+# Most ranked matches a search backend returns
+SEARCH_MAX_RESULTS = config("SEARCH_MAX_RESULTS", default=1000, cast=int)
+# Seconds product facet counts are cached per filter set
+PRODUCT_FACETS_CACHE_TIMEOUT = config("PRODUCT_FACETS_CACHE_TIMEOUT", default=60, cast=int)
+# Neighbours precomputed per product for similar products
+SIMILAR_PRODUCTS_TOP_K = config("SIMILAR_PRODUCTS_TOP_K", default=50, cast=int)
+# Most products ranked by affinity into a user's recommendations, the feed goes on by popularity
+RECOMMENDATIONS_LIMIT = config("RECOMMENDATIONS_LIMIT", default=200, cast=int)
+# Seconds a user's ranked recommendations are cached
+RECOMMENDATIONS_CACHE_TIMEOUT = config("RECOMMENDATIONS_CACHE_TIMEOUT", default=300, cast=int)
+# Seconds a process serves recommendations from its product feature index before rebuilding it
+RECOMMENDATION_INDEX_TTL = config("RECOMMENDATION_INDEX_TTL", default=600, cast=int)
+# Seconds a process serves popular brands from memory before reloading them
+BRAND_POPULARITY_TTL = config("BRAND_POPULARITY_TTL", default=300, cast=int)
+# Seconds a process ranks brand and material autocomplete by the same product counts
+AUTOCOMPLETE_POPULARITY_TTL = config("AUTOCOMPLETE_POPULARITY_TTL", default=300, cast=int)
+# Seconds a user's favorite-brand feed is cached
+FAVORITE_BRAND_FEED_CACHE_TIMEOUT = config("FAVORITE_BRAND_FEED_CACHE_TIMEOUT", default=300, cast=int)
+# Seconds between flushes of products queued for indexing
+SEARCH_INDEX_FLUSH_INTERVAL = config("SEARCH_INDEX_FLUSH_INTERVAL", default=10, cast=int)
+# Most products sent to the search backend in one bulk request
+SEARCH_INDEX_BATCH_SIZE = config("SEARCH_INDEX_BATCH_SIZE", default=500, cast=int)
+# Failed indexing attempts before a product is moved to the dead-letter list
+SEARCH_INDEX_MAX_ATTEMPTS = config("SEARCH_INDEX_MAX_ATTEMPTS", default=5, cast=int)
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
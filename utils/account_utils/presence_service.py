@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, Set
+
+import redis
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from accounts.models import User
+from utils.non_modular_utils.write_buffer import get_write_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceService:
+    """
+    Last-seen tracking and presence.
+
+    A user's activity is written to a ranked set scored by time, which answers
+    "online now" directly, and to the write buffer, from which `flush_last_seen`
+    applies every pending User.last_seen in a single UPDATE ... CASE per batch.
+    Each process records a user at most once per `LAST_SEEN_THROTTLE` seconds.
+    """
+
+    BUFFER_NAME = "last-seen"
+    PRESENCE_NAME = "presence"
+    PRESENCE_TIMEOUT = 60 * 60 * 24
+    FLUSH_BATCH_SIZE = 1000
+    MAX_THROTTLED_USERS = 100_000
+
+    _lock = threading.Lock()
+    _recorded = {}
+
+    @staticmethod
+    def record_seen(user_id: int) -> None:
+        now = time.monotonic()
+        with PresenceService._lock:
+            recorded_at = PresenceService._recorded.get(user_id)
+            if (
+                recorded_at is not None
+                and now - recorded_at < settings.LAST_SEEN_THROTTLE
+            ):
+                return
+            if len(PresenceService._recorded) >= PresenceService.MAX_THROTTLED_USERS:
+                PresenceService._recorded.clear()
+            PresenceService._recorded[user_id] = now
+
+        seen_at = timezone.now().timestamp()
+        buffer = get_write_buffer()
+
+        try:
+            buffer.add_ranked(
+                PresenceService.PRESENCE_NAME,
+                {str(user_id): seen_at},
+                None,
+                PresenceService.PRESENCE_TIMEOUT,
+            )
+            buffer.set(PresenceService.BUFFER_NAME, {str(user_id): seen_at})
+        except redis.RedisError as e:
+            logger.warning(f"Could not record last seen: {e}")
+            return
+
+        if buffer.should_flush(
+            PresenceService.BUFFER_NAME, settings.LAST_SEEN_FLUSH_INTERVAL
+        ):
+            PresenceService.flush_last_seen()
+
+    @staticmethod
+    def get_last_seen(user_ids: Iterable[int]) -> Dict[int, datetime]:
+        """Return the last activity recorded in the presence set, by user id."""
+        try:
+            scores = get_write_buffer().get_scores(
+                PresenceService.PRESENCE_NAME, [str(user_id) for user_id in user_ids]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not read presence: {e}")
+            return {}
+
+        return {
+            int(user_id): datetime.fromtimestamp(seen_at, dt_timezone.utc)
+            for user_id, seen_at in scores.items()
+        }
+
+    @staticmethod
+    def get_online_user_ids(user_ids: Iterable[int]) -> Set[int]:
+        """Return which of the given users were active within `ONLINE_NOW_WINDOW` seconds."""
+        online_since = timezone.now().timestamp() - settings.ONLINE_NOW_WINDOW
+
+        return {
+            user_id
+            for user_id, seen_at in PresenceService.get_last_seen(user_ids).items()
+            if seen_at.timestamp() >= online_since
+        }
+
+    @staticmethod
+    def is_online(user_id: int) -> bool:
+        return user_id in PresenceService.get_online_user_ids([user_id])
+
+    @staticmethod
+    def flush_last_seen() -> int:
+        """Write buffered activity to User.last_seen and return the number of users updated."""
+        buffer = get_write_buffer()
+        buffered = buffer.drain(PresenceService.BUFFER_NAME)
+        last_seen = [
+            (int(user_id), datetime.fromtimestamp(float(seen_at), dt_timezone.utc))
+            for user_id, seen_at in buffered.items()
+        ]
+
+        try:
+            for offset in range(0, len(last_seen), PresenceService.FLUSH_BATCH_SIZE):
+                batch = last_seen[offset : offset + PresenceService.FLUSH_BATCH_SIZE]
+                User.objects.filter(id__in=[user_id for user_id, _ in batch]).update(
+                    last_seen=Case(
+                        *[
+                            When(id=user_id, then=Value(seen_at))
+                            for user_id, seen_at in batch
+                        ],
+                        output_field=DateTimeField(),
+                    )
+                )
+        except Exception:
+            # Keep the drained activity for the next flush. Batches that were
+            # written are written again, which sets the same values
+            buffer.restore(PresenceService.BUFFER_NAME, buffered)
+            raise
+
+        # Entries older than a day can no longer count as online
+        buffer.remove_ranked_below(
+            PresenceService.PRESENCE_NAME,
+            timezone.now().timestamp() - PresenceService.PRESENCE_TIMEOUT,
+        )
+
+        return len(last_seen)
@@ -0,0 +1,133 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+from accounts.models import User
+from analytics.models import CustomerAnalytics
+from orders.models import Order, OrderItem, Wishlist
+from products.models import ProductView
+from reviews.models import Review
+
+METRIC_FIELDS = [
+    "total_orders",
+    "total_spent",
+    "average_order_value",
+    "total_products_viewed",
+    "total_products_purchased",
+    "total_products_wishlisted",
+    "total_reviews_given",
+    "average_rating_given",
+    "last_login",
+    "days_since_last_order",
+]
+
+
+class CustomerAnalyticsService:
+    """
+    Set-based computation of CustomerAnalytics.
+
+    The metrics of a batch of customers take one grouped query per source
+    table (orders, order items, views, wishlists, reviews and logins), however
+    many orders each customer has, and are upserted in one statement per
+    batch, which also creates the rows of new customers.
+    """
+
+    @staticmethod
+    def compute_metrics(user_ids: List[int]) -> Dict[int, dict]:
+        """Return the CustomerAnalytics metrics of the given users, by user id."""
+        now = timezone.now()
+        metrics = {
+            user_id: {
+                "total_orders": 0,
+                "total_spent": Decimal("0.00"),
+                "average_order_value": Decimal("0.00"),
+                "total_products_viewed": 0,
+                "total_products_purchased": 0,
+                "total_products_wishlisted": 0,
+                "total_reviews_given": 0,
+                "average_rating_given": Decimal("0.00"),
+                "last_login": None,
+                "days_since_last_order": None,
+            }
+            for user_id in user_ids
+        }
+
+        for user_id, count, spent, last_order in (
+            Order.objects.filter(customer_id__in=user_ids)
+            .order_by()
+            .values("customer_id")
+            .annotate(
+                count=Count("id"), spent=Sum("total_amount"), last=Max("created_at")
+            )
+            .values_list("customer_id", "count", "spent", "last")
+        ):
+            spent = spent or Decimal("0.00")
+            metrics[user_id].update(
+                total_orders=count,
+                total_spent=spent,
+                average_order_value=(spent / count).quantize(Decimal("0.01")),
+                days_since_last_order=(now - last_order).days,
+            )
+
+        counts = {
+            "total_products_purchased": OrderItem.objects.filter(
+                order__customer_id__in=user_ids
+            ).values_list("order__customer_id"),
+            "total_products_viewed": ProductView.objects.filter(
+                viewed_by_id__in=user_ids
+            ).values_list("viewed_by_id"),
+            "total_products_wishlisted": Wishlist.objects.filter(
+                user_id__in=user_ids
+            ).values_list("user_id"),
+        }
+        for field, queryset in counts.items():
+            for user_id, count in queryset.order_by().annotate(count=Count("id")):
+                metrics[user_id][field] = count
+
+        for user_id, count, rating in (
+            Review.objects.filter(user_id__in=user_ids)
+            .order_by()
+            .values("user_id")
+            .annotate(count=Count("id"), rating=Avg("rating"))
+            .values_list("user_id", "count", "rating")
+        ):
+            metrics[user_id].update(
+                total_reviews_given=count,
+                average_rating_given=Decimal(rating).quantize(Decimal("0.01")),
+            )
+
+        for user_id, last_login in User.objects.filter(id__in=user_ids).values_list(
+            "id", "last_login"
+        ):
+            metrics[user_id]["last_login"] = last_login
+
+        return metrics
+
+    @staticmethod
+    def refresh(
+        user_ids: Optional[Iterable[int]] = None, batch_size: int = 1000
+    ) -> int:
+        """
+        Recompute the analytics of the given users, or of every user, creating
+        missing rows, and return how many were refreshed.
+        """
+        if user_ids is None:
+            user_ids = User.objects.order_by("id").values_list("id", flat=True)
+        user_ids = list(user_ids)
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start : start + batch_size]
+            metrics = CustomerAnalyticsService.compute_metrics(batch)
+
+            CustomerAnalytics.objects.bulk_create(
+                [
+                    CustomerAnalytics(user_id=user_id, **metrics[user_id])
+                    for user_id in batch
+                ],
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=METRIC_FIELDS + ["updated_at"],
+            )
+
+        return len(user_ids)
@@ -0,0 +1,186 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+from accounts.models import User
+from products.models import Brand, Category, Material, Product, Size
+from utils.product_utils.like_service import LikeService
+from utils.product_utils.reference_data import get_reference_data
+
+
+class BatchLoader:
+    """
+    Request-scoped loader that coalesces lookups into a single `IN (...)` query.
+
+    List resolvers prime the loader with every key on the current page; the
+    first `load` call then fetches all pending keys at once and every later
+    call for the page is answered from the loader's cache.
+    """
+
+    default = None
+
+    def __init__(self):
+        self._pending = set()
+        self._cache = {}
+
+    def batch_load(self, keys: List[Any]) -> Dict[Any, Any]:
+        """Return a mapping of key -> value for the given keys."""
+        raise NotImplementedError
+
+    def prime(self, keys: Iterable[Any]) -> None:
+        self._pending.update(
+            key for key in keys if key is not None and key not in self._cache
+        )
+
+    def load(self, key: Any) -> Any:
+        if key is None:
+            return self.default
+
+        if key not in self._cache:
+            self._pending.add(key)
+            self._dispatch()
+
+        return self._cache.get(key, self.default)
+
+    def _dispatch(self) -> None:
+        keys = list(self._pending)
+        self._pending.clear()
+
+        results = self.batch_load(keys)
+        for key in keys:
+            self._cache[key] = results.get(key, self.default)
+
+
+class ModelLoader(BatchLoader):
+    """Loads model instances by primary key."""
+
+    model = None
+
+    def batch_load(self, keys):
+        return self.model.objects.in_bulk(keys)
+
+
+class SellerLoader(ModelLoader):
+    model = User
+
+
+class ReferenceLoader(BatchLoader):
+    """
+    Loads reference rows by primary key from the process's reference data
+    snapshot, falling back to the database for rows newer than the snapshot.
+    """
+
+    model = None
+    attribute = None
+
+    def get_snapshot(self):
+        return getattr(get_reference_data(), self.attribute)
+
+    def batch_load(self, keys):
+        snapshot = self.get_snapshot()
+        results = {key: snapshot.get(key) for key in keys}
+        results = {key: value for key, value in results.items() if value is not None}
+
+        missing = [key for key in keys if key not in results]
+        if missing:
+            results.update(self.model.objects.in_bulk(missing))
+
+        return results
+
+
+class BrandLoader(ReferenceLoader):
+    model = Brand
+    attribute = "brands"
+
+
+class CategoryLoader(ReferenceLoader):
+    model = Category
+
+    def get_snapshot(self):
+        return get_reference_data().categories
+
+
+class SizeLoader(ReferenceLoader):
+    model = Size
+    attribute = "sizes"
+
+
+class MaterialsLoader(BatchLoader):
+    """Loads the materials of each product, keyed by product id."""
+
+    def batch_load(self, keys):
+        through = Product.materials.through
+        rows = through.objects.filter(product_id__in=keys).values_list(
+            "product_id", "material_id"
+        )
+
+        snapshot = get_reference_data().materials
+        material_ids = {material_id for _, material_id in rows}
+        known = {
+            material_id: snapshot[material_id]
+            for material_id in material_ids
+            if material_id in snapshot
+        }
+        known.update(Material.objects.in_bulk(material_ids - known.keys()))
+
+        materials = defaultdict(list)
+        for product_id, material_id in rows:
+            if material_id in known:
+                materials[product_id].append(known[material_id])
+
+        for product_materials in materials.values():
+            product_materials.sort(key=lambda material: material.name)
+
+        # A list of its own per product, so callers may change it
+        return {key: materials.get(key) or [] for key in keys}
+
+
+class UserLikedLoader(BatchLoader):
+    """Loads whether the request user has liked each product, keyed by product id."""
+
+    default = False
+
+    def __init__(self, user):
+        super().__init__()
+        self.user = user
+
+    def batch_load(self, keys):
+        if not self.user or not self.user.is_authenticated:
+            return {}
+
+        liked_ids = LikeService.get_liked_product_ids(self.user.id)
+
+        return {product_id: True for product_id in keys if product_id in liked_ids}
+
+
+class ProductLoaders:
+    """Bundle of the loaders backing `ProductType` relations for one request."""
+
+    CONTEXT_ATTRIBUTE = "product_loaders"
+
+    def __init__(self, user=None):
+        self.seller = SellerLoader()
+        self.brand = BrandLoader()
+        self.category = CategoryLoader()
+        self.size = SizeLoader()
+        self.materials = MaterialsLoader()
+        self.user_liked = UserLikedLoader(user)
+
+    @classmethod
+    def from_context(cls, context) -> "ProductLoaders":
+        """Return the loaders attached to the request, creating them on first use."""
+        loaders = getattr(context, cls.CONTEXT_ATTRIBUTE, None)
+        if loaders is None:
+            loaders = cls(getattr(context, "user", None))
+            setattr(context, cls.CONTEXT_ATTRIBUTE, loaders)
+        return loaders
+
+    def prime(self, products: Iterable[Product]) -> None:
+        """Register a page of products so their relations load in one query each."""
+        products = [product for product in products if product is not None]
+
+        self.seller.prime(product.seller_id for product in products)
+        self.brand.prime(product.brand_id for product in products)
+        self.category.prime(product.category_id for product in products)
+        self.size.prime(product.size_id for product in products)
+        self.materials.prime(product.id for product in products)
+        self.user_liked.prime(product.id for product in products)
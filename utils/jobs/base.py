@@ -1,26 +1,113 @@
+import functools
+import inspect
+import logging
+import time
+
 import celery
 import redis
 from django.conf import settings
 
 REDIS_CLIENT = redis.from_url(settings.REDIS_URL)
 
-def only_one(function=None):
-    """Enforce only one celery task at a time."""
+# only_one modes, see its docstring
+WAIT = "wait"
+SKIP = "skip"
+COALESCE = "coalesce"
+
+logger = logging.getLogger(__name__)
+
+LOCK_METRICS_PREFIX = "celery-lock-metrics-"
+
+
+def get_lock_key(run_func, key, args, kwargs):
+    """
+    Derive the lock scope of a call. `key` is the name of an argument, a tuple
+    of argument names, or a callable receiving the call's arguments.
+    """
+    if key is None:
+        return ""
+    if callable(key):
+        return str(key(*args, **kwargs))
+
+    arguments = inspect.signature(run_func).bind(*args, **kwargs).arguments
+    names = (key,) if isinstance(key, str) else key
+    return ":".join(str(arguments.get(name)) for name in names)
+
+
+def record_lock_metrics(name, wait_time=0.0, hold_time=0.0, skipped=False):
+    """Accumulate lock wait/hold times per task in a Redis hash."""
+    try:
+        pipeline = REDIS_CLIENT.pipeline()
+        metrics_key = LOCK_METRICS_PREFIX + name
+        if skipped:
+            pipeline.hincrby(metrics_key, "skipped", 1)
+        else:
+            pipeline.hincrby(metrics_key, "acquired", 1)
+            pipeline.hincrbyfloat(metrics_key, "wait_seconds", wait_time)
+            pipeline.hincrbyfloat(metrics_key, "hold_seconds", hold_time)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not record lock metrics for {name}: {e}")
+
+
+def get_lock_metrics(name):
+    """Return the accumulated lock metrics of a task."""
+    metrics = REDIS_CLIENT.hgetall(LOCK_METRICS_PREFIX + name)
+    return {field.decode(): float(value) for field, value in metrics.items()}
+
+
+def only_one(function=None, key=None, mode=WAIT, timeout=60 * 5):
+    """
+    Enforce only one celery task at a time.
+
+    By default the lock is per task, so the task runs as a singleton. Passing
+    `key` scopes the lock to the given arguments instead (e.g. key="user_id"),
+    so calls for different keys run in parallel and only calls for the same key
+    are serialized.
+
+    `mode` decides what a call does when the lock is taken:
+        WAIT     block until the lock is released, then run.
+        SKIP     return None without running.
+        COALESCE return None without running, and have the current holder run
+                 once more when it finishes. For tasks where one run covers all
+                 pending work, such as buffer flushes.
+    """
 
     def _dec(run_func):
         """Decorator."""
 
+        @functools.wraps(run_func)
         def _caller(*args, **kwargs):
             """Caller."""
             ret_value = None
             have_lock = False
-            timeout = 60 * 5
             lock_id = "celery-single-instance-" + run_func.__name__
+            lock_key = get_lock_key(run_func, key, args, kwargs)
+            if lock_key:
+                lock_id = f"{lock_id}:{lock_key}"
+            rerun_id = f"{lock_id}:rerun"
             lock = REDIS_CLIENT.lock(lock_id, timeout=timeout)
+
+            started = time.monotonic()
             try:
-                have_lock = lock.acquire(blocking=True)
-                if have_lock:
+                have_lock = lock.acquire(blocking=mode == WAIT)
+                if not have_lock:
+                    if mode == COALESCE:
+                        REDIS_CLIENT.set(rerun_id, 1, ex=timeout)
+                    record_lock_metrics(run_func.__name__, skipped=True)
+                    return None
+
+                acquired = time.monotonic()
+                ret_value = run_func(*args, **kwargs)
+                while mode == COALESCE and REDIS_CLIENT.delete(rerun_id):
+                    lock.reacquire()
                     ret_value = run_func(*args, **kwargs)
+
+                record_lock_metrics(
+                    run_func.__name__,
+                    wait_time=acquired - started,
+                    hold_time=time.monotonic() - acquired,
+                )
             finally:
                 if have_lock:
                     lock.release()
@@ -1,11 +1,10 @@
 from accounts.models import User
 from notifications.schema.mutations.notification_mutations import CreateNotification
 from products.choices import OrderStatusChoices
-from products.models import Order, RecentlyViewedProduct
-from utils.jobs.base import BaseTaskWithRetry, only_one
+from products.models import Order
+from utils.jobs.base import COALESCE, BaseTaskWithRetry, only_one
 from django.utils import timezone
 from celery import shared_task
-from django.db import transaction
 from utils.non_modular_utils.errors import ErrorException, GenericError
 from django.core.management import call_command
 from celery.utils.log import get_task_logger
@@ -69,15 +68,187 @@ def run_product_upload_checks(product_id):
     checker.perform_checks()
 
 
+@shared_task(bind=True, base=BaseTaskWithRetry, name="reshuffle_product_feed")
+@only_one
+def reshuffle_product_feed(self):
+    """
+    Celery task to re-roll the shuffle keys behind the default product feed
+    """
+    from utils.product_utils.product_utils import ProductUtils
+
+    updated = ProductUtils.reshuffle_products()
+    logger.info(f"reshuffled {updated} products")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="build_product_similarity")
+@only_one(timeout=60 * 60)
+def build_product_similarity(self):
+    """
+    Celery task to recompute the precomputed similar products of every listed
+    product. Schedule it nightly.
+    """
+    from utils.product_utils.similarity_service import SimilarityService
+
+    stored = SimilarityService.rebuild()
+    logger.info(f"stored similar products of {stored} products")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="build_user_affinities")
+@only_one(timeout=60 * 60)
+def build_user_affinities(self):
+    """
+    Celery task to recompute the product feature affinities behind recommended
+    products. Schedule it nightly.
+    """
+    from utils.product_utils.recommendation_service import RecommendationService
+
+    refreshed = RecommendationService.refresh_affinities()
+    logger.info(f"refreshed {refreshed} user affinities")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="refresh_seller_leaderboard")
+@only_one(mode=COALESCE)
+def refresh_seller_leaderboard(self):
+    """
+    Celery task to recompute the recommended sellers leaderboard for the
+    sellers changed since its last run. Schedule it every few minutes.
+    """
+    from utils.product_utils.seller_leaderboard_service import SellerLeaderboardService
+
+    refreshed = SellerLeaderboardService.refresh()
+    logger.info(f"refreshed {refreshed} leaderboard sellers")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="refresh_brand_popularity")
+@only_one(mode=COALESCE)
+def refresh_brand_popularity(self):
+    """
+    Celery task to rerank the popular brands served to users without likes.
+    Schedule it more often than BRAND_POPULARITY_TTL.
+    """
+    from utils.product_utils.brand_popularity_service import BrandPopularityService
+
+    popularity = BrandPopularityService.refresh()
+    logger.info(f"ranked {len(popularity.brand_ids)} popular brands")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="refresh_autocomplete_popularity")
+@only_one(mode=COALESCE)
+def refresh_autocomplete_popularity(self):
+    """
+    Celery task to recount the listed products that rank brand and material
+    autocomplete. Schedule it more often than AUTOCOMPLETE_POPULARITY_TTL.
+    """
+    from utils.product_utils.autocomplete_service import AutocompleteService
+
+    popularity = AutocompleteService.refresh()
+    logger.info(
+        f"counted the products of {len(popularity['brands'])} brands and "
+        f"{len(popularity['materials'])} materials"
+    )
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="refresh_customer_analytics")
+@only_one(timeout=60 * 60)
+def refresh_customer_analytics(self):
+    """
+    Celery task to recompute the analytics of every customer. Schedule it
+    nightly.
+    """
+    from utils.analytics_utils.customer_analytics_service import (
+        CustomerAnalyticsService,
+    )
+
+    refreshed = CustomerAnalyticsService.refresh()
+    logger.info(f"refreshed the analytics of {refreshed} customers")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="flush_product_views")
+@only_one(mode=COALESCE)
+def flush_product_views(self):
+    """
+    Celery task to apply buffered product views to the database.
+    Schedule it every PRODUCT_VIEW_FLUSH_INTERVAL seconds.
+    """
+    from utils.product_utils.view_counter_service import ViewCounterService
+
+    flushed = ViewCounterService.flush_views()
+    logger.info(f"flushed {flushed} product views")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="flush_product_likes")
+@only_one(mode=COALESCE)
+def flush_product_likes(self):
+    """
+    Celery task to apply buffered likes and unlikes to the database.
+    Schedule it every PRODUCT_LIKE_FLUSH_INTERVAL seconds.
+    """
+    from utils.product_utils.like_service import LikeService
+
+    flushed = LikeService.flush_likes()
+    logger.info(f"flushed {flushed} product likes")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="flush_last_seen")
+@only_one(mode=COALESCE)
+def flush_last_seen(self):
+    """
+    Celery task to write buffered user activity to User.last_seen.
+    Schedule it every LAST_SEEN_FLUSH_INTERVAL seconds.
+    """
+    from utils.account_utils.presence_service import PresenceService
+
+    flushed = PresenceService.flush_last_seen()
+    logger.info(f"flushed last seen of {flushed} users")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="flush_search_history")
+@only_one(mode=COALESCE)
+def flush_search_history(self):
+    """
+    Celery task to write buffered searches to SearchHistory and the search rollups.
+    Schedule it every SEARCH_HISTORY_FLUSH_INTERVAL seconds.
+    """
+    from utils.search_utils.search_utils import SearchUtils
+
+    flushed = SearchUtils.flush_search_history()
+    logger.info(f"flushed {flushed} search history entries")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="prune_search_rollups")
+@only_one
+def prune_search_rollups(self):
+    """
+    Celery task to delete search rollups that are no longer queried
+    """
+    from utils.search_utils.search_utils import SearchUtils
+
+    deleted = SearchUtils.prune_rollups()
+    logger.info(f"pruned {deleted} search rollups")
+
+
+@shared_task(bind=True, base=BaseTaskWithRetry, name="update_search_index")
+@only_one(mode=COALESCE)
+def update_search_index(self):
+    """
+    Celery task to index the products queued by product changes in the product
+    search backend. Schedule it every SEARCH_INDEX_FLUSH_INTERVAL seconds; it is
+    the index's only writer.
+    """
+    from utils.search_utils.search_sync_service import SearchSyncService
+
+    indexed = SearchSyncService.flush()
+    logger.info(f"indexed {indexed} products")
+
+
 @shared_task(
     bind=True, base=BaseTaskWithRetry, name="update_recently_viewed"
 )  # TODO: Use RabbitMQ
-@only_one
 def update_recently_viewed(self, user_id, product_id):
     """
-    Updates or creates a recently viewed product record for a user,
-    and enforces the maximum limit of recently viewed products.
-    Uses bulk operations for better performance.
+    Adds a product to a user's recently viewed list, trimmed to the
+    maximum number of recently viewed products.
+    The list is synced to RecentlyViewedProduct by sync_recently_viewed.
 
     Args:
         user_id (int): The ID of the user who viewed the product.
@@ -86,30 +257,10 @@ def update_recently_viewed(self, user_id, product_id):
     Returns:
         None
     """
-    MAX_RECENTLY_VIEWED = 20
+    from utils.product_utils.recently_viewed_service import RecentlyViewedService
 
     try:
-        with transaction.atomic():
-            # Update or create the recently viewed product record
-            viewed_at = timezone.now()
-            RecentlyViewedProduct.objects.update_or_create(
-                user_id=user_id,
-                product_id=product_id,
-                defaults={"viewed_at": viewed_at},
-            )
-
-            # Get all recently viewed products for this user, ordered by viewed_at
-            user_viewed_products = RecentlyViewedProduct.objects.filter(
-                user_id=user_id
-            ).order_by("-viewed_at")
-
-            # If we have more than the maximum, delete all excess records in one query
-            if user_viewed_products.count() > MAX_RECENTLY_VIEWED:
-                products_to_keep = user_viewed_products[:MAX_RECENTLY_VIEWED]
-                RecentlyViewedProduct.objects.filter(user_id=user_id).exclude(
-                    id__in=[p.id for p in products_to_keep]
-                ).delete()
-
+        RecentlyViewedService.record_view(user_id, product_id)
     except Exception as e:
         raise ErrorException(
             message=f"An error occurred while updating the recently viewed products. {e}",
@@ -119,6 +270,19 @@ def update_recently_viewed(self, user_id, product_id):
         )
 
 
+@shared_task(bind=True, base=BaseTaskWithRetry, name="sync_recently_viewed")
+@only_one(mode=COALESCE)
+def sync_recently_viewed(self):
+    """
+    Celery task to persist changed recently viewed lists to the database.
+    Schedule it every RECENTLY_VIEWED_SYNC_INTERVAL seconds.
+    """
+    from utils.product_utils.recently_viewed_service import RecentlyViewedService
+
+    synced = RecentlyViewedService.sync_recently_viewed()
+    logger.info(f"synced recently viewed products of {synced} users")
+
+
 @shared_task(bind=True, base=BaseTaskWithRetry, name="update_shipment")
 @only_one
 def update_shipment(self):
@@ -1,4 +1,78 @@
+import base64
+import hashlib
+import json
+import math
+from typing import Callable, List, Optional
+from django.core.cache import cache
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q
+from utils.non_modular_utils.errors import ErrorException, StandardError
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded for the given query."""
+
+
+class PaginationResult:
+    """
+    A single page of results. The total item count is computed on first access,
+    so the COUNT query only runs when a `*_total_number` field asks for it.
+    """
+
+    def __init__(
+        self,
+        items: List,
+        page_count: int,
+        count: Callable[[], int],
+        next_cursor: Optional[str] = None,
+    ):
+        self.items = items
+        self.page_count = page_count
+        self.next_cursor = next_cursor
+        self._count = count
+        self._total_items = None
+
+    @property
+    def total_items(self) -> int:
+        if self._total_items is None:
+            self._total_items = self._count()
+        return self._total_items
+
+    @property
+    def total_pages(self) -> int:
+        return max(math.ceil(self.total_items / self.page_count), 1)
+
+
+class PaginationContext:
+    """Request-scoped store of pagination results, keyed by GraphQL field name."""
+
+    CONTEXT_ATTRIBUTE = "pagination"
+
+    def __init__(self):
+        self._results = {}
+
+    @classmethod
+    def from_context(cls, context) -> "PaginationContext":
+        """Return the pagination context attached to the request, creating it on first use."""
+        pagination = getattr(context, cls.CONTEXT_ATTRIBUTE, None)
+        if pagination is None:
+            pagination = cls()
+            setattr(context, cls.CONTEXT_ATTRIBUTE, pagination)
+        return pagination
+
+    def set(self, field_name: str, result: PaginationResult) -> None:
+        self._results[field_name] = result
+
+    def get(self, field_name: str) -> Optional[PaginationResult]:
+        return self._results.get(field_name)
+
+    def total_items(self, field_name: str) -> int:
+        result = self.get(field_name)
+        return result.total_items if result else 0
+
+    def next_cursor(self, field_name: str) -> Optional[str]:
+        result = self.get(field_name)
+        return result.next_cursor if result else None
 
 
 class DatabaseUtil:
@@ -38,3 +112,189 @@ class DatabaseUtil:
             paginated_queryset = paginator.page(paginator.num_pages)
 
         return paginated_queryset, paginator.num_pages, total_items
+
+    @staticmethod
+    def paginate_page(query_set, page_count=None, page_number=None) -> PaginationResult:
+        """
+        Paginate a queryset by page number without counting it up front.
+
+        Behaves like `paginate_query` (invalid page numbers return the first page,
+        out-of-range ones the last page), but the COUNT query only runs when the
+        total is read or the requested page turns out to be empty.
+        """
+        defaults = DatabaseUtil.get_default_page_count()
+        page_count = page_count or defaults["page_count"]
+
+        try:
+            page_number = int(page_number or defaults["page_number"])
+        except (TypeError, ValueError):
+            page_number = 1
+
+        result = PaginationResult([], page_count, query_set.count)
+
+        if page_number >= 1:
+            offset = (page_number - 1) * page_count
+            result.items = list(query_set[offset : offset + page_count])
+
+        if not result.items and page_number != 1:
+            last_page = result.total_pages
+            offset = (last_page - 1) * page_count
+            result.items = list(query_set[offset : offset + page_count])
+
+        return result
+
+    @staticmethod
+    def get_keyset_ordering(query_set) -> list:
+        """
+        Return the ordering of a queryset as a list of field names that ends with
+        the primary key, so every row has a unique, stable position.
+
+        Random ordering (`?`) cannot be resumed from a cursor, so it falls back
+        to newest-first by primary key.
+        """
+        ordering = list(query_set.query.order_by or query_set.model._meta.ordering)
+        ordering = [field for field in ordering if isinstance(field, str)]
+
+        if "?" in ordering:
+            ordering = []
+
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            descending = ordering[-1].startswith("-") if ordering else True
+            ordering.append("-id" if descending else "id")
+
+        return ordering
+
+    @staticmethod
+    def encode_cursor(instance, ordering: list) -> str:
+        """Encode the sort-key values of a row into an opaque cursor string."""
+        values = []
+        for field in ordering:
+            value = instance
+            for attribute in field.lstrip("-").replace("pk", "id").split("__"):
+                value = getattr(value, attribute, None)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+
+        payload = json.dumps(values, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, ordering: list) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            raise InvalidCursor(f"Invalid cursor: {e}")
+
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise InvalidCursor("Cursor does not match the requested ordering.")
+
+        return values
+
+    @staticmethod
+    def build_keyset_filter(ordering: list, values: list) -> Q:
+        """
+        Build the condition selecting rows that sort strictly after `values`,
+        e.g. for (-price, -id): price < p OR (price = p AND id < i).
+        """
+        condition = Q()
+        equal_prefix = Q()
+
+        for field, value in zip(ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal_prefix & Q(**{f"{name}__{lookup}": value})
+            equal_prefix &= Q(**{name: value})
+
+        return condition
+
+    @staticmethod
+    def get_estimated_count(query_set, timeout=300) -> int:
+        """
+        Return the row count of a queryset, cached by its SQL for `timeout` seconds.
+        Deep cursor pages reuse the estimate instead of re-running COUNT(*).
+        """
+        sql = str(query_set.order_by().query)
+        cache_key = f"pagination_count:{hashlib.md5(sql.encode()).hexdigest()}"
+
+        total_items = cache.get(cache_key)
+        if total_items is None:
+            total_items = query_set.count()
+            cache.set(cache_key, total_items, timeout)
+
+        return total_items
+
+    @staticmethod
+    def paginate_by_cursor(query_set, page_count=None, cursor=None, with_total=False):
+        """
+        Paginate a queryset by keyset (seek) on its ordering plus the primary key.
+
+        Unlike `paginate_query` this never issues an OFFSET, so the cost of a page
+        does not depend on how deep it is, and the total count is only computed
+        (from a cached estimate) when `with_total` is set.
+
+        Args:
+            query_set (QuerySet): The queryset to paginate.
+            page_count (int, optional): The number of items per page.
+            cursor (str, optional): The cursor returned with the previous page.
+                An empty or missing cursor returns the first page.
+            with_total (bool, optional): Whether to compute the total item count.
+
+        Returns:
+            tuple: (items, next_cursor, total_items). `next_cursor` is None on the
+            last page and `total_items` is None unless `with_total` is set.
+        """
+        page_count = page_count or DatabaseUtil.get_default_page_count()["page_count"]
+        ordering = DatabaseUtil.get_keyset_ordering(query_set)
+        page_query = query_set.order_by(*ordering)
+
+        if cursor:
+            values = DatabaseUtil.decode_cursor(cursor, ordering)
+            page_query = page_query.filter(
+                DatabaseUtil.build_keyset_filter(ordering, values)
+            )
+
+        items = list(page_query[: page_count + 1])
+        next_cursor = None
+        if len(items) > page_count:
+            items = items[:page_count]
+            next_cursor = DatabaseUtil.encode_cursor(items[-1], ordering)
+
+        total_items = (
+            DatabaseUtil.get_estimated_count(query_set) if with_total else None
+        )
+
+        return items, next_cursor, total_items
+
+    @staticmethod
+    def paginate(
+        context, field_name, query_set, page_count=None, page_number=None, cursor=None
+    ) -> PaginationResult:
+        """
+        Paginate a queryset by cursor when one is supplied, otherwise by page number,
+        and record the result in the request's `PaginationContext` under `field_name`.
+
+        An empty cursor string requests the first keyset page.
+        """
+        if cursor is None:
+            result = DatabaseUtil.paginate_page(query_set, page_count, page_number)
+        else:
+            try:
+                items, next_cursor, _ = DatabaseUtil.paginate_by_cursor(
+                    query_set, page_count, cursor
+                )
+            except InvalidCursor as e:
+                raise ErrorException(
+                    message=str(e),
+                    error_type=StandardError,
+                    meta={"cursor": cursor},
+                    code=400,
+                )
+
+            result = PaginationResult(
+                items,
+                page_count or DatabaseUtil.get_default_page_count()["page_count"],
+                lambda: DatabaseUtil.get_estimated_count(query_set),
+                next_cursor,
+            )
+
+        PaginationContext.from_context(context).set(field_name, result)
+        return result
@@ -0,0 +1,273 @@
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+from django.conf import settings
+
+
+class WriteBuffer:
+    """
+    Named hashes that collect writes on the request path so a periodic job can
+    apply them to the database in bulk.
+
+    `set` keeps the last value written for a field (dedup), `increment` sums
+    deltas, and `drain` atomically takes everything buffered under a name.
+    Member sets and ranked (sorted) sets hold read-side state that has to
+    reflect buffered writes before they are flushed.
+    """
+
+    # Whether the buffer lives in this process. A local buffer is invisible to
+    # Celery workers, so callers flush it themselves once `should_flush` says so.
+    local = False
+
+    def set(self, name: str, values: Dict[str, str]) -> None:
+        raise NotImplementedError
+
+    def increment(self, name: str, field: str, amount: int = 1) -> None:
+        raise NotImplementedError
+
+    def get(self, name: str, field: str):
+        raise NotImplementedError
+
+    def drain(self, name: str) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def restore(self, name: str, values: Dict[str, str]) -> None:
+        """
+        Put drained values back after a failed flush. Fields written since the
+        drain are newer, so they are kept.
+        """
+        raise NotImplementedError
+
+    def size(self, name: str) -> int:
+        """Return the number of fields buffered under a name."""
+        raise NotImplementedError
+
+    def should_flush(self, name: str, interval: int) -> bool:
+        return False
+
+    def add_members(self, name: str, members: Iterable[str], timeout: int) -> None:
+        raise NotImplementedError
+
+    def remove_members(self, name: str, members: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def get_members(self, name: str) -> Optional[Set[str]]:
+        """Return the members of a set, or None when the set does not exist."""
+        raise NotImplementedError
+
+    def add_ranked(
+        self, name: str, members: Dict[str, float], limit: Optional[int], timeout: int
+    ) -> None:
+        """Add scored members, keeping only the `limit` highest scores if given."""
+        raise NotImplementedError
+
+    def get_ranked(self, name: str) -> Optional[List[Tuple[str, float]]]:
+        """Return (member, score) pairs, highest score first, or None when missing."""
+        raise NotImplementedError
+
+    def get_scores(self, name: str, members: List[str]) -> Dict[str, float]:
+        """Return the scores of the given members that are in a ranked set."""
+        raise NotImplementedError
+
+    def remove_ranked(self, name: str, members: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def remove_ranked_below(self, name: str, score: float) -> None:
+        raise NotImplementedError
+
+
+class RedisWriteBuffer(WriteBuffer):
+    def __init__(self, client=None):
+        if client is None:
+            from utils.jobs.base import REDIS_CLIENT
+
+            client = REDIS_CLIENT
+        self.client = client
+
+    def key(self, name: str) -> str:
+        return f"write-buffer:{name}"
+
+    def set(self, name, values):
+        self.client.hset(self.key(name), mapping=values)
+
+    def increment(self, name, field, amount=1):
+        self.client.hincrby(self.key(name), field, amount)
+
+    def get(self, name, field):
+        value = self.client.hget(self.key(name), field)
+        return value.decode() if value is not None else None
+
+    def drain(self, name):
+        # Renaming is atomic, so writes racing with the drain land in a fresh hash
+        draining_key = f"{self.key(name)}:draining:{uuid.uuid4()}"
+        try:
+            self.client.rename(self.key(name), draining_key)
+        except redis.ResponseError:
+            return {}
+
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(draining_key)
+        pipeline.delete(draining_key)
+        values, _ = pipeline.execute()
+
+        return {field.decode(): value.decode() for field, value in values.items()}
+
+    def restore(self, name, values):
+        pipeline = self.client.pipeline()
+        for field, value in values.items():
+            pipeline.hsetnx(self.key(name), field, value)
+        pipeline.execute()
+
+    def size(self, name):
+        return self.client.hlen(self.key(name))
+
+    def add_members(self, name, members, timeout):
+        pipeline = self.client.pipeline()
+        pipeline.sadd(self.key(name), *members)
+        pipeline.expire(self.key(name), timeout)
+        pipeline.execute()
+
+    def remove_members(self, name, members):
+        self.client.srem(self.key(name), *members)
+
+    def get_members(self, name):
+        members = self.client.smembers(self.key(name))
+        return {member.decode() for member in members} if members else None
+
+    def add_ranked(self, name, members, limit, timeout):
+        pipeline = self.client.pipeline()
+        pipeline.zadd(self.key(name), members)
+        if limit is not None:
+            pipeline.zremrangebyrank(self.key(name), 0, -(limit + 1))
+        pipeline.expire(self.key(name), timeout)
+        pipeline.execute()
+
+    def get_ranked(self, name):
+        members = self.client.zrevrange(self.key(name), 0, -1, withscores=True)
+        return [(member.decode(), score) for member, score in members] or None
+
+    def get_scores(self, name, members):
+        if not members:
+            return {}
+        scores = self.client.zmscore(self.key(name), members)
+        return {
+            member: score for member, score in zip(members, scores) if score is not None
+        }
+
+    def remove_ranked(self, name, members):
+        self.client.zrem(self.key(name), *members)
+
+    def remove_ranked_below(self, name, score):
+        self.client.zremrangebyscore(self.key(name), "-inf", f"({score}")
+
+
+class MemoryWriteBuffer(WriteBuffer):
+    local = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._last_drained = {}
+        self._sets = {}
+
+    def set(self, name, values):
+        with self._lock:
+            self._buffers.setdefault(name, {}).update(
+                {field: str(value) for field, value in values.items()}
+            )
+
+    def increment(self, name, field, amount=1):
+        with self._lock:
+            buffer = self._buffers.setdefault(name, {})
+            buffer[field] = str(int(buffer.get(field, 0)) + amount)
+
+    def get(self, name, field):
+        with self._lock:
+            return self._buffers.get(name, {}).get(field)
+
+    def drain(self, name):
+        with self._lock:
+            self._last_drained[name] = time.monotonic()
+            return self._buffers.pop(name, {})
+
+    def restore(self, name, values):
+        with self._lock:
+            buffer = self._buffers.setdefault(name, {})
+            for field, value in values.items():
+                buffer.setdefault(field, value)
+
+    def size(self, name):
+        with self._lock:
+            return len(self._buffers.get(name, {}))
+
+    def should_flush(self, name, interval):
+        with self._lock:
+            last_drained = self._last_drained.setdefault(name, time.monotonic())
+            return time.monotonic() - last_drained >= interval
+
+    def add_members(self, name, members, timeout):
+        with self._lock:
+            self._sets.setdefault(name, set()).update(members)
+
+    def remove_members(self, name, members):
+        with self._lock:
+            self._sets.get(name, set()).difference_update(members)
+
+    def get_members(self, name):
+        with self._lock:
+            members = self._sets.get(name)
+            return set(members) if members else None
+
+    def add_ranked(self, name, members, limit, timeout):
+        with self._lock:
+            ranked = self._sets.setdefault(name, {})
+            ranked.update(members)
+            if limit is None:
+                return
+            for member, _ in sorted(ranked.items(), key=lambda item: item[1])[
+                : max(len(ranked) - limit, 0)
+            ]:
+                del ranked[member]
+
+    def get_ranked(self, name):
+        with self._lock:
+            ranked = self._sets.get(name)
+            if not ranked:
+                return None
+            return sorted(ranked.items(), key=lambda item: item[1], reverse=True)
+
+    def get_scores(self, name, members):
+        with self._lock:
+            ranked = self._sets.get(name, {})
+            return {member: ranked[member] for member in members if member in ranked}
+
+    def remove_ranked(self, name, members):
+        with self._lock:
+            ranked = self._sets.get(name, {})
+            for member in members:
+                ranked.pop(member, None)
+
+    def remove_ranked_below(self, name, score):
+        with self._lock:
+            ranked = self._sets.get(name, {})
+            for member in [member for member, value in ranked.items() if value < score]:
+                del ranked[member]
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+            self._last_drained.clear()
+            self._sets.clear()
+
+
+_memory_write_buffer = MemoryWriteBuffer()
+
+
+def get_write_buffer() -> WriteBuffer:
+    """Return the buffer selected by the `WRITE_BUFFER_BACKEND` setting."""
+    if settings.WRITE_BUFFER_BACKEND == "memory":
+        return _memory_write_buffer
+    return RedisWriteBuffer()
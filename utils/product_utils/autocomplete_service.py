@@ -0,0 +1,102 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from products.models import Product
+from utils.product_utils.reference_data import ReferenceData, get_reference_data
+from utils.search_utils.prefix_index import PrefixIndex
+
+
+class AutocompleteIndex:
+    """
+    Immutable brand and material autocomplete over a reference data snapshot,
+    ranked by the number of listed products of each brand and material.
+    """
+
+    def __init__(self, reference: ReferenceData, popularity: Dict[str, Dict]):
+        self.reference = reference
+        self.popularity = popularity
+        self.built_at = time.monotonic()
+
+        brands = popularity.get("brands", {})
+        materials = popularity.get("materials", {})
+        self.brand_index = PrefixIndex(
+            (brand.name, brands.get(brand.id, 0), brand)
+            for brand in reference.brands.values()
+        )
+        self.material_index = PrefixIndex(
+            (material.name, materials.get(material.id, 0), material)
+            for material in reference.materials.values()
+        )
+
+
+_lock = threading.Lock()
+_index: Optional[AutocompleteIndex] = None
+
+
+def get_autocomplete_index() -> AutocompleteIndex:
+    """
+    Return this process's autocomplete index. Its product counts are reloaded
+    from the shared cache, which the refresh_autocomplete_popularity task
+    fills, every `AUTOCOMPLETE_POPULARITY_TTL` seconds, and counted here if
+    the cache is empty. The index is rebuilt with the current counts when the
+    reference data changes.
+    """
+    global _index
+
+    reference = get_reference_data()
+    with _lock:
+        index = _index
+    expired = (
+        index is None
+        or time.monotonic() - index.built_at >= settings.AUTOCOMPLETE_POPULARITY_TTL
+    )
+    if expired or index.reference is not reference:
+        popularity = index.popularity if not expired else None
+        if popularity is None:
+            popularity = cache.get(AutocompleteService.CACHE_KEY)
+        if popularity is None:
+            popularity = AutocompleteService.refresh()
+        index = AutocompleteIndex(reference, popularity)
+        with _lock:
+            _index = index
+    return index
+
+
+class AutocompleteService:
+    """Listed product counts of every brand and material, shared by every process."""
+
+    CACHE_KEY = "autocomplete_popularity"
+    # Seconds the shared counts outlive a stopped refresh schedule
+    CACHE_TIMEOUT = 60 * 60
+
+    @staticmethod
+    def count_products() -> Dict[str, Dict[int, int]]:
+        """Count the listed products of every brand and material."""
+        brands = dict(
+            Product.objects.filter(deleted=False, brand__isnull=False)
+            .order_by()
+            .values_list("brand_id")
+            .annotate(count=Count("id"))
+        )
+        materials = dict(
+            Product.materials.through.objects.filter(product__deleted=False)
+            .order_by()
+            .values_list("material_id")
+            .annotate(count=Count("id"))
+        )
+        return {"brands": brands, "materials": materials}
+
+    @staticmethod
+    def refresh() -> Dict[str, Dict[int, int]]:
+        """Recount the products of every brand and material and share the counts with every process."""
+        popularity = AutocompleteService.count_products()
+        cache.set(
+            AutocompleteService.CACHE_KEY,
+            popularity,
+            AutocompleteService.CACHE_TIMEOUT,
+        )
+        return popularity
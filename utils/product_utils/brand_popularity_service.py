@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from products.choices import StatusChoices
+from products.models import Product
+from utils.product_utils.like_service import LikeService
+from utils.product_utils.reference_data import CategoryTree, get_reference_data
+from utils.utils import get_exclusion_queries
+
+
+class BrandPopularity:
+    """
+    Immutable ranking of brands by the like and view counters of their listed
+    products, overall and per category. A category's ranking includes the
+    products of every category below it.
+    """
+
+    def __init__(self, brand_ids: List[int], by_category: Dict[int, List[int]]):
+        self.brand_ids = brand_ids
+        self.by_category = by_category
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(
+        cls,
+        rows: Iterable[Tuple[int, Optional[int], int, int]],
+        categories: CategoryTree,
+        limit: int,
+    ) -> "BrandPopularity":
+        """Rank brands from (brand id, category id, likes, views) rows."""
+        overall = Counter()
+        by_category: Dict[int, Counter] = defaultdict(Counter)
+        for brand_id, category_id, likes, views in rows:
+            likes, views = likes or 0, views or 0
+            score = (
+                BrandPopularityService.LIKE_WEIGHT * likes
+                + BrandPopularityService.VIEW_WEIGHT * views
+            )
+            overall[brand_id] += score
+
+            category = categories.get(category_id)
+            while category is not None:
+                by_category[category.id][brand_id] += score
+                category = categories.get(category.parent_id)
+
+        def top(counter: Counter) -> List[int]:
+            ranked = sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+            return [brand_id for brand_id, _ in ranked[:limit]]
+
+        return cls(
+            top(overall),
+            {category_id: top(counter) for category_id, counter in by_category.items()},
+        )
+
+    @classmethod
+    def load(cls) -> "BrandPopularity":
+        rows = (
+            Product.objects.filter(
+                status=StatusChoices.ACTIVE, deleted=False, brand__isnull=False
+            )
+            .order_by()
+            .values("brand_id", "category_id")
+            .annotate(total_likes=Sum("likes"), total_views=Sum("views"))
+            .values_list("brand_id", "category_id", "total_likes", "total_views")
+        )
+        return cls.build(
+            rows, get_reference_data().categories, BrandPopularityService.MAX_BRANDS
+        )
+
+    def get_brand_ids(self, category_id: Optional[int] = None) -> List[int]:
+        if category_id is None:
+            return list(self.brand_ids)
+        return list(self.by_category.get(category_id, []))
+
+
+_lock = threading.Lock()
+_popularity: Optional[BrandPopularity] = None
+
+
+def get_brand_popularity() -> BrandPopularity:
+    """
+    Return this process's brand ranking. It is reloaded from the shared cache,
+    which the refresh_brand_popularity task fills, every `BRAND_POPULARITY_TTL`
+    seconds, and computed here if the cache is empty.
+    """
+    global _popularity
+
+    with _lock:
+        popularity = _popularity
+    if (
+        popularity is None
+        or time.monotonic() - popularity.built_at >= settings.BRAND_POPULARITY_TTL
+    ):
+        shared = cache.get(BrandPopularityService.CACHE_KEY)
+        if shared is None:
+            popularity = BrandPopularityService.refresh()
+        else:
+            popularity = BrandPopularity(shared["brand_ids"], shared["by_category"])
+        with _lock:
+            _popularity = popularity
+    return popularity
+
+
+class BrandPopularityService:
+    """
+    Popular brands, shared by every user, and each user's favorite-brand feed.
+
+    Users with fewer than `MIN_LIKED_PRODUCTS` likes get the brands with the
+    most liked and viewed listings (the cold start); the others get the
+    brands they liked most. The feed's product ids are cached per user for
+    `FAVORITE_BRAND_FEED_CACHE_TIMEOUT` seconds, and dropped when the user
+    likes or unlikes a product.
+    """
+
+    CACHE_KEY = "brand_popularity"
+    # Seconds the shared ranking outlives a stopped refresh schedule
+    CACHE_TIMEOUT = 60 * 60
+    LIKE_WEIGHT = 3
+    VIEW_WEIGHT = 1
+    # Brands ranked overall and per category
+    MAX_BRANDS = 20
+    MIN_LIKED_PRODUCTS = 2
+    # Most products cached per user feed
+    MAX_FEED_PRODUCTS = 100
+
+    @staticmethod
+    def refresh() -> BrandPopularity:
+        """Recompute the brand ranking and share it with every process."""
+        popularity = BrandPopularity.load()
+        cache.set(
+            BrandPopularityService.CACHE_KEY,
+            {"brand_ids": popularity.brand_ids, "by_category": popularity.by_category},
+            BrandPopularityService.CACHE_TIMEOUT,
+        )
+        return popularity
+
+    @staticmethod
+    def get_top_brand_ids(category_id: Optional[int] = None) -> List[int]:
+        return get_brand_popularity().get_brand_ids(category_id)
+
+    @staticmethod
+    def feed_cache_key(user_id: int) -> str:
+        return f"favorite_brand_products:{user_id}"
+
+    @staticmethod
+    def get_favorite_brand_ids(user_id: int) -> List[int]:
+        """Return the brands of the user's liked products, most liked first."""
+        liked_ids = LikeService.get_liked_product_ids(user_id)
+        if len(liked_ids) < BrandPopularityService.MIN_LIKED_PRODUCTS:
+            return BrandPopularityService.get_top_brand_ids()
+
+        brand_ids = list(
+            Product.objects.filter(id__in=liked_ids, brand__isnull=False)
+            .order_by()
+            .values("brand_id")
+            .annotate(count=Count("id"))
+            .order_by("-count", "brand_id")
+            .values_list("brand_id", flat=True)[: BrandPopularityService.MAX_BRANDS]
+        )
+        # Liked products without a brand tell nothing about brands
+        return brand_ids or BrandPopularityService.get_top_brand_ids()
+
+    @staticmethod
+    def get_feed_product_ids(user_id: int) -> List[int]:
+        cache_key = BrandPopularityService.feed_cache_key(user_id)
+        product_ids = cache.get(cache_key)
+        if product_ids is not None:
+            return product_ids
+
+        product_ids = list(
+            Product.objects.filter(
+                brand_id__in=BrandPopularityService.get_favorite_brand_ids(user_id),
+                status=StatusChoices.ACTIVE,
+                deleted=False,
+            )
+            .exclude(get_exclusion_queries("seller"))
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)[: BrandPopularityService.MAX_FEED_PRODUCTS]
+        )
+        cache.set(cache_key, product_ids, settings.FAVORITE_BRAND_FEED_CACHE_TIMEOUT)
+        return product_ids
+
+    @staticmethod
+    def invalidate_feed(user_id: int) -> None:
+        cache.delete(BrandPopularityService.feed_cache_key(user_id))
@@ -0,0 +1,177 @@
+import hashlib
+import json
+from collections import Counter
+from enum import Enum
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Value, When
+from products.choices import Condition, StyleChoices
+from products.models import ProductColor
+from utils.product_utils.product_utils import ProductUtils
+from utils.product_utils.reference_data import get_reference_data
+from utils.search_utils.search_backends import search_product_ids
+from utils.utils import normalize_color, normalize_hashtag
+
+
+class FacetService:
+    """
+    Per-value product counts ("Nike (123)", "Size M (45)") for a filter set.
+
+    Brand, category, size, condition, style and price bucket are counted in one
+    grouped query over every combination of the six, which is then rolled up
+    per facet in Python; colors, which are multi-valued, take a second grouped
+    query over the color index. Counts are cached per normalized filter set
+    for `PRODUCT_FACETS_CACHE_TIMEOUT` seconds.
+    """
+
+    # Lower bounds of the price buckets, the last bucket is open-ended
+    PRICE_BUCKETS = (0, 10, 25, 50, 100, 250)
+    # Most values returned per facet, by descending count
+    MAX_VALUES = 50
+
+    @staticmethod
+    def normalize_filters(filters: dict, search: Optional[str]) -> str:
+        """Serialize the filter set so that equivalent filters give the same string."""
+        normalized = {}
+        for key, value in (filters or {}).items():
+            if value is None:
+                continue
+            if isinstance(value, Enum):
+                value = value.value
+            if key == "hashtags":
+                value = sorted({normalize_hashtag(hashtag) for hashtag in value})
+            elif key == "colors":
+                value = sorted({normalize_color(color) for color in value})
+            normalized[key] = value
+
+        if search and search.strip():
+            normalized["search"] = " ".join(search.split()).lower()
+
+        return json.dumps(normalized, sort_keys=True, default=str)
+
+    @staticmethod
+    def get_cache_key(filters: dict, search: Optional[str]) -> str:
+        normalized = FacetService.normalize_filters(filters, search)
+        return f"product_facets:{hashlib.md5(normalized.encode()).hexdigest()}"
+
+    @staticmethod
+    def get_facets(filters: dict, search: Optional[str] = None) -> dict:
+        cache_key = FacetService.get_cache_key(filters, search)
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = FacetService.compute_facets(filters or {}, search)
+            cache.set(cache_key, facets, settings.PRODUCT_FACETS_CACHE_TIMEOUT)
+        return facets
+
+    @staticmethod
+    def get_price_bucket(lower: int) -> str:
+        buckets = FacetService.PRICE_BUCKETS
+        index = buckets.index(lower)
+        if index + 1 < len(buckets):
+            return f"{lower}-{buckets[index + 1]}"
+        return f"{lower}+"
+
+    @staticmethod
+    def compute_facets(filters: dict, search: Optional[str]) -> dict:
+        search_results = search_product_ids(search) if search else None
+        # No user, so computing facets is not recorded as a search
+        products = ProductUtils.filter_listed_products(
+            None, filters, search, search_results
+        ).order_by()
+
+        buckets = FacetService.PRICE_BUCKETS
+        rows = (
+            products.annotate(
+                price_bucket=Case(
+                    *[
+                        When(price__gte=lower, price__lt=upper, then=Value(lower))
+                        for lower, upper in zip(buckets, buckets[1:])
+                    ],
+                    default=Value(buckets[-1]),
+                    output_field=IntegerField(),
+                )
+            )
+            .values(
+                "brand_id",
+                "category_id",
+                "size_id",
+                "condition",
+                "style",
+                "price_bucket",
+            )
+            .annotate(count=Count("id"))
+        )
+
+        counts = {
+            field: Counter()
+            for field in ["brand_id", "category_id", "size_id", "condition", "style"]
+        }
+        prices, total = Counter(), 0
+        for row in rows:
+            for field, counter in counts.items():
+                if row[field] is not None:
+                    counter[row[field]] += row["count"]
+            prices[row["price_bucket"]] += row["count"]
+            total += row["count"]
+
+        colors = (
+            ProductColor.objects.filter(product__in=products.values("id"))
+            .values("color")
+            .annotate(count=Count("product_id"))
+            .order_by("-count", "color")[: FacetService.MAX_VALUES]
+        )
+
+        reference_data = get_reference_data()
+        conditions = dict(Condition.choices)
+        styles = dict(StyleChoices.choices)
+
+        def label(lookup, value):
+            item = lookup.get(value)
+            return item.name if item is not None else None
+
+        return {
+            "total": total,
+            "brands": FacetService.build_values(
+                counts["brand_id"],
+                lambda brand_id: label(reference_data.brands, brand_id),
+            ),
+            "categories": FacetService.build_values(
+                counts["category_id"], reference_data.categories.get_full_path
+            ),
+            "sizes": FacetService.build_values(
+                counts["size_id"], lambda size_id: label(reference_data.sizes, size_id)
+            ),
+            "conditions": FacetService.build_values(
+                counts["condition"], conditions.get
+            ),
+            "styles": FacetService.build_values(counts["style"], styles.get),
+            "colors": [
+                {"value": row["color"], "label": row["color"], "count": row["count"]}
+                for row in colors
+            ],
+            "prices": [
+                {
+                    "value": FacetService.get_price_bucket(lower),
+                    "label": FacetService.get_price_bucket(lower),
+                    "count": prices[lower],
+                }
+                for lower in buckets
+                if prices[lower]
+            ],
+        }
+
+    @staticmethod
+    def build_values(counter: Counter, get_label) -> List[Dict]:
+        """Turn value counts into facet values, by descending count."""
+        return [
+            {
+                "value": str(value),
+                "label": get_label(value) or str(value),
+                "count": count,
+            }
+            for value, count in sorted(
+                counter.items(), key=lambda item: (-item[1], str(item[0]))
+            )[: FacetService.MAX_VALUES]
+        ]
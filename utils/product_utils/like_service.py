@@ -0,0 +1,248 @@
+import logging
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Set, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from accounts.models import User
+from notifications.schema.mutations.notification_mutations import CreateNotification
+from products.models import Product, ProductLike
+from utils.non_modular_utils.write_buffer import get_write_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class LikeService:
+    """
+    Batched like/unlike pipeline.
+
+    A like or unlike is recorded as the desired state of a (product, user) pair,
+    so replaying an event has no further effect and only the last state inside
+    a flush window is applied. The flush reconciles those states with ProductLike
+    and moves Product.likes by the net change per product in a single F()
+    update, so concurrent likes never overwrite each other's counts.
+
+    Each user's liked product ids are mirrored in a ranked set, scored by when
+    they were liked, that is updated immediately. It answers "has this user
+    liked X" and lists the user's likes without reading ProductLike, and
+    reflects likes that have not been flushed yet.
+    """
+
+    BUFFER_NAME = "product-likes"
+    # Member marking a hydrated liked set, so users without likes are cached too
+    LOADED_MARKER = "loaded"
+    LIKED_SET_TIMEOUT = 60 * 60 * 24
+
+    @staticmethod
+    def liked_set_name(user_id: int) -> str:
+        return f"liked-product-times:{user_id}"
+
+    @staticmethod
+    def load_like_times(user_id: int) -> Dict[int, float]:
+        return {
+            product_id: created_at.timestamp()
+            for product_id, created_at in ProductLike.objects.filter(
+                user_id=user_id, deleted=False
+            ).values_list("product_id", "created_at")
+        }
+
+    @staticmethod
+    def get_like_times(user_id: int) -> Dict[int, float]:
+        """Return when the user liked each of their liked products, as POSIX timestamps."""
+        buffer = get_write_buffer()
+        name = LikeService.liked_set_name(user_id)
+
+        try:
+            liked = dict(buffer.get_ranked(name) or [])
+            if LikeService.LOADED_MARKER not in liked:
+                liked = {
+                    str(product_id): liked_at
+                    for product_id, liked_at in LikeService.load_like_times(
+                        user_id
+                    ).items()
+                }
+                liked[LikeService.LOADED_MARKER] = 0
+                buffer.add_ranked(name, liked, None, LikeService.LIKED_SET_TIMEOUT)
+        except redis.RedisError as e:
+            logger.warning(f"Could not read liked products from the buffer: {e}")
+            return LikeService.load_like_times(user_id)
+
+        return {
+            int(member): liked_at
+            for member, liked_at in liked.items()
+            if member.isdigit()
+        }
+
+    @staticmethod
+    def get_liked_product_ids(user_id: int) -> Set[int]:
+        return set(LikeService.get_like_times(user_id))
+
+    @staticmethod
+    def get_recently_liked_product_ids(user_id: int) -> List[int]:
+        """Return the user's liked product ids, most recently liked first."""
+        like_times = LikeService.get_like_times(user_id)
+        return sorted(
+            like_times, key=lambda product_id: (-like_times[product_id], -product_id)
+        )
+
+    @staticmethod
+    def toggle_like(user_id: int, product_id: int) -> bool:
+        """Flip the user's like on a product and return whether it is now liked."""
+        liked = product_id not in LikeService.get_liked_product_ids(user_id)
+        liked_at = timezone.now().timestamp() if liked else 0
+        buffer = get_write_buffer()
+        name = LikeService.liked_set_name(user_id)
+
+        try:
+            if liked:
+                buffer.add_ranked(
+                    name,
+                    {str(product_id): liked_at},
+                    None,
+                    LikeService.LIKED_SET_TIMEOUT,
+                )
+            else:
+                buffer.remove_ranked(name, [str(product_id)])
+            buffer.set(LikeService.BUFFER_NAME, {f"{product_id}:{user_id}": liked_at})
+        except redis.RedisError as e:
+            logger.warning(f"Could not buffer product like, writing it directly: {e}")
+            LikeService.write_likes({(product_id, user_id): liked_at})
+            return liked
+
+        if buffer.should_flush(
+            LikeService.BUFFER_NAME, settings.PRODUCT_LIKE_FLUSH_INTERVAL
+        ):
+            LikeService.flush_likes()
+
+        return liked
+
+    @staticmethod
+    def flush_likes() -> int:
+        """Apply every buffered like and return the number of (product, user) pairs written."""
+        buffer = get_write_buffer()
+        buffered = buffer.drain(LikeService.BUFFER_NAME)
+
+        likes = {}
+        for key, liked_at in buffered.items():
+            product_id, user_id = key.split(":")
+            likes[(int(product_id), int(user_id))] = float(liked_at)
+
+        try:
+            return LikeService.write_likes(likes)
+        except Exception:
+            # Keep the drained likes for the next flush
+            buffer.restore(LikeService.BUFFER_NAME, buffered)
+            raise
+
+    @staticmethod
+    def write_likes(likes: Dict[Tuple[int, int], float]) -> int:
+        """
+        Apply like states, given as the time of the like or 0 for an unlike. A
+        like's ProductLike.created_at is set to when it was liked, also when an
+        unliked product is liked again.
+        """
+        if not likes:
+            return 0
+
+        product_ids = {product_id for product_id, _ in likes}
+        user_ids = {user_id for _, user_id in likes}
+
+        with transaction.atomic():
+            existing = {}
+            for product_like in ProductLike.objects.filter(
+                product_id__in=product_ids, user_id__in=user_ids
+            ).only("id", "product_id", "user_id", "deleted", "created_at"):
+                existing.setdefault(
+                    (product_like.product_id, product_like.user_id), product_like
+                )
+
+            deltas = Counter()
+            created, changed = [], []
+            for (product_id, user_id), liked_at in likes.items():
+                product_like = existing.get((product_id, user_id))
+                liked = bool(liked_at)
+
+                if product_like is None:
+                    if liked:
+                        created.append(
+                            ProductLike(
+                                product_id=product_id,
+                                user_id=user_id,
+                                created_at=datetime.fromtimestamp(
+                                    liked_at, dt_timezone.utc
+                                ),
+                            )
+                        )
+                        deltas[product_id] += 1
+                elif product_like.deleted == liked:
+                    product_like.deleted = not liked
+                    if liked:
+                        product_like.created_at = datetime.fromtimestamp(
+                            liked_at, dt_timezone.utc
+                        )
+                    changed.append(product_like)
+                    deltas[product_id] += 1 if liked else -1
+
+            ProductLike.objects.bulk_create(created, batch_size=1000)
+            ProductLike.objects.bulk_update(
+                changed, ["deleted", "created_at"], batch_size=1000
+            )
+
+            deltas = {
+                product_id: delta for product_id, delta in deltas.items() if delta
+            }
+            if deltas:
+                Product.objects.filter(id__in=deltas).update(
+                    likes=Greatest(
+                        F("likes")
+                        + Case(
+                            *[
+                                When(id=product_id, then=Value(delta))
+                                for product_id, delta in deltas.items()
+                            ],
+                            default=Value(0),
+                            output_field=IntegerField(),
+                        ),
+                        0,
+                    )
+                )
+
+            if created:
+                transaction.on_commit(lambda: LikeService.notify_sellers(created))
+
+        return len(likes)
+
+    @staticmethod
+    def notify_sellers(product_likes) -> None:
+        """Notify sellers of first-time likes on their products."""
+        products = Product.objects.only("id", "seller_id", "images_url").in_bulk(
+            {product_like.product_id for product_like in product_likes}
+        )
+        users = User.objects.only("id", "username").in_bulk(
+            {product_like.user_id for product_like in product_likes}
+        )
+
+        for product_like in product_likes:
+            product = products.get(product_like.product_id)
+            user = users.get(product_like.user_id)
+            if not product or not user or product.seller_id == user.id:
+                continue
+
+            media_thumbnail = product.images_url[0] if product.images_url else ""
+
+            CreateNotification.create_notification.delay(
+                user_id=product.seller_id,
+                sender=user.id,
+                message="liked your product",
+                model="Product",
+                model_id=product.id,
+                model_group="Product",
+                title=user.username,
+                meta={"media_thumbnail": media_thumbnail},
+                info={"page": "PRODUCT", "object_id": str(product.id)},
+            )
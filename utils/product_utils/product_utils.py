@@ -1,4 +1,5 @@
 import re
+import hashlib
 import logging
 import requests
 from io import BytesIO
@@ -7,7 +8,6 @@ from typing import List, Optional
 from PIL import Image
 from django.conf import settings
 from accounts.models import User
-from notifications.schema.mutations.notification_mutations import CreateNotification
 from products.choices import StatusChoices
 
 from products.models import (
@@ -15,9 +15,9 @@ from products.models import (
     Category,
     Material,
     Product,
+    ProductColor,
+    ProductHashtag,
     ProductLike,
-    ProductView,
-    RecentlyViewedProduct,
     Size,
 )
 from products.schema.enums.product_enums import (
@@ -34,17 +34,33 @@ from products.schema.product_responses import (
 )
 from products.schema.types.product_types import CategoryGroupType
 from utils.non_modular_utils.errors import ErrorException, GenericError, StandardError
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import (
     Q,
     Count,
-    F,
     Case,
     When,
     Value,
     CharField,
+    IntegerField,
 )
-from django.db.models.functions import Coalesce, Greatest, Concat, Substr, StrIndex
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import (
+    Coalesce,
+    Greatest,
+    Concat,
+    Substr,
+    StrIndex,
+    Random,
+)
+from utils.product_utils.brand_popularity_service import BrandPopularityService
+from utils.product_utils.like_service import LikeService
+from utils.product_utils.recently_viewed_service import RecentlyViewedService
+from utils.product_utils.recommendation_service import RecommendationService
+from utils.product_utils.similarity_service import SimilarityService
+from utils.product_utils.view_counter_service import ViewCounterService
+from utils.search_utils.search_backends import search_product_ids
+from utils.search_utils.search_sync_service import SearchSyncService
 from utils.upload_utils import UploadUtil
 from utils.utils import (
     build_product_filter_conditions,
@@ -52,7 +68,8 @@ from utils.utils import (
     get_exclusion_queries,
     build_order_filter_conditions,
     get_template_path,
-    get_cold_start_brands,
+    normalize_color,
+    normalize_hashtag,
 )
 from datetime import timedelta
 from django.utils import timezone
@@ -107,6 +124,9 @@ class ProductUtils:
             product = Product.objects.create(**data)
             if material_ids:
                 product.materials.set(materials)
+            ProductUtils.index_hashtags([product])
+            ProductUtils.index_colors([product])
+            SearchSyncService.enqueue([product.id])
 
             # Run product upload checks asynchronously
             # run_product_upload_checks.delay(product.id)
@@ -132,6 +152,52 @@ class ProductUtils:
                 code=422,
             )
 
+    @staticmethod
+    def index_hashtags(products: List[Product], batch_size: int = 1000) -> int:
+        """
+        Rebuild the hashtag index (ProductHashtag) rows of the given products.
+        Returns the number of (tag, product) postings written.
+        """
+        postings = [
+            ProductHashtag(tag=tag, product_id=product.id)
+            for product in products
+            for tag in {normalize_hashtag(str(hashtag)) for hashtag in product.hashtags or []}
+            - {""}
+        ]
+
+        with transaction.atomic():
+            ProductHashtag.objects.filter(
+                product_id__in=[product.id for product in products]
+            ).delete()
+            ProductHashtag.objects.bulk_create(
+                postings, batch_size=batch_size, ignore_conflicts=True
+            )
+
+        return len(postings)
+
+    @staticmethod
+    def index_colors(products: List[Product], batch_size: int = 1000) -> int:
+        """
+        Rebuild the color index (ProductColor) rows of the given products.
+        Returns the number of (color, product) postings written.
+        """
+        postings = [
+            ProductColor(color=color, product_id=product.id)
+            for product in products
+            for color in {normalize_color(str(color)) for color in product.color or []}
+            - {""}
+        ]
+
+        with transaction.atomic():
+            ProductColor.objects.filter(
+                product_id__in=[product.id for product in products]
+            ).delete()
+            ProductColor.objects.bulk_create(
+                postings, batch_size=batch_size, ignore_conflicts=True
+            )
+
+        return len(postings)
+
     @staticmethod
     def duplicate_product(logged_in_user: User, product_id: int, **kwargs: dict) -> Product:
         """
@@ -172,6 +238,9 @@ class ProductUtils:
             
             # Create the duplicate product
             duplicate_product = Product.objects.create(**duplicate_data)
+            ProductUtils.index_hashtags([duplicate_product])
+            ProductUtils.index_colors([duplicate_product])
+            SearchSyncService.enqueue([duplicate_product.id])
             
             # Copy materials if they exist
             if original_product.materials.exists():
@@ -230,6 +299,9 @@ class ProductUtils:
                 )
                 kwargs["images_url"] = new_banners
 
+            if "description" in kwargs:
+                kwargs["hashtags"] = re.findall(r"#\w+", kwargs["description"] or "")
+
             if "style" in kwargs:
                 kwargs["style"] = kwargs["style"].value
             if "condition" in kwargs:
@@ -269,12 +341,19 @@ class ProductUtils:
                     )
 
             # Update product instance
+            previous_hashtags = instance.hashtags
+            previous_colors = instance.color
             for key, value in kwargs.items():
                 setattr(instance, key, value)
             instance.save()
             # Update the materials field
             if materials:
                 instance.materials.set(materials)
+            if instance.hashtags != previous_hashtags:
+                ProductUtils.index_hashtags([instance])
+            if instance.color != previous_colors:
+                ProductUtils.index_colors([instance])
+            SearchSyncService.enqueue([instance.id])
 
             return instance
 
@@ -359,7 +438,9 @@ class ProductUtils:
                     code=404,
                 )
 
-            instance.update(deleted=True)
+            # update() skips auto_now, bump it so the seller leaderboard sees the change
+            instance.update(deleted=True, updated_at=timezone.now())
+            SearchSyncService.enqueue([product_id])
 
         except Exception as err:
             raise ErrorException(
@@ -370,10 +451,8 @@ class ProductUtils:
             )
 
     @staticmethod
-    def like_product(logged_in_user: User, product_id: int) -> None:
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+    def like_product(logged_in_user: User, product_id: int) -> bool:
+        if not Product.objects.filter(id=product_id).exists():
             raise ErrorException(
                 message=PRODUCT_NOT_FOUND.format(product_id),
                 error_type=StandardError,
@@ -381,46 +460,10 @@ class ProductUtils:
                 code=404,
             )
 
-        # Using a transaction to ensure atomicity
-        with transaction.atomic():
-            product_like, created = ProductLike.objects.get_or_create(
-                product=product, user=logged_in_user
-            )
-
-            if created or product_like.deleted:
-                # New like, increment the count
-                product_like.deleted = False
-                product.likes += 1
-                success = True
-
-                if logged_in_user != product.seller:
-                    # Notify the seller of the like
-                    if created or product_like.deleted:
-                        media_thumbnail = (
-                            product.images_url[0] if product.images_url else ""
-                        )
-
-                        CreateNotification.create_notification.delay(
-                            user_id=product.seller.id,
-                            sender=logged_in_user.id,
-                            message="liked your product",
-                            model="Product",
-                            model_id=product.id,
-                            model_group="Product",
-                            title=logged_in_user.username,
-                            meta={"media_thumbnail": media_thumbnail},
-                            info={"page": "PRODUCT", "object_id": str(product.id)},
-                        )
-            else:
-                # Unlike the product, delete the existing like
-                product_like.deleted = True
-                product.likes = max(product.likes - 1, 0)
-                success = False
-
-            # Save the updated product object
-            product.save()
-            product_like.save()
-            return success
+        liked = LikeService.toggle_like(logged_in_user.id, product_id)
+        BrandPopularityService.invalidate_feed(logged_in_user.id)
+        RecommendationService.invalidate(logged_in_user.id)
+        return liked
 
     @staticmethod
     def resolve_all_products(loggedin_user, **kwargs: dict) -> List[Product]:
@@ -428,23 +471,23 @@ class ProductUtils:
             search = kwargs.get("search", None)
             filters = kwargs.get("filters", {})
             sort = kwargs.get("sort", None)
+            seed = kwargs.get("seed", None)
 
-            # Build filter conditions using the helper function
-            filter_conditions = build_product_filter_conditions(
-                loggedin_user, filters, search
-            )
-            exclusion_conditions = get_exclusion_queries("seller")
+            # Rank search matches with the configured search backend, if any
+            search_results = search_product_ids(search) if search else None
 
-            # Add a filter to include only active products
-            filter_conditions &= Q(status=StatusChoices.ACTIVE)
+            products = ProductUtils.filter_listed_products(
+                loggedin_user, filters, search, search_results
+            )
 
-            # Apply all filters in one query
             if sort:
-                products = Product.objects.filter(filter_conditions).order_by(sort.value)
+                products = products.order_by(sort.value)
+            elif search_results:
+                products = ProductUtils.order_by_relevance(products, search_results)
             else:
-                products = Product.objects.filter(filter_conditions).order_by("?")
+                products = ProductUtils.shuffle_products(products, seed)
 
-            result = products.exclude(exclusion_conditions)
+            result = products
             
             # Ensure we return a QuerySet, not None
             return result if result is not None else Product.objects.none()
@@ -454,12 +497,61 @@ class ProductUtils:
             # Return empty queryset instead of None
             return Product.objects.none()
 
+    @staticmethod
+    def filter_listed_products(
+        loggedin_user, filters: dict, search: str = None, search_results=None
+    ):
+        """Active products matching the filters and search, from sellers in good standing."""
+        # Build filter conditions using the helper function
+        filter_conditions = build_product_filter_conditions(
+            loggedin_user, filters, search, search_results
+        )
+
+        # Add a filter to include only active products
+        filter_conditions &= Q(status=StatusChoices.ACTIVE)
+
+        return Product.objects.filter(filter_conditions).exclude(
+            get_exclusion_queries("seller")
+        )
+
+    @staticmethod
+    def order_by_relevance(products, ranked_ids: List[int], exact_count: int = 50):
+        """
+        Order products as in `ranked_ids`, most relevant first. Only the first
+        `exact_count` ids are ranked one by one; the rest are ranked in groups
+        of `exact_count`, which keeps the CASE short for long result lists.
+        """
+        if not ranked_ids:
+            return products.order_by("id")
+
+        # Raw SQL, as resolving hundreds of When(id=...) expressions costs
+        # more than running the query
+        quote_name = connection.ops.quote_name
+        column = f"{quote_name(products.model._meta.db_table)}.{quote_name('id')}"
+        whens, params = [], []
+        for rank, product_id in enumerate(ranked_ids[:exact_count]):
+            whens.append(f"WHEN {column} = %s THEN %s")
+            params += [product_id, rank]
+        for start in range(exact_count, len(ranked_ids), exact_count):
+            group = ranked_ids[start : start + exact_count]
+            whens.append(f"WHEN {column} IN ({', '.join(['%s'] * len(group))}) THEN %s")
+            params += [*group, start]
+
+        return products.annotate(
+            search_rank=RawSQL(
+                f"CASE {' '.join(whens)} ELSE %s END",
+                (*params, len(ranked_ids)),
+                output_field=IntegerField(),
+            )
+        ).order_by("search_rank", "id")
+
     @staticmethod
     def resolve_user_products(logged_in_user: User, **kwargs: dict) -> List[Product]:
         search = kwargs.get("search", None)
         username = kwargs.get("username", None)
         filters = kwargs.get("filters", {})
         sort = kwargs.get("sort", None)
+        seed = kwargs.get("seed", None)
 
         if username:
             products = Product.objects.filter(
@@ -478,10 +570,60 @@ class ProductUtils:
         if sort:
             products = products.filter(filter_conditions).order_by(sort.value)
         else:
-            products = products.filter(filter_conditions).order_by("?")
+            products = ProductUtils.shuffle_products(
+                products.filter(filter_conditions), seed
+            )
 
         return products.exclude(exclusion_conditions)
 
+    @staticmethod
+    def get_shuffle_start(seed: str) -> float:
+        """Map a session seed onto a starting position in the [0, 1) shuffle key space."""
+        digest = hashlib.md5(str(seed).encode()).hexdigest()
+        return int(digest[:8], 16) / 2**32
+
+    @staticmethod
+    def shuffle_products(products, seed: Optional[str] = None):
+        """
+        Order products by their precomputed `shuffle_key` instead of `order_by("?")`.
+
+        Without a seed every client sees the same shuffled feed until the keys are
+        re-rolled. A seed starts the feed at a different point of the key space
+        and wraps around, so each session gets its own stable order. Either way
+        the feed is a range scan over the (status, shuffle_key, id) index and
+        pages never repeat.
+        """
+        if not seed:
+            return products.order_by("shuffle_key", "id")
+
+        start = ProductUtils.get_shuffle_start(seed)
+        return products.annotate(
+            shuffle_wrap=Case(
+                When(shuffle_key__lt=start, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).order_by("shuffle_wrap", "shuffle_key", "id")
+
+    @staticmethod
+    def reshuffle_products(batch_size: int = 5000) -> int:
+        """
+        Re-roll every product's shuffle key, in primary key ranges of `batch_size`
+        so no single statement locks the whole table.
+
+        Returns:
+            int: The number of products updated.
+        """
+        updated = 0
+        last_id = Product.objects.order_by("-id").values_list("id", flat=True).first()
+
+        for start_id in range(0, (last_id or 0) + 1, batch_size):
+            updated += Product.objects.filter(
+                id__gte=start_id, id__lt=start_id + batch_size
+            ).update(shuffle_key=Random())
+
+        return updated
+
     @staticmethod
     def resolve_product(logged_in_user, product_id: int) -> Product:
         exclusion_conditions = get_exclusion_queries("seller")
@@ -490,24 +632,10 @@ class ProductUtils:
                 id=product_id, deleted=False
             )
 
-            # Only update view count if user is logged in and not the seller
-            if logged_in_user and product.seller != logged_in_user:
-                # Using select_for_update to prevent race conditions on views count
-                with transaction.atomic():
-                    product = Product.objects.select_for_update().get(id=product_id)
-
-                    # Update view and increment counter
-                    _, created = ProductView.objects.update_or_create(
-                        product=product,
-                        viewed_by=logged_in_user,
-                        defaults={"created_at": timezone.now()},
-                    )
-
-                    if created:
-                        Product.objects.filter(id=product_id).update(
-                            views=F("views") + 1
-                        )
-
+            # Only count the view if user is logged in and not the seller
+            if logged_in_user and product.seller_id != logged_in_user.id:
+                ViewCounterService.record_view(logged_in_user.id, product.id)
+                RecentlyViewedService.record_view(logged_in_user.id, product.id)
 
             return product
         except Product.DoesNotExist:
@@ -624,6 +752,19 @@ class ProductUtils:
         exclusion_conditions = get_exclusion_queries("seller")
 
         if product_id:
+            # Neighbours precomputed offline, most similar first
+            similar_product_ids = SimilarityService.get_similar_product_ids(product_id)
+            if similar_product_ids is not None:
+                return ProductUtils.order_by_relevance(
+                    Product.objects.filter(
+                        id__in=similar_product_ids,
+                        status=StatusChoices.ACTIVE,
+                        deleted=False,
+                    ).exclude(exclusion_conditions),
+                    similar_product_ids,
+                )
+
+            # Products listed since the last build fall back to their brand
             try:
                 product = Product.objects.exclude(exclusion_conditions).get(
                     id=product_id, deleted=False
@@ -675,47 +816,31 @@ class ProductUtils:
 
     @staticmethod
     def recommend_products(user):
+        """The user's personalized feed, best first, see RecommendationService."""
+        product_ids = RecommendationService.recommend_product_ids(user.id)
 
-        user_recently_viewed_products = RecentlyViewedProduct.objects.filter(user=user)
-        user_liked_products = ProductLike.objects.filter(user=user, deleted=False)
-
-        category_ids = set(
-            user_recently_viewed_products.values_list(
-                "product__category__id", flat=True
-            )
-        ) | set(user_liked_products.values_list("product__category_id", flat=True))
-        brand_ids = set(
-            user_recently_viewed_products.values_list("product__brand__id", flat=True)
-        ) | set(user_liked_products.values_list("product__brand_id", flat=True))
-
+        # Past the ranked products the feed goes on with the rest of the
+        # catalog, most liked and newest first
         products = (
-            Product.objects.filter(
-                Q(category_id__in=category_ids) | Q(brand_id__in=brand_ids)
-            )
-            .distinct()
-            .order_by("-created_at")
-            .exclude(deleted=True)
+            Product.objects.filter(status=StatusChoices.ACTIVE, deleted=False)
+            .exclude(get_exclusion_queries("seller"))
+            .exclude(seller=user)
+            .exclude(id__in=LikeService.get_liked_product_ids(user.id))
+        )
+        if not product_ids:
+            return products.order_by("-likes", "-created_at", "-id")
+        return ProductUtils.order_by_relevance(products, product_ids).order_by(
+            "search_rank", "-likes", "-created_at", "-id"
         )
-
-        if not products.exists():
-            return Product.objects.filter(deleted=False)
-        return products
 
     @staticmethod
-    def favorite_brand_products(user: User, top: int) -> Optional[List[Product]]:
-        MIN_LIKED_PRODUCTS = 2
-
-        user_liked_products = ProductLike.objects.filter(user=user, deleted=False)
+    def favorite_brand_products(user: User, top: int) -> List[Product]:
+        """Newest listings of the user's favorite brands, see BrandPopularityService."""
+        product_ids = BrandPopularityService.get_feed_product_ids(user.id)[:top]
 
-        if user_liked_products.count() >= MIN_LIKED_PRODUCTS:
-            cold_start_brands = get_cold_start_brands(user.id)
-            brand_ids = cold_start_brands["brand_ids"]
-
-            products = (
-                Product.objects.filter(brand__id__in=brand_ids)
-                .exclude(Q(get_exclusion_queries("seller")) | Q(deleted=True))
-                .order_by("-created_at")[:top]
-            )
-            return products
-
-        return []
\ No newline at end of file
+        return ProductUtils.order_by_relevance(
+            Product.objects.filter(
+                id__in=product_ids, status=StatusChoices.ACTIVE, deleted=False
+            ),
+            product_ids,
+        )
\ No newline at end of file
@@ -0,0 +1,183 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+from functools import reduce
+from operator import or_
+from typing import List, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from products.models import Product, RecentlyViewedProduct
+from utils.non_modular_utils.write_buffer import get_write_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class RecentlyViewedService:
+    """
+    Recently viewed products, kept per user in a ranked set scored by view time
+    and capped at MAX_RECENTLY_VIEWED entries, so a view is a single O(log n)
+    insert and trim.
+
+    Users whose list changed are tracked in the write buffer, and
+    `sync_recently_viewed` periodically mirrors their lists into
+    RecentlyViewedProduct, which stays the durable copy used to rebuild an
+    evicted list and by recommendations.
+    """
+
+    MAX_RECENTLY_VIEWED = 20
+    BUFFER_NAME = "recently-viewed-users"
+    # Lowest-scored member marking a hydrated list, so empty lists are cached too
+    LOADED_MARKER = "loaded"
+    LIST_TIMEOUT = 60 * 60 * 24 * 7
+    SYNC_BATCH_SIZE = 500
+
+    @staticmethod
+    def list_name(user_id: int) -> str:
+        return f"recently-viewed:{user_id}"
+
+    @staticmethod
+    def get_recently_viewed(user_id: int) -> List[Tuple[int, float]]:
+        """Return (product id, view timestamp) pairs, most recent first."""
+        buffer = get_write_buffer()
+        name = RecentlyViewedService.list_name(user_id)
+
+        try:
+            ranked = buffer.get_ranked(name)
+            if ranked is None:
+                members = {RecentlyViewedService.LOADED_MARKER: 0}
+                for product_id, viewed_at in RecentlyViewedProduct.objects.filter(
+                    user_id=user_id
+                ).values_list("product_id", "viewed_at")[
+                    : RecentlyViewedService.MAX_RECENTLY_VIEWED
+                ]:
+                    members[str(product_id)] = viewed_at.timestamp()
+
+                buffer.add_ranked(
+                    name,
+                    members,
+                    RecentlyViewedService.MAX_RECENTLY_VIEWED + 1,
+                    RecentlyViewedService.LIST_TIMEOUT,
+                )
+                ranked = sorted(members.items(), key=lambda item: -item[1])
+        except redis.RedisError as e:
+            logger.warning(f"Could not read recently viewed products: {e}")
+            ranked = [
+                (str(product_id), viewed_at.timestamp())
+                for product_id, viewed_at in RecentlyViewedProduct.objects.filter(
+                    user_id=user_id
+                ).values_list("product_id", "viewed_at")
+            ]
+
+        return [
+            (int(member), score)
+            for member, score in ranked
+            if member != RecentlyViewedService.LOADED_MARKER
+        ][: RecentlyViewedService.MAX_RECENTLY_VIEWED]
+
+    @staticmethod
+    def record_view(user_id: int, product_id: int) -> None:
+        # Make sure the list holds the synced history before adding to it
+        RecentlyViewedService.get_recently_viewed(user_id)
+
+        buffer = get_write_buffer()
+        viewed_at = timezone.now().timestamp()
+
+        try:
+            # One extra slot for the loaded marker, which always ranks last
+            buffer.add_ranked(
+                RecentlyViewedService.list_name(user_id),
+                {str(product_id): viewed_at},
+                RecentlyViewedService.MAX_RECENTLY_VIEWED + 1,
+                RecentlyViewedService.LIST_TIMEOUT,
+            )
+            buffer.set(RecentlyViewedService.BUFFER_NAME, {str(user_id): viewed_at})
+        except redis.RedisError as e:
+            logger.warning(f"Could not record recently viewed product: {e}")
+            RecentlyViewedService.write_lists({user_id: [(product_id, viewed_at)]})
+            return
+
+        if buffer.should_flush(
+            RecentlyViewedService.BUFFER_NAME,
+            settings.RECENTLY_VIEWED_SYNC_INTERVAL,
+        ):
+            RecentlyViewedService.sync_recently_viewed()
+
+    @staticmethod
+    def get_recently_viewed_products(user_id: int) -> List[Product]:
+        """Return the user's recently viewed products, most recent first, in one query."""
+        product_ids = [
+            product_id
+            for product_id, _ in RecentlyViewedService.get_recently_viewed(user_id)
+        ]
+        products = Product.objects.in_bulk(product_ids)
+
+        return [
+            products[product_id] for product_id in product_ids if product_id in products
+        ]
+
+    @staticmethod
+    def sync_recently_viewed() -> int:
+        """Mirror the lists of users with new views into RecentlyViewedProduct."""
+        user_ids = [
+            int(user_id)
+            for user_id in get_write_buffer().drain(RecentlyViewedService.BUFFER_NAME)
+        ]
+
+        for offset in range(0, len(user_ids), RecentlyViewedService.SYNC_BATCH_SIZE):
+            batch = user_ids[offset : offset + RecentlyViewedService.SYNC_BATCH_SIZE]
+            RecentlyViewedService.write_lists(
+                {
+                    user_id: RecentlyViewedService.get_recently_viewed(user_id)
+                    for user_id in batch
+                },
+                replace=True,
+            )
+
+        return len(user_ids)
+
+    @staticmethod
+    def write_lists(lists, replace=False) -> None:
+        """
+        Upsert (product id, timestamp) pairs per user. With `replace`, rows that
+        are no longer in a user's list are deleted, otherwise each user is
+        trimmed to MAX_RECENTLY_VIEWED.
+        """
+        rows = [
+            RecentlyViewedProduct(
+                user_id=user_id,
+                product_id=product_id,
+                viewed_at=datetime.fromtimestamp(viewed_at, dt_timezone.utc),
+            )
+            for user_id, views in lists.items()
+            for product_id, viewed_at in views
+        ]
+
+        with transaction.atomic():
+            RecentlyViewedProduct.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["user", "product"],
+                update_fields=["viewed_at"],
+                batch_size=1000,
+            )
+
+            if replace:
+                stale = [
+                    Q(user_id=user_id) & ~Q(product_id__in=[pid for pid, _ in views])
+                    for user_id, views in lists.items()
+                ]
+                if stale:
+                    RecentlyViewedProduct.objects.filter(reduce(or_, stale)).delete()
+            else:
+                for user_id in lists:
+                    keep = RecentlyViewedProduct.objects.filter(
+                        user_id=user_id
+                    ).values_list("id", flat=True)[
+                        : RecentlyViewedService.MAX_RECENTLY_VIEWED
+                    ]
+                    RecentlyViewedProduct.objects.filter(user_id=user_id).exclude(
+                        id__in=list(keep)
+                    ).delete()
@@ -0,0 +1,330 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from products.models import Product, ProductLike, RecentlyViewedProduct, UserAffinity
+from utils.product_utils.like_service import LikeService
+from utils.product_utils.similarity_service import SimilarityService
+
+ATTRIBUTE_FIELDS = [
+    "category_id",
+    "brand_id",
+    "custom_brand",
+    "style",
+    "size_id",
+    "color",
+    "price",
+]
+
+
+class RecommendationIndex:
+    """
+    Immutable in-memory feature index of the listed products: the catalog
+    attribute blocks of `SimilarityService` as a sparse matrix, plus each
+    product's seller, like count and age for ranking.
+    """
+
+    def __init__(self, products: Iterable[tuple]):
+        """`products` holds (id, seller_id, likes, created_at, *ATTRIBUTE_FIELDS) tuples."""
+        products = list(products)
+        now = timezone.now()
+
+        self.product_ids, self.matrix = SimilarityService.build_features(
+            (product_id, *attributes) for product_id, _, _, _, *attributes in products
+        )
+        self.product_ids = np.array(self.product_ids, dtype=np.int64)
+        self.seller_ids = np.array([product[1] for product in products], dtype=np.int64)
+        likes = np.array([product[2] or 0 for product in products], dtype=np.float64)
+        self.popularity = np.log1p(likes) / max(np.log1p(likes.max(initial=0)), 1.0)
+        age_days = np.array(
+            [(now - product[3]).total_seconds() / 86400 for product in products]
+        )
+        self.freshness = 0.5 ** (
+            np.maximum(age_days, 0) / RecommendationService.FRESHNESS_HALF_LIFE_DAYS
+        )
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def load(cls) -> "RecommendationIndex":
+        return cls(
+            SimilarityService.get_listed_products()
+            .values_list("id", "seller_id", "likes", "created_at", *ATTRIBUTE_FIELDS)
+            .iterator(chunk_size=5000)
+        )
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+
+_lock = threading.Lock()
+_index: Optional[RecommendationIndex] = None
+
+
+def get_recommendation_index() -> RecommendationIndex:
+    """Return this process's product feature index, rebuilt every `RECOMMENDATION_INDEX_TTL` seconds."""
+    global _index
+
+    with _lock:
+        index = _index
+    if (
+        index is None
+        or time.monotonic() - index.built_at >= settings.RECOMMENDATION_INDEX_TTL
+    ):
+        index = RecommendationIndex.load()
+        with _lock:
+            _index = index
+    return index
+
+
+class RecommendationService:
+    """
+    Personalized product feed in three stages.
+
+    1. Affinity: a nightly job sums the feature vectors of the products a
+       user liked and viewed, weighted by interaction and decayed by age, into
+       a UserAffinity row. Requests rebuild missing, empty and outdated rows.
+    2. Candidates: the user's strongest features are looked up in the
+       process-local RecommendationIndex; every listed product sharing one
+       is a candidate. Users with too few candidates get the whole catalog,
+       which popularity and freshness alone then rank.
+    3. Ranking: candidates are scored by their cosine affinity with the user
+       plus small popularity and freshness boosts. The user's own listings
+       and liked products are dropped.
+
+    At most `RECOMMENDATIONS_LIMIT` products are ranked; the feed continues
+    with the rest of the catalog by popularity and freshness, see
+    `ProductUtils.recommend_products`. The ranked ids are cached per user for
+    `RECOMMENDATIONS_CACHE_TIMEOUT` seconds, or until the user likes or
+    unlikes a product, so paging through the feed ranks it once.
+    """
+
+    LIKE_WEIGHT = 3.0
+    VIEW_WEIGHT = 1.0
+    INTERACTION_HALF_LIFE_DAYS = 30
+    FRESHNESS_HALF_LIFE_DAYS = 14
+    POPULARITY_WEIGHT = 0.1
+    FRESHNESS_WEIGHT = 0.1
+    # Strongest features kept per user
+    MAX_FEATURES = 50
+
+    @staticmethod
+    def cache_key(user_id: int) -> str:
+        return f"recommended_products:{user_id}"
+
+    @staticmethod
+    def compute_affinities(
+        interactions: Iterable[Tuple[int, int, float, float]],
+        attributes: Dict[int, tuple],
+    ) -> Dict[int, List[list]]:
+        """
+        Turn (user id, product id, weight, age in days) interactions into each
+        user's strongest [block, value, weight] features. `attributes` maps
+        product ids to their ATTRIBUTE_FIELDS values.
+        """
+        vectors: Dict[int, Dict[Tuple[str, Hashable], float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        product_features = {}
+        for user_id, product_id, weight, age_days in interactions:
+            if product_id not in attributes:
+                continue
+            if product_id not in product_features:
+                features = SimilarityService.get_feature_weights(
+                    SimilarityService.get_attribute_blocks(*attributes[product_id])
+                )
+                norm = math.sqrt(sum(value**2 for value in features.values())) or 1.0
+                product_features[product_id] = {
+                    feature: value / norm for feature, value in features.items()
+                }
+
+            decay = 0.5 ** (
+                max(age_days, 0) / RecommendationService.INTERACTION_HALF_LIFE_DAYS
+            )
+            vector = vectors[user_id]
+            for feature, value in product_features[product_id].items():
+                vector[feature] += weight * decay * value
+
+        affinities = {}
+        for user_id, vector in vectors.items():
+            strongest = sorted(vector.items(), key=lambda item: -item[1])[
+                : RecommendationService.MAX_FEATURES
+            ]
+            affinities[user_id] = [
+                [block, value, round(weight, 6)] for (block, value), weight in strongest
+            ]
+        return affinities
+
+    @staticmethod
+    def build_affinities(
+        user_ids: List[int], like_times: Optional[Dict[int, Dict[int, float]]] = None
+    ) -> Dict[int, List[list]]:
+        """
+        Compute the affinities of the given users from their likes and recent
+        views. `like_times` maps users to when they liked each product, as
+        POSIX timestamps, and replaces their flushed likes when given.
+        """
+        now = timezone.now()
+        if like_times is None:
+            like_times = defaultdict(dict)
+            for user_id, product_id, liked_at in ProductLike.objects.filter(
+                user_id__in=user_ids, deleted=False
+            ).values_list("user_id", "product_id", "created_at"):
+                like_times[user_id][product_id] = liked_at.timestamp()
+
+        interactions = [
+            (
+                user_id,
+                product_id,
+                RecommendationService.LIKE_WEIGHT,
+                (now.timestamp() - liked_at) / 86400,
+            )
+            for user_id, liked in like_times.items()
+            for product_id, liked_at in liked.items()
+        ]
+        for user_id, product_id, viewed_at in RecentlyViewedProduct.objects.filter(
+            user_id__in=user_ids
+        ).values_list("user_id", "product_id", "viewed_at"):
+            interactions.append(
+                (
+                    user_id,
+                    product_id,
+                    RecommendationService.VIEW_WEIGHT,
+                    (now - viewed_at).total_seconds() / 86400,
+                )
+            )
+
+        # Sold and deleted products still describe the user's taste
+        attributes = {
+            product_id: tuple(values)
+            for product_id, *values in Product.objects.filter(
+                id__in={product_id for _, product_id, _, _ in interactions}
+            ).values_list("id", *ATTRIBUTE_FIELDS)
+        }
+
+        affinities = RecommendationService.compute_affinities(interactions, attributes)
+        UserAffinity.objects.bulk_create(
+            [
+                UserAffinity(user_id=user_id, features=affinities.get(user_id, []))
+                for user_id in user_ids
+            ],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["features", "updated_at"],
+        )
+        return affinities
+
+    @staticmethod
+    def refresh_affinities(batch_size: int = 1000) -> int:
+        """Recompute the affinity of every user who liked or viewed a product."""
+        started = timezone.now()
+        user_ids = sorted(
+            set(
+                ProductLike.objects.filter(deleted=False).values_list(
+                    "user_id", flat=True
+                )
+            )
+            | set(RecentlyViewedProduct.objects.values_list("user_id", flat=True))
+        )
+        for start in range(0, len(user_ids), batch_size):
+            RecommendationService.build_affinities(user_ids[start : start + batch_size])
+
+        # Users without any interaction left fall back to the cold-start ranking
+        UserAffinity.objects.filter(updated_at__lt=started).delete()
+        return len(user_ids)
+
+    @staticmethod
+    def get_affinity(user_id: int, like_times: Dict[int, float]) -> List[list]:
+        """
+        Return the user's affinity. A missing or empty affinity, or one older
+        than the user's latest like, is rebuilt now with the likes of
+        `like_times`, so new users and new likes shape the feed before the
+        nightly job runs.
+        """
+        affinity = (
+            UserAffinity.objects.filter(pk=user_id)
+            .values_list("features", "updated_at")
+            .first()
+        )
+        if affinity is not None:
+            features, updated_at = affinity
+            if features and updated_at.timestamp() >= max(
+                like_times.values(), default=0
+            ):
+                return features
+
+        return RecommendationService.build_affinities(
+            [user_id], {user_id: like_times}
+        ).get(user_id, [])
+
+    @staticmethod
+    def rank(
+        index: RecommendationIndex,
+        features: List[list],
+        user_id: int,
+        excluded_ids: Iterable[int] = (),
+        limit: int = None,
+    ) -> List[int]:
+        """Return up to `limit` product ids for a user with the given affinity, best first."""
+        limit = limit or settings.RECOMMENDATIONS_LIMIT
+        if not len(index):
+            return []
+
+        columns, weights = [], []
+        for block, value, weight in features:
+            column = index.matrix.column_keys.get((block, value))
+            if column is not None:
+                columns.append(column)
+                weights.append(weight)
+
+        if columns:
+            weights = np.array(weights)
+            affinity = index.matrix.multiply(
+                np.array(columns, dtype=np.int64), weights / np.linalg.norm(weights)
+            )
+        else:
+            affinity = np.zeros(len(index))
+
+        scores = (
+            affinity
+            + RecommendationService.POPULARITY_WEIGHT * index.popularity
+            + RecommendationService.FRESHNESS_WEIGHT * index.freshness
+        )
+
+        candidates = affinity > 0
+        if candidates.sum() < limit:
+            candidates[:] = True
+        candidates &= index.seller_ids != user_id
+        candidates &= ~np.isin(index.product_ids, list(excluded_ids))
+
+        rows = np.flatnonzero(candidates)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        rows = rows[np.lexsort((index.product_ids[rows], -scores[rows]))]
+        return index.product_ids[rows].tolist()
+
+    @staticmethod
+    def recommend_product_ids(user_id: int) -> List[int]:
+        cache_key = RecommendationService.cache_key(user_id)
+        product_ids = cache.get(cache_key)
+        if product_ids is not None:
+            return product_ids
+
+        like_times = LikeService.get_like_times(user_id)
+        product_ids = RecommendationService.rank(
+            get_recommendation_index(),
+            RecommendationService.get_affinity(user_id, like_times),
+            user_id,
+            like_times.keys(),
+        )
+        cache.set(cache_key, product_ids, settings.RECOMMENDATIONS_CACHE_TIMEOUT)
+        return product_ids
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        cache.delete(RecommendationService.cache_key(user_id))
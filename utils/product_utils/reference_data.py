@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from products.models import Brand, Category, Material, Size
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "reference-data-version"
+# Seconds between warnings while the shared version cannot be read
+VERSION_WARNING_INTERVAL = 5 * 60
+
+
+class CategoryTree:
+    """
+    Immutable in-memory snapshot of the category tree, built from the
+    materialized hierarchy.
+    """
+
+    def __init__(self, categories: List[Category]):
+        self._categories: Dict[int, Category] = {}
+        self._slugs: Dict[str, int] = {}
+        self._children: Dict[Optional[int], List[Category]] = defaultdict(list)
+
+        for category in sorted(categories, key=lambda category: category.name):
+            self._categories[category.id] = category
+            self._slugs[category.slug] = category.id
+            self._children[category.parent_id].append(category)
+
+    def get(self, category_id: int) -> Optional[Category]:
+        return self._categories.get(category_id)
+
+    def get_by_slug(self, slug: str) -> Optional[Category]:
+        return self._categories.get(self._slugs.get(slug))
+
+    def get_children(self, parent_id: Optional[int] = None) -> List[Category]:
+        """Return the children of a category, or the roots, ordered by name."""
+        return list(self._children.get(parent_id, []))
+
+    def get_descendant_ids(self, category_id: int) -> List[int]:
+        """Return the ids of a category and every category below it."""
+        if category_id not in self._categories:
+            return []
+
+        descendant_ids, pending = [], [category_id]
+        while pending:
+            current = pending.pop()
+            descendant_ids.append(current)
+            pending.extend(child.id for child in self._children.get(current, []))
+
+        return descendant_ids
+
+    def get_full_path(self, category_id: int) -> Optional[str]:
+        category = self._categories.get(category_id)
+        return category.get_full_path() if category else None
+
+
+class ReferenceData:
+    """
+    Immutable snapshot of the reference tables (categories, sizes, brands and
+    materials), which change a few times a year. Every process loads it once
+    and serves it from memory until the shared version changes.
+    """
+
+    def __init__(self, categories, sizes, brands, materials, version=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.categories = CategoryTree(categories)
+        self.brands: Dict[int, Brand] = {brand.id: brand for brand in brands}
+        self.materials: Dict[int, Material] = {
+            material.id: material for material in materials
+        }
+        self.sizes: Dict[int, Size] = {size.id: size for size in sizes}
+
+        self._sizes_by_type: Dict[Tuple[str, str], List[Size]] = defaultdict(list)
+        for size in sizes:
+            self._sizes_by_type[(size.size_type, size.size_subtype)].append(size)
+
+    @classmethod
+    def load(cls, version=None) -> "ReferenceData":
+        return cls(
+            list(Category.objects.all()),
+            list(Size.objects.order_by("id")),
+            list(Brand.objects.all()),
+            list(Material.objects.all()),
+            version,
+        )
+
+    def get_sizes(self, size_type: str, size_subtype: str) -> List[Size]:
+        return list(self._sizes_by_type.get((str(size_type), str(size_subtype)), []))
+
+
+_lock = threading.Lock()
+_snapshot: Optional[ReferenceData] = None
+_checked_at = None
+_warned_at = None
+
+
+def _get_version():
+    from utils.jobs.base import REDIS_CLIENT
+
+    return REDIS_CLIENT.get(VERSION_KEY)
+
+
+def get_reference_data() -> ReferenceData:
+    """
+    Return this process's reference data snapshot, reloading it when another
+    process has changed the data. The shared version is checked at most once
+    every `REFERENCE_DATA_CHECK_INTERVAL` seconds; while it cannot be read,
+    the snapshot is reloaded every `REFERENCE_DATA_CHECK_INTERVAL` seconds.
+    """
+    global _snapshot, _checked_at
+
+    now = time.monotonic()
+    with _lock:
+        snapshot = _snapshot
+        if (
+            snapshot is not None
+            and _checked_at is not None
+            and now - _checked_at < settings.REFERENCE_DATA_CHECK_INTERVAL
+        ):
+            return snapshot
+        _checked_at = now
+
+    try:
+        version = _get_version()
+        stale = snapshot is None or version != snapshot.version
+    except redis.RedisError as e:
+        _warn_version_unavailable(e, now)
+        # Without the shared version, changes are picked up by reloading the
+        # snapshot once it is older than the check interval
+        version = None
+        stale = (
+            snapshot is None
+            or now - snapshot.loaded_at >= settings.REFERENCE_DATA_CHECK_INTERVAL
+        )
+
+    if stale:
+        snapshot = ReferenceData.load(version)
+        with _lock:
+            _snapshot = snapshot
+
+    return snapshot
+
+
+def _warn_version_unavailable(error: Exception, now: float) -> None:
+    """Log that the version cannot be read, at most every `VERSION_WARNING_INTERVAL` seconds."""
+    global _warned_at
+
+    with _lock:
+        if _warned_at is not None and now - _warned_at < VERSION_WARNING_INTERVAL:
+            return
+        _warned_at = now
+
+    logger.warning(f"Could not check the reference data version: {error}")
+
+
+def invalidate_reference_data() -> None:
+    """Drop this process's snapshot and, once committed, make other processes reload theirs."""
+    global _snapshot
+
+    with _lock:
+        _snapshot = None
+
+    def bump_version():
+        from utils.jobs.base import REDIS_CLIENT
+
+        try:
+            REDIS_CLIENT.incr(VERSION_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Could not bump the reference data version: {e}")
+
+    transaction.on_commit(bump_version)
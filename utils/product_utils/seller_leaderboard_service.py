@@ -0,0 +1,198 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Set
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from orders.models import OrderItem
+from products.choices import StatusChoices
+from products.models import Product, ProductView, SellerLeaderboard
+
+# Order status counted as a sale
+DELIVERED = "delivered"
+
+
+class SellerLeaderboardService:
+    """
+    Materialized ranking behind `recommended_sellers`.
+
+    A seller's score mixes three components: the sales of their delivered
+    orders over the last `WINDOW_DAYS` days, the value of their active
+    listings and the views of their products over the same window. Each
+    component is one grouped query, and the results are stored in
+    SellerLeaderboard, so reading the top sellers is one indexed query.
+
+    The scheduled refresh is incremental: it recomputes only the sellers whose
+    components may have changed since the previous refresh, that is sellers
+    with product, order or view activity since then and sellers with orders
+    or views that have since left the window.
+    """
+
+    WINDOW_DAYS = 30
+    SALES_WEIGHT = Decimal("0.50")
+    SHOP_VALUE_WEIGHT = Decimal("0.30")
+    VIEWS_WEIGHT = Decimal("0.20")
+    # Sellers served by recommended sellers
+    TOP_SELLERS = 20
+
+    @staticmethod
+    def get_score(
+        total_sales: Decimal, total_shop_value: Decimal, product_views: int
+    ) -> Decimal:
+        return (
+            total_sales * SellerLeaderboardService.SALES_WEIGHT
+            + total_shop_value * SellerLeaderboardService.SHOP_VALUE_WEIGHT
+            + Decimal(product_views) * SellerLeaderboardService.VIEWS_WEIGHT
+        ).quantize(Decimal("0.01"))
+
+    @staticmethod
+    def get_changed_seller_ids(since: datetime, now: datetime) -> Set[int]:
+        """Return the sellers whose components may have changed between `since` and `now`."""
+        window = timedelta(days=SellerLeaderboardService.WINDOW_DAYS)
+        # Orders and views created in [expired_from, expired_to) left the window
+        # since the last refresh
+        expired_from, expired_to = since - window, now - window
+
+        seller_ids = set(
+            Product.objects.filter(updated_at__gte=since)
+            .values_list("seller_id", flat=True)
+            .distinct()
+        )
+        seller_ids.update(
+            OrderItem.objects.filter(
+                Q(order__updated_at__gte=since)
+                | Q(
+                    order__created_at__gte=expired_from,
+                    order__created_at__lt=expired_to,
+                )
+            )
+            .values_list("product__seller_id", flat=True)
+            .distinct()
+        )
+        seller_ids.update(
+            ProductView.objects.filter(
+                Q(created_at__gte=since)
+                | Q(created_at__gte=expired_from, created_at__lt=expired_to)
+            )
+            .values_list("product__seller_id", flat=True)
+            .distinct()
+        )
+        return seller_ids
+
+    @staticmethod
+    def compute(
+        seller_ids: Optional[Iterable[int]], now: datetime
+    ) -> Dict[int, SellerLeaderboard]:
+        """
+        Compute the leaderboard rows of the given sellers, or of every seller
+        when `seller_ids` is None. Sellers without active listings get no row.
+        """
+        window_start = now - timedelta(days=SellerLeaderboardService.WINDOW_DAYS)
+        products = Product.objects.order_by()
+        if seller_ids is not None:
+            products = products.filter(seller_id__in=list(seller_ids))
+
+        rows = {}
+        for seller_id, shop_value, listings in (
+            products.filter(status=StatusChoices.ACTIVE, deleted=False)
+            .values("seller_id")
+            .annotate(shop_value=Sum("price"), listings=Count("id"))
+            .values_list("seller_id", "shop_value", "listings")
+        ):
+            rows[seller_id] = SellerLeaderboard(
+                seller_id=seller_id,
+                total_shop_value=shop_value or Decimal("0.00"),
+                active_listings=listings,
+                refreshed_at=now,
+            )
+
+        # Sold products stop being listed but their sales still count
+        sales = (
+            OrderItem.objects.filter(
+                product__in=products,
+                order__status=DELIVERED,
+                order__created_at__gte=window_start,
+            )
+            .order_by()
+            .values("product__seller_id")
+            .annotate(total=Sum("total_price"))
+            .values_list("product__seller_id", "total")
+        )
+        views = (
+            ProductView.objects.filter(
+                product__in=products, created_at__gte=window_start
+            )
+            .order_by()
+            .values("product__seller_id")
+            .annotate(total=Count("id"))
+            .values_list("product__seller_id", "total")
+        )
+        totals = defaultdict(dict)
+        for field, queryset in (("total_sales", sales), ("product_views", views)):
+            for seller_id, total in queryset:
+                if seller_id in rows:
+                    totals[seller_id][field] = total
+
+        for seller_id, row in rows.items():
+            row.total_sales = totals[seller_id].get("total_sales") or Decimal("0.00")
+            row.product_views = totals[seller_id].get("product_views") or 0
+            row.seller_score = SellerLeaderboardService.get_score(
+                row.total_sales, row.total_shop_value, row.product_views
+            )
+        return rows
+
+    @staticmethod
+    def refresh(full: bool = False) -> int:
+        """
+        Recompute the leaderboard rows of the sellers that changed since the last
+        refresh, or of every seller when `full` or on the first refresh, and
+        return how many sellers were recomputed.
+        """
+        now = timezone.now()
+        since = None
+        if not full:
+            since = SellerLeaderboard.objects.aggregate(since=Max("refreshed_at"))[
+                "since"
+            ]
+
+        seller_ids = (
+            SellerLeaderboardService.get_changed_seller_ids(since, now)
+            if since is not None
+            else None
+        )
+        if seller_ids is not None and not seller_ids:
+            return 0
+
+        rows = SellerLeaderboardService.compute(seller_ids, now)
+        with transaction.atomic():
+            SellerLeaderboard.objects.bulk_create(
+                rows.values(),
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["seller"],
+                update_fields=[
+                    "total_sales",
+                    "total_shop_value",
+                    "product_views",
+                    "active_listings",
+                    "seller_score",
+                    "refreshed_at",
+                ],
+            )
+            # Recomputed sellers without active listings leave the leaderboard
+            if seller_ids is None:
+                SellerLeaderboard.objects.filter(refreshed_at__lt=now).delete()
+            else:
+                SellerLeaderboard.objects.filter(seller_id__in=seller_ids).exclude(
+                    seller_id__in=rows.keys()
+                ).delete()
+
+        return len(seller_ids) if seller_ids is not None else len(rows)
+
+    @staticmethod
+    def get_top_sellers():
+        return SellerLeaderboard.objects.order_by("-seller_score", "seller")[
+            : SellerLeaderboardService.TOP_SELLERS
+        ]
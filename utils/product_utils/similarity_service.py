@@ -0,0 +1,322 @@
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from products.choices import StatusChoices
+from products.models import Product, ProductLike, ProductSimilarity, ProductView
+from utils.search_utils.prefix_index import fold
+from utils.utils import get_exclusion_queries, normalize_color
+
+
+class SparseMatrix:
+    """
+    Row-normalized sparse matrix kept in both row (CSR) and column (CSC)
+    order, so a batch of rows can be multiplied with the whole transposed
+    matrix without a dense copy of it.
+    """
+
+    def __init__(
+        self,
+        rows: np.ndarray,
+        columns: np.ndarray,
+        values: np.ndarray,
+        shape,
+        column_keys: Dict[Hashable, int] = None,
+    ):
+        self.shape = shape
+        # Feature -> column, for looking up the rows that have a feature
+        self.column_keys = column_keys or {}
+        values = values.astype(np.float32)
+
+        # L2-normalize rows, so dot products are cosine similarities
+        norms = np.sqrt(np.bincount(rows, weights=values**2, minlength=shape[0]))
+        values = values / np.maximum(norms, 1e-12)[rows]
+
+        by_row = np.lexsort((columns, rows))
+        self.row_pointers = np.concatenate(
+            ([0], np.cumsum(np.bincount(rows, minlength=shape[0])))
+        )
+        self.row_columns = columns[by_row]
+        self.row_values = values[by_row].astype(np.float32)
+
+        by_column = np.lexsort((rows, columns))
+        self.column_pointers = np.concatenate(
+            ([0], np.cumsum(np.bincount(columns, minlength=shape[1])))
+        )
+        self.column_rows = rows[by_column]
+        self.column_values = values[by_column].astype(np.float32)
+
+    def similarities(self, start: int, end: int) -> np.ndarray:
+        """Return the dense (end - start) x rows cosine similarities of rows start..end."""
+        count = self.shape[0]
+        first, last = self.row_pointers[start], self.row_pointers[end]
+        batch_rows = np.repeat(
+            np.arange(end - start), np.diff(self.row_pointers[start : end + 1])
+        )
+        columns = self.row_columns[first:last]
+        values = self.row_values[first:last]
+
+        # Expand every (row, column) entry into the column's postings
+        starts = self.column_pointers[columns]
+        lengths = self.column_pointers[columns + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+        products = np.bincount(
+            np.repeat(batch_rows, lengths) * count + self.column_rows[positions],
+            weights=np.repeat(values, lengths) * self.column_values[positions],
+            minlength=(end - start) * count,
+        )
+        return products.reshape(end - start, count)
+
+    def multiply(self, columns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Return the product of the matrix with a sparse column vector, one score per row."""
+        starts = self.column_pointers[columns]
+        lengths = self.column_pointers[columns + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+        return np.bincount(
+            self.column_rows[positions],
+            weights=np.repeat(weights, lengths) * self.column_values[positions],
+            minlength=self.shape[0],
+        )
+
+
+def top_k_neighbours(
+    matrix: SparseMatrix, k: int, batch_size: int = 256, max_batch_cells=10_000_000
+) -> Iterable[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    Yield (row, neighbour rows, scores) with the `k` most similar other rows of
+    every row, best first, skipping zero similarities. Rows are compared in
+    batches, sized so a batch's dense similarity block stays under
+    `max_batch_cells` cells.
+    """
+    count = matrix.shape[0]
+    k = min(k, count - 1)
+    if k <= 0:
+        return
+
+    batch_size = max(1, min(batch_size, max_batch_cells // count))
+    for start in range(0, count, batch_size):
+        end = min(start + batch_size, count)
+        scores = matrix.similarities(start, end)
+        scores[np.arange(end - start), np.arange(start, end)] = 0
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        # Best first, ties broken by row so results are deterministic
+        order = np.lexsort((candidates, -candidate_scores), axis=-1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        for offset, (neighbours, neighbour_scores) in enumerate(
+            zip(candidates, candidate_scores)
+        ):
+            keep = neighbour_scores > 1e-6
+            yield start + offset, neighbours[keep], neighbour_scores[keep]
+
+
+class SimilarityService:
+    """
+    Offline item-to-item similarity for `similar_products`.
+
+    Every listed product becomes a sparse feature vector made of blocks:
+    category, brand, style, size, colors, price band, the users who liked it
+    and the users who viewed it. Each block is scaled to a fixed norm, so the
+    cosine similarity of two products is a weighted mix of how much each
+    block agrees, and a product liked by thousands of users does not drown
+    out its category. The top `SIMILAR_PRODUCTS_TOP_K` neighbours of each
+    product are stored in ProductSimilarity, so serving them is one primary
+    key lookup.
+    """
+
+    # Squared norm of each feature block, i.e. its weight in the cosine
+    BLOCK_WEIGHTS = {
+        "category": 3.0,
+        "brand": 2.0,
+        "style": 1.0,
+        "size": 1.0,
+        "color": 1.0,
+        "price": 1.0,
+        "liked_by": 2.0,
+        "viewed_by": 1.0,
+    }
+
+    @staticmethod
+    def get_price_band(price) -> int:
+        """Logarithmic price band, so 10 and 12 share a band but 10 and 100 don't."""
+        return int(math.log(float(price) + 1, 1.5))
+
+    @staticmethod
+    def get_listed_products():
+        return (
+            Product.objects.filter(status=StatusChoices.ACTIVE, deleted=False)
+            .exclude(get_exclusion_queries("seller"))
+            .order_by("id")
+        )
+
+    @staticmethod
+    def get_attribute_blocks(
+        category_id, brand_id, custom_brand, style, size_id, colors, price
+    ) -> Dict[str, List[Hashable]]:
+        """Return the catalog attribute feature values of a product, per block."""
+        brand = brand_id or (fold(custom_brand.strip()) if custom_brand else None)
+        blocks = {
+            "category": [category_id],
+            "brand": [brand],
+            "style": [style],
+            "size": [size_id],
+            "color": [
+                normalize_color(color)
+                for color in colors or []
+                if isinstance(color, str)
+            ],
+            "price": [SimilarityService.get_price_band(price)],
+        }
+        return {
+            block: [value for value in values if value not in (None, "")]
+            for block, values in blocks.items()
+        }
+
+    @staticmethod
+    def get_feature_weights(
+        blocks: Dict[str, List[Hashable]],
+    ) -> Dict[Tuple[str, Hashable], float]:
+        """Scale the values of every block so the block's squared norm is its weight."""
+        weights = {}
+        for block, values in blocks.items():
+            values = set(values)
+            for value in values:
+                weights[(block, value)] = math.sqrt(
+                    SimilarityService.BLOCK_WEIGHTS[block] / len(values)
+                )
+        return weights
+
+    @staticmethod
+    def build_features(
+        products: Iterable[tuple],
+        likes: Iterable[Tuple[int, int]] = (),
+        views: Iterable[Tuple[int, int]] = (),
+    ) -> Tuple[List[int], SparseMatrix]:
+        """
+        Build the feature matrix of products given as (id, category_id, brand_id,
+        custom_brand, style, size_id, colors, price) tuples, with (product id,
+        user id) like and view pairs. Returns the product id of every row and
+        the matrix.
+        """
+        product_ids = []
+        blocks: List[Dict[str, List[Hashable]]] = []
+        rows_by_id = {}
+        for product_id, *attributes in products:
+            rows_by_id[product_id] = len(product_ids)
+            product_ids.append(product_id)
+            blocks.append(SimilarityService.get_attribute_blocks(*attributes))
+
+        for block, pairs in (("liked_by", likes), ("viewed_by", views)):
+            for product_id, user_id in pairs:
+                row = rows_by_id.get(product_id)
+                if row is not None:
+                    blocks[row].setdefault(block, []).append(user_id)
+
+        columns_by_feature = {}
+        rows, columns, values = [], [], []
+        for row, features in enumerate(blocks):
+            weights = SimilarityService.get_feature_weights(features)
+            for feature, value in weights.items():
+                rows.append(row)
+                columns.append(
+                    columns_by_feature.setdefault(feature, len(columns_by_feature))
+                )
+                values.append(value)
+
+        matrix = SparseMatrix(
+            np.array(rows, dtype=np.int64),
+            np.array(columns, dtype=np.int64),
+            np.array(values, dtype=np.float32),
+            (len(product_ids), len(columns_by_feature)),
+            columns_by_feature,
+        )
+        return product_ids, matrix
+
+    @staticmethod
+    def load_features() -> Tuple[List[int], SparseMatrix]:
+        products = SimilarityService.get_listed_products()
+        listed = products.values("id")
+
+        # Deduplicated (product, user) pairs, a user who liked twice counts once
+        likes = (
+            ProductLike.objects.filter(deleted=False, product__in=listed)
+            .values_list("product_id", "user_id")
+            .distinct()
+        )
+        views = (
+            ProductView.objects.filter(product__in=listed)
+            .values_list("product_id", "viewed_by_id")
+            .distinct()
+        )
+
+        return SimilarityService.build_features(
+            products.values_list(
+                "id",
+                "category_id",
+                "brand_id",
+                "custom_brand",
+                "style",
+                "size_id",
+                "color",
+                "price",
+            ).iterator(chunk_size=5000),
+            likes.iterator(chunk_size=5000),
+            views.iterator(chunk_size=5000),
+        )
+
+    @staticmethod
+    def rebuild(top_k: int = None, batch_size: int = 256) -> int:
+        """Recompute the neighbours of every listed product and return how many were stored."""
+        top_k = top_k or settings.SIMILAR_PRODUCTS_TOP_K
+        started = timezone.now()
+        product_ids, matrix = SimilarityService.load_features()
+
+        def save(rows):
+            ProductSimilarity.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["product"],
+                update_fields=["similar_product_ids", "scores", "updated_at"],
+            )
+
+        stored, pending = 0, []
+        for row, neighbours, scores in top_k_neighbours(matrix, top_k, batch_size):
+            pending.append(
+                ProductSimilarity(
+                    product_id=product_ids[row],
+                    similar_product_ids=[product_ids[n] for n in neighbours.tolist()],
+                    scores=[round(score, 4) for score in scores.tolist()],
+                )
+            )
+            if len(pending) >= 1000:
+                save(pending)
+                stored += len(pending)
+                pending = []
+
+        with transaction.atomic():
+            if pending:
+                save(pending)
+                stored += len(pending)
+            # Products that are no longer listed were not refreshed
+            ProductSimilarity.objects.filter(updated_at__lt=started).delete()
+
+        return stored
+
+    @staticmethod
+    def get_similar_product_ids(product_id: int) -> Optional[List[int]]:
+        """Return the precomputed neighbours of a product, or None if it has none yet."""
+        return (
+            ProductSimilarity.objects.filter(pk=product_id)
+            .values_list("similar_product_ids", flat=True)
+            .first()
+        )
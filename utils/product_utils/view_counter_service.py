@@ -0,0 +1,127 @@
+import logging
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from products.models import Product, ProductView
+from utils.non_modular_utils.write_buffer import get_write_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterService:
+    """
+    Write-behind product view counter.
+
+    Views are buffered per (product, user) pair, so repeat views inside a flush
+    window collapse into one entry carrying the latest view time. A periodic
+    flush applies the buffer with a handful of bulk statements: new pairs are
+    inserted into ProductView and added to Product.views, and pairs that already
+    exist only get their view time refreshed. Product.views therefore trails the
+    real count by at most `PRODUCT_VIEW_FLUSH_INTERVAL` seconds.
+    """
+
+    BUFFER_NAME = "product-views"
+
+    @staticmethod
+    def record_view(user_id: int, product_id: int) -> None:
+        viewed_at = timezone.now().timestamp()
+        buffer = get_write_buffer()
+
+        try:
+            buffer.set(
+                ViewCounterService.BUFFER_NAME,
+                {f"{product_id}:{user_id}": viewed_at},
+            )
+        except redis.RedisError as e:
+            # Don't lose the view when the buffer is unreachable, write it through
+            logger.warning(f"Could not buffer product view, writing it directly: {e}")
+            ViewCounterService.write_views({(product_id, user_id): viewed_at})
+            return
+
+        if buffer.should_flush(
+            ViewCounterService.BUFFER_NAME, settings.PRODUCT_VIEW_FLUSH_INTERVAL
+        ):
+            ViewCounterService.flush_views()
+
+    @staticmethod
+    def flush_views() -> int:
+        """Apply every buffered view and return the number of (product, user) pairs written."""
+        buffer = get_write_buffer()
+        buffered = buffer.drain(ViewCounterService.BUFFER_NAME)
+
+        views = {}
+        for key, viewed_at in buffered.items():
+            product_id, user_id = key.split(":")
+            views[(int(product_id), int(user_id))] = float(viewed_at)
+
+        try:
+            return ViewCounterService.write_views(views)
+        except Exception:
+            # Keep the drained views for the next flush
+            buffer.restore(ViewCounterService.BUFFER_NAME, buffered)
+            raise
+
+    @staticmethod
+    def write_views(views: Dict[Tuple[int, int], float]) -> int:
+        if not views:
+            return 0
+
+        product_ids = {product_id for product_id, _ in views}
+        user_ids = {user_id for _, user_id in views}
+
+        with transaction.atomic():
+            existing = {}
+            for view_id, product_id, user_id in ProductView.objects.filter(
+                product_id__in=product_ids, viewed_by_id__in=user_ids
+            ).values_list("id", "product_id", "viewed_by_id"):
+                existing.setdefault((product_id, user_id), view_id)
+
+            ProductView.objects.bulk_update(
+                [
+                    ProductView(
+                        id=existing[key],
+                        created_at=datetime.fromtimestamp(viewed_at, dt_timezone.utc),
+                    )
+                    for key, viewed_at in views.items()
+                    if key in existing
+                ],
+                ["created_at"],
+                batch_size=1000,
+            )
+
+            new_views = [key for key in views if key not in existing]
+            ProductView.objects.bulk_create(
+                [
+                    ProductView(
+                        product_id=product_id,
+                        viewed_by_id=user_id,
+                        created_at=datetime.fromtimestamp(
+                            views[(product_id, user_id)], dt_timezone.utc
+                        ),
+                    )
+                    for product_id, user_id in new_views
+                ],
+                batch_size=1000,
+            )
+
+            increments = Counter(product_id for product_id, _ in new_views)
+            if increments:
+                Product.objects.filter(id__in=increments).update(
+                    views=F("views")
+                    + Case(
+                        *[
+                            When(id=product_id, then=Value(count))
+                            for product_id, count in increments.items()
+                        ],
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                )
+
+        return len(views)
@@ -0,0 +1,68 @@
+import heapq
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Generic, Iterable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def fold(text: str) -> str:
+    """Fold case and accents for prefix matching, e.g. "Émile Zola" -> "emile zola"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(
+        character for character in decomposed if not unicodedata.combining(character)
+    ).casefold()
+
+
+class PrefixIndex(Generic[T]):
+    """
+    Immutable prefix index for autocomplete, ranked by popularity.
+
+    Folded names are kept in a sorted array, so the items matching a prefix
+    are one contiguous slice found with two binary searches. Short prefixes
+    match large slices, so the top results of every prefix up to
+    `PRECOMPUTED_PREFIX_LENGTH` characters are computed once up front.
+    """
+
+    PRECOMPUTED_PREFIX_LENGTH = 2
+    MAX_LIMIT = 50
+
+    def __init__(self, items: Iterable[Tuple[str, int, T]]):
+        """`items` holds (name, popularity, item) tuples."""
+        entries = sorted(
+            (fold(name), -popularity, name, item) for name, popularity, item in items
+        )
+        self._keys = [entry[0] for entry in entries]
+        self._entries = [(entry[1], entry[2], entry[3]) for entry in entries]
+
+        self._top: Dict[str, List[T]] = {}
+        for length in range(1, self.PRECOMPUTED_PREFIX_LENGTH + 1):
+            prefixes = {key[:length] for key in self._keys if len(key) >= length}
+            for prefix in prefixes:
+                self._top[prefix] = self._rank(prefix, self.MAX_LIMIT)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _rank(self, prefix: str, limit: int) -> List[T]:
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + "\U0010ffff", start)
+
+        # Entries sort by (-popularity, name), so the smallest are the best
+        return [
+            item
+            for _, _, item in heapq.nsmallest(
+                limit, self._entries[start:end], key=lambda entry: entry[:2]
+            )
+        ]
+
+    def search(self, prefix: str, limit: int = 10) -> List[T]:
+        """Return up to `limit` items whose name starts with `prefix`, most popular first."""
+        prefix = fold(prefix.strip())
+        limit = max(min(limit, self.MAX_LIMIT), 0)
+        if not prefix or not limit:
+            return []
+
+        if prefix in self._top:
+            return self._top[prefix][:limit]
+        return self._rank(prefix, limit)
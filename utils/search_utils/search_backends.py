@@ -0,0 +1,236 @@
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from products.models import Product
+from utils.search_utils.search_index import InvertedIndex, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class SearchBackend:
+    """
+    Full-text product search. `search` returns matching product ids ranked by
+    relevance, or None when the backend leaves matching to the database.
+    """
+
+    # Whether the backend keeps an index that product changes must be synced to
+    maintains_index = True
+
+    def search(self, query: str, limit: int = None) -> Optional[List[int]]:
+        raise NotImplementedError
+
+    def index_products(self, products: Iterable[Product]) -> None:
+        """Add or replace the given products in the index."""
+
+    def remove_products(self, product_ids: Iterable[int]) -> None:
+        """Drop the given products from the index."""
+
+    def save(self) -> None:
+        """Persist pending changes, for backends that keep their index locally."""
+
+    @staticmethod
+    def is_searchable(product: Product) -> bool:
+        return not product.deleted
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Substring matching on name and brand name in the products query itself."""
+
+    maintains_index = False
+
+    def search(self, query, limit=None):
+        return None
+
+
+class EmbeddedSearchBackend(SearchBackend):
+    """
+    In-process BM25 index over name, brand, hashtags and description, kept in
+    a file at `SEARCH_INDEX_PATH`. Every process reads its own copy and reloads
+    it when the file changes, so a single writer (the build command or the
+    indexing task) keeps all processes up to date.
+    """
+
+    FIELD_WEIGHTS = {"name": 3.0, "brand": 2.0, "hashtags": 2.0, "description": 1.0}
+
+    def __init__(self, path=None):
+        self.path = path or settings.SEARCH_INDEX_PATH
+        self._lock = threading.Lock()
+        self._index = None
+        self._modified_at = None
+
+    @property
+    def index(self) -> InvertedIndex:
+        try:
+            modified_at = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            modified_at = None
+
+        with self._lock:
+            if self._index is None or (
+                modified_at is not None and modified_at != self._modified_at
+            ):
+                self._index = InvertedIndex.load(self.path) or InvertedIndex()
+                self._modified_at = modified_at
+            return self._index
+
+    @classmethod
+    def get_fields(cls, product: Product):
+        brand = product.brand.name if product.brand_id else product.custom_brand
+        return [
+            (product.name, cls.FIELD_WEIGHTS["name"]),
+            (brand or "", cls.FIELD_WEIGHTS["brand"]),
+            (" ".join(product.hashtags or []), cls.FIELD_WEIGHTS["hashtags"]),
+            (product.description, cls.FIELD_WEIGHTS["description"]),
+        ]
+
+    def search(self, query, limit=None):
+        limit = limit or settings.SEARCH_MAX_RESULTS
+        return [product_id for product_id, _ in self.index.search(query, limit)]
+
+    def index_products(self, products):
+        index = self.index
+        for product in products:
+            if self.is_searchable(product):
+                index.add(product.id, self.get_fields(product))
+            else:
+                index.remove(product.id)
+
+    def remove_products(self, product_ids):
+        index = self.index
+        for product_id in product_ids:
+            index.remove(product_id)
+
+    def save(self):
+        with self._lock:
+            if self._index is None:
+                return
+            self._index.save(self.path)
+            self._modified_at = os.stat(self.path).st_mtime_ns
+
+
+class ElasticsearchSearchBackend(SearchBackend):
+    """Search through the `ProductDocument` Elasticsearch index."""
+
+    @property
+    def document(self):
+        from products.documents import ProductDocument
+
+        return ProductDocument
+
+    def search(self, query, limit=None):
+        limit = limit or settings.SEARCH_MAX_RESULTS
+        response = (
+            self.document.search()
+            .query(
+                "multi_match",
+                query=query,
+                fields=["name^3", "hashtags.keyword^2", "description"],
+                fuzziness="AUTO",
+            )
+            .source(False)[:limit]
+            .execute()
+        )
+        return [int(hit.meta.id) for hit in response]
+
+    def index_products(self, products):
+        products = list(products)
+        searchable = [product for product in products if self.is_searchable(product)]
+        if searchable:
+            self.document().update(searchable)
+        self.remove_products(
+            product.id for product in products if not self.is_searchable(product)
+        )
+
+    def remove_products(self, product_ids):
+        products = [Product(id=product_id) for product_id in product_ids]
+        if products:
+            # Products that were never indexed are not an error
+            self.document().update(products, action="delete", raise_on_error=False)
+
+
+class MemorySearchBackend(SearchBackend):
+    """
+    In-memory stand-in for a remote search engine, for tests and local
+    development. Every `index_products`/`remove_products` call is recorded as
+    one bulk request, and `fail_requests` makes the next requests raise.
+    """
+
+    def __init__(self):
+        self.documents: Dict[int, str] = {}
+        self.bulk_requests: List[List[Tuple[str, int]]] = []
+        self.fail_requests = 0
+
+    def bulk(self, actions: List[Tuple[str, int]]) -> None:
+        if self.fail_requests:
+            self.fail_requests -= 1
+            raise ConnectionError("Search backend unavailable")
+        self.bulk_requests.append(actions)
+
+    def search(self, query, limit=None):
+        limit = limit or settings.SEARCH_MAX_RESULTS
+        words = set(tokenize(query))
+        return sorted(
+            (
+                product_id
+                for product_id, text in self.documents.items()
+                if words <= set(tokenize(text))
+            ),
+            reverse=True,
+        )[:limit]
+
+    def index_products(self, products):
+        products = list(products)
+        self.bulk(
+            [
+                ("index" if self.is_searchable(product) else "delete", product.id)
+                for product in products
+            ]
+        )
+        for product in products:
+            if self.is_searchable(product):
+                brand = product.brand.name if product.brand_id else product.custom_brand
+                self.documents[product.id] = f"{product.name} {brand or ''}"
+            else:
+                self.documents.pop(product.id, None)
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        self.bulk([("delete", product_id) for product_id in product_ids])
+        for product_id in product_ids:
+            self.documents.pop(product_id, None)
+
+
+SEARCH_BACKENDS = {
+    "database": DatabaseSearchBackend,
+    "embedded": EmbeddedSearchBackend,
+    "elasticsearch": ElasticsearchSearchBackend,
+    "memory": MemorySearchBackend,
+}
+
+_backends = {}
+
+
+def get_search_backend() -> SearchBackend:
+    """Return the backend selected by `PRODUCT_SEARCH_BACKEND`, shared per process."""
+    name = settings.PRODUCT_SEARCH_BACKEND
+    if name not in _backends:
+        _backends[name] = SEARCH_BACKENDS[name]()
+    return _backends[name]
+
+
+def search_product_ids(query: str) -> Optional[List[int]]:
+    """
+    Rank products matching `query` with the configured backend. Returns None,
+    meaning "match in the database", for the database backend or when the
+    backend fails.
+    """
+    try:
+        return get_search_backend().search(query)
+    except Exception as e:
+        logger.warning(f"Product search backend failed, searching the database: {e}")
+        return None
@@ -0,0 +1,211 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.search_utils.prefix_index import fold
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case- and accent-folded word tokens."""
+    return TOKEN_PATTERN.findall(fold(text or ""))
+
+
+def ngrams(token: str, size: int = 3) -> List[str]:
+    """Return the character n-grams of a token, marked so they never clash with words."""
+    padded = f" {token} "
+    return [f"#{padded[i:i + size]}" for i in range(len(padded) - size + 1)]
+
+
+class InvertedIndex:
+    """
+    Embedded full-text index ranked with BM25.
+
+    Every document is a set of weighted fields. A field's tokens count
+    `weight` times towards the document's term frequencies, so a match in
+    the name outranks one in the description. Each token is also indexed as
+    character trigrams, which score query words missing from the vocabulary
+    at `NGRAM_WEIGHT`, so partial words and small typos still match.
+
+    Documents can be added, replaced and removed one at a time, and the
+    whole index is pickled to a single file.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    NGRAM_WEIGHT = 0.3
+    MIN_NGRAM_COVERAGE = 0.6
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # term -> {document id: weighted term frequency}
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        # document id -> {term: weighted term frequency}
+        self.documents: Dict[int, Dict[str, float]] = {}
+        # document id -> (word length, n-gram length)
+        self.lengths: Dict[int, Tuple[float, float]] = {}
+        self.total_lengths = [0.0, 0.0]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __contains__(self, document_id: int) -> bool:
+        return document_id in self.documents
+
+    @staticmethod
+    def analyze(fields: Iterable[Tuple[str, float]]) -> Dict[str, float]:
+        """Turn (text, weight) fields into weighted word and n-gram frequencies."""
+        terms = Counter()
+        for text, weight in fields:
+            for token in tokenize(text):
+                terms[token] += weight
+                for gram in ngrams(token):
+                    terms[gram] += weight
+        return dict(terms)
+
+    def add(self, document_id: int, fields: Iterable[Tuple[str, float]]) -> None:
+        """Index a document, replacing any previous version of it."""
+        terms = self.analyze(fields)
+
+        with self._lock:
+            self.remove(document_id)
+
+            lengths = [0.0, 0.0]
+            for term, frequency in terms.items():
+                self.postings[term][document_id] = frequency
+                lengths[term.startswith("#")] += frequency
+
+            self.documents[document_id] = terms
+            self.lengths[document_id] = tuple(lengths)
+            self.total_lengths[0] += lengths[0]
+            self.total_lengths[1] += lengths[1]
+
+    def remove(self, document_id: int) -> None:
+        with self._lock:
+            terms = self.documents.pop(document_id, None)
+            if terms is None:
+                return
+
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(document_id, None)
+                    if not postings:
+                        del self.postings[term]
+
+            lengths = self.lengths.pop(document_id)
+            self.total_lengths[0] -= lengths[0]
+            self.total_lengths[1] -= lengths[1]
+
+    def search(self, query: str, limit: int = 1000) -> List[Tuple[int, float]]:
+        """
+        Return up to `limit` (document id, score) pairs, best first. Every
+        query word must match a document. Indexed words match whole; any
+        other word matches documents sharing at least `MIN_NGRAM_COVERAGE` of
+        its trigrams.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            count = len(self.documents)
+            if not count:
+                return []
+
+            # (term, weight) pairs to score and the documents matching each word
+            terms, matches = [], []
+            for token in tokens:
+                if token in self.postings:
+                    terms.append((token, 1.0))
+                    matches.append(self.postings[token].keys())
+                    continue
+
+                # Unknown words (partial words and typos) match by trigrams
+                grams = set(ngrams(token))
+                coverage = Counter()
+                for gram in grams:
+                    coverage.update(self.postings.get(gram, {}).keys())
+                terms += [(gram, self.NGRAM_WEIGHT) for gram in grams]
+                matches.append(
+                    {
+                        document_id
+                        for document_id, matched in coverage.items()
+                        if matched >= self.MIN_NGRAM_COVERAGE * len(grams)
+                    }
+                )
+
+            matches.sort(key=len)
+            candidates = set(matches[0]).intersection(*matches[1:])
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for term, weight in terms:
+                postings = self.postings.get(term, {})
+                is_gram = term.startswith("#")
+                average_length = max(self.total_lengths[is_gram] / count, 1e-9)
+                idf = math.log(
+                    1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+
+                # Walk the shorter of the candidates and the posting list
+                if len(postings) < len(scores):
+                    pairs = (
+                        (document_id, frequency)
+                        for document_id, frequency in postings.items()
+                        if document_id in scores
+                    )
+                else:
+                    pairs = (
+                        (document_id, postings[document_id])
+                        for document_id in scores
+                        if document_id in postings
+                    )
+
+                for document_id, frequency in pairs:
+                    length = self.lengths[document_id][is_gram]
+                    norm = self.K1 * (1 - self.B + self.B * length / average_length)
+                    scores[document_id] += (
+                        weight * idf * frequency * (self.K1 + 1) / (frequency + norm)
+                    )
+
+        return heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+
+    def save(self, path: str) -> None:
+        """Write the index to `path` atomically."""
+        with self._lock:
+            state = (
+                dict(self.postings),
+                self.documents,
+                self.lengths,
+                self.total_lengths,
+            )
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+                pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(file.name, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["InvertedIndex"]:
+        """Read an index saved with `save`, or return None if there is none."""
+        try:
+            with open(path, "rb") as file:
+                postings, documents, lengths, total_lengths = pickle.load(file)
+        except FileNotFoundError:
+            return None
+
+        index = cls()
+        index.postings = defaultdict(dict, postings)
+        index.documents = documents
+        index.lengths = lengths
+        index.total_lengths = total_lengths
+        return index
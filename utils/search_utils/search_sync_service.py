@@ -0,0 +1,131 @@
+import logging
+from typing import Dict, Iterable
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from products.models import Product
+from utils.non_modular_utils.write_buffer import get_write_buffer
+from utils.search_utils.search_backends import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+
+class SearchSyncService:
+    """
+    Change-capture pipeline from products to the search backend.
+
+    Product writes enqueue the product id once their transaction commits.
+    The queue is a hash keyed by product id, so a product changed many times
+    between flushes is indexed once, from its state at flush time. A periodic
+    flush drains the queue into bulk requests of at most
+    `SEARCH_INDEX_BATCH_SIZE` documents; products that no longer exist or are
+    no longer searchable are deleted from the index.
+
+    A failed batch goes back on the queue with its attempt count raised, and
+    after `SEARCH_INDEX_MAX_ATTEMPTS` failures its ids move to a dead-letter
+    hash holding the last error, until `retry_dead_letters` re-queues them.
+    """
+
+    QUEUE_NAME = "search-index-queue"
+    DEAD_LETTER_NAME = "search-index-dead-letter"
+
+    @staticmethod
+    def enqueue(product_ids: Iterable[int]) -> None:
+        if not get_search_backend().maintains_index:
+            return
+
+        # Queue values are the number of failed attempts, a new change resets it
+        values = {str(product_id): 0 for product_id in product_ids}
+        if values:
+            transaction.on_commit(lambda: SearchSyncService.push(values))
+
+    @staticmethod
+    def push(values: Dict[str, int]) -> None:
+        buffer = get_write_buffer()
+
+        try:
+            buffer.set(SearchSyncService.QUEUE_NAME, values)
+        except redis.RedisError as e:
+            # Keep the index fresh when the queue is unreachable, index them now
+            logger.warning(f"Could not queue products for indexing, indexing now: {e}")
+            try:
+                SearchSyncService.write_batch(
+                    [int(product_id) for product_id in values]
+                )
+            except Exception as e:
+                logger.warning(f"Could not index products {', '.join(values)}: {e}")
+            return
+
+        if buffer.local and (
+            buffer.size(SearchSyncService.QUEUE_NAME)
+            >= settings.SEARCH_INDEX_BATCH_SIZE
+            or buffer.should_flush(
+                SearchSyncService.QUEUE_NAME, settings.SEARCH_INDEX_FLUSH_INTERVAL
+            )
+        ):
+            SearchSyncService.flush()
+
+    @staticmethod
+    def flush() -> int:
+        """Index every queued product and return the number indexed successfully."""
+        buffer = get_write_buffer()
+        queued = buffer.drain(SearchSyncService.QUEUE_NAME)
+        product_ids = sorted(int(product_id) for product_id in queued)
+        batch_size = settings.SEARCH_INDEX_BATCH_SIZE
+
+        indexed = 0
+        for start in range(0, len(product_ids), batch_size):
+            batch = product_ids[start : start + batch_size]
+            try:
+                SearchSyncService.write_batch(batch)
+            except Exception as e:
+                logger.warning(f"Could not index {len(batch)} products: {e}")
+                SearchSyncService.requeue(
+                    {product_id: int(queued[str(product_id)]) for product_id in batch},
+                    e,
+                )
+            else:
+                indexed += len(batch)
+
+        return indexed
+
+    @staticmethod
+    def write_batch(product_ids: Iterable[int]) -> None:
+        backend = get_search_backend()
+        products = list(
+            Product.objects.select_related("brand").filter(id__in=product_ids)
+        )
+        if products:
+            backend.index_products(products)
+
+        found = {product.id for product in products}
+        backend.remove_products(
+            product_id for product_id in product_ids if product_id not in found
+        )
+        backend.save()
+
+    @staticmethod
+    def requeue(attempts: Dict[int, int], error: Exception) -> None:
+        buffer = get_write_buffer()
+        retry, dead = {}, {}
+        for product_id, failed in attempts.items():
+            if failed + 1 >= settings.SEARCH_INDEX_MAX_ATTEMPTS:
+                dead[str(product_id)] = str(error)
+            else:
+                retry[str(product_id)] = failed + 1
+
+        if retry:
+            buffer.set(SearchSyncService.QUEUE_NAME, retry)
+        if dead:
+            logger.error(f"Giving up indexing products {', '.join(dead)}: {error}")
+            buffer.set(SearchSyncService.DEAD_LETTER_NAME, dead)
+
+    @staticmethod
+    def retry_dead_letters() -> int:
+        """Move dead-lettered products back to the queue and return how many moved."""
+        buffer = get_write_buffer()
+        dead = buffer.drain(SearchSyncService.DEAD_LETTER_NAME)
+        if dead:
+            buffer.set(SearchSyncService.QUEUE_NAME, dict.fromkeys(dead, 0))
+        return len(dead)
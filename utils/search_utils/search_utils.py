@@ -1,11 +1,22 @@
-from datetime import timedelta
-from django.db.models import Count, Avg, Max, Min, F
-from django.db.models.functions import ExtractDay, TruncDate, ExtractHour
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum, F, Value
+from django.db.models.functions import ExtractHour, TruncDate
 from django.utils import timezone
-from accounts.models import SearchHistory, User
+from accounts.choices import SearchRollupPeriodChoice
+from accounts.models import SearchHistory, SearchRollup, User, UserSearchRollup
+from utils.non_modular_utils.write_buffer import get_write_buffer
+from utils.search_utils.trending_searches import trending_searches
+
+logger = logging.getLogger(__name__)
 
 
 class SearchUtils:
+    COUNTS_BUFFER_NAME = "search-counts"
+    DETAILS_BUFFER_NAME = "search-details"
 
     @staticmethod
     def get_top_searches_by_frequency(days=30, limit=10, user=None):
@@ -20,94 +31,421 @@ class SearchUtils:
         Returns:
             QuerySet: Top searches with frequency stats
         """
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        start_date = timezone.now() - timedelta(days=days)
 
-        # Base query
-        query = SearchHistory.objects.filter(
-            timestamp__gte=start_date, timestamp__lte=end_date, deleted=False
-        )
-
-        # Add user filter if specified
+        # Per-user searches come from the user's hourly rollups, global searches
+        # from the daily ones
         if user:
-            query = query.filter(user=user)
+            rollups = UserSearchRollup.objects.filter(
+                user=user, bucket__gte=start_date
+            ).annotate(day=TruncDate("bucket"))
+            unique_users = Value(1)
+            days_active = Count("day", distinct=True)
+        else:
+            rollups = SearchRollup.objects.filter(
+                period=SearchRollupPeriodChoice.DAY,
+                bucket__gte=SearchUtils.get_bucket(
+                    start_date, SearchRollupPeriodChoice.DAY
+                ),
+            )
+            unique_users = Sum("unique_users")
+            days_active = Count("id")
 
         # Aggregate search statistics
         top_searches = (
-            query.values("query")
+            rollups.values("query")
             .annotate(
-                total_searches=Count("id"),
-                unique_users=Count("user", distinct=True),
-                avg_frequency=Avg("search_frequency"),
+                total_searches=Sum("search_count"),
+                unique_users=unique_users,
                 last_searched=Max("last_searched"),
-                days_active=ExtractDay(Max("timestamp") - Min("timestamp")) + 1,
+                days_active=days_active,
             )
             .annotate(searches_per_day=F("total_searches") / F("days_active"))
+            .annotate(avg_frequency=F("total_searches") * 100 / F("days_active"))
             .order_by("-searches_per_day")[:limit]
         )
 
         return top_searches
 
     @staticmethod
-    def calculate_frequency(user, query, days=30):
+    def get_trending_searches(limit=10):
+        """
+        Get the approximate top searches of the last hour seen by this process,
+        as (query, searches) pairs
+        """
+        return trending_searches.top(limit)
+
+    @staticmethod
+    def get_bucket(moment, period):
+        """Return the start of the hour or day that contains `moment`."""
+        bucket = moment.astimezone(dt_timezone.utc).replace(
+            minute=0, second=0, microsecond=0
+        )
+        if period == SearchRollupPeriodChoice.DAY:
+            bucket = bucket.replace(hour=0)
+        return bucket
+
+    @staticmethod
+    def get_search_frequency(recent_count, first_searched, now, days=30):
         """
-        Calculate search frequency: searches per day over the last specified days
+        Calculate search frequency: searches per day over the last specified
+        days, or since the first search when it is more recent. `recent_count`
+        is the number of searches within those days.
         Returns searches per day multiplied by 100 to store as an integer
         """
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        active_days = min(max((now - first_searched).days + 1, 1), days)
+        return int(recent_count / active_days * 100)
+
+    @staticmethod
+    def get_recent_search_counts(keys, now, days=30):
+        """Return the searches of each (user id, query) pair within the last specified days, from the user rollups."""
+        if not keys:
+            return {}
 
-        # Get daily search counts for this query
-        daily_searches = (
-            SearchHistory.objects.filter(
-                user=user,
-                query=query,
-                timestamp__gte=start_date,
-                timestamp__lte=end_date,
+        rollups = (
+            UserSearchRollup.objects.filter(
+                user_id__in={user_id for user_id, _ in keys},
+                query__in={query for _, query in keys},
+                bucket__gte=now - timedelta(days=days),
             )
-            .annotate(date=TruncDate("timestamp"))
-            .values("date")
-            .annotate(daily_count=Count("id"))
-            .count()
+            .order_by()
+            .values("user_id", "query")
+            .annotate(search_count=Sum("search_count"))
         )
+        return {
+            (rollup["user_id"], rollup["query"]): rollup["search_count"]
+            for rollup in rollups
+        }
+
+    @staticmethod
+    def save_search_query(user: User, query: str, search_type: str):
+        """
+        Record a search without touching the database. Searches are counted per
+        (user, query) in the write buffer and applied by `flush_search_history`.
+        Failures are logged, so recording a search never fails the search.
+        """
+        try:
+            SearchUtils.buffer_search(user.id, query, search_type)
+        except Exception as e:
+            logger.exception(f"An error occurred while saving the search. {e}")
 
-        # Calculate searches per day (multiplied by 100 to store as integer)
-        # If no days have searches, default to 100 (1 search per day)
-        if daily_searches == 0:
-            return 100
+    @staticmethod
+    def buffer_search(user_id: int, query: str, search_type: str):
+        trending_searches.add(query)
 
-        frequency = (daily_searches / days) * 100
-        return int(frequency)
+        buffer = get_write_buffer()
+        key = f"{user_id}:{query}"
+
+        try:
+            buffer.increment(SearchUtils.COUNTS_BUFFER_NAME, key)
+            buffer.set(
+                SearchUtils.DETAILS_BUFFER_NAME,
+                {key: f"{timezone.now().timestamp()}|{search_type}"},
+            )
+        except redis.RedisError as e:
+            logger.warning(
+                f"An error occurred while buffering the search, saving it directly. {e}"
+            )
+            SearchUtils.write_searches(
+                {(user_id, query): (1, timezone.now(), search_type)}
+            )
+            return
+
+        if buffer.should_flush(
+            SearchUtils.COUNTS_BUFFER_NAME, settings.SEARCH_HISTORY_FLUSH_INTERVAL
+        ):
+            SearchUtils.flush_search_history()
 
     @staticmethod
-    def save_search_query(user: User, query: str, search_type: str):
+    def flush_search_history() -> int:
+        """Apply buffered searches to SearchHistory and return the number of (user, query) pairs written."""
+        buffer = get_write_buffer()
+        counts = buffer.drain(SearchUtils.COUNTS_BUFFER_NAME)
+        details = buffer.drain(SearchUtils.DETAILS_BUFFER_NAME)
+
+        searches = {}
+        for key in counts.keys() | details.keys():
+            user_id, query = key.split(":", 1)
+            searched_at, search_type = None, None
+            if key in details:
+                timestamp, search_type = details[key].split("|", 1)
+                searched_at = datetime.fromtimestamp(float(timestamp), dt_timezone.utc)
+            searches[(int(user_id), query)] = (
+                int(counts.get(key, 0)),
+                searched_at,
+                search_type,
+            )
+
         try:
-            search_history, created = SearchHistory.objects.get_or_create(
-                user=user,
-                query=query,
-                defaults={
-                    "search_type": search_type,
-                    "search_count": 1,
-                    "last_searched": timezone.now(),
-                    "search_frequency": SearchUtils.calculate_frequency(user, query),
-                },
+            return SearchUtils.write_searches(searches)
+        except Exception:
+            # Keep the drained searches for the next flush. Counts are added to
+            # the ones buffered since the drain, details only fill the gaps
+            for key, count in counts.items():
+                buffer.increment(SearchUtils.COUNTS_BUFFER_NAME, key, int(count))
+            buffer.restore(SearchUtils.DETAILS_BUFFER_NAME, details)
+            raise
+
+    @staticmethod
+    def write_searches(searches) -> int:
+        """
+        Upsert searches given as {(user id, query): (count, last searched, search type)},
+        updating counts incrementally and frequencies from the rollups.
+        """
+        if not searches:
+            return 0
+
+        now = timezone.now()
+        user_ids = {user_id for user_id, _ in searches}
+        queries = {query for _, query in searches}
+
+        with transaction.atomic():
+            existing = {}
+            for search_history in SearchHistory.objects.select_for_update().filter(
+                user_id__in=user_ids, query__in=queries
+            ):
+                existing.setdefault(
+                    (search_history.user_id, search_history.query), search_history
+                )
+
+            created, updated, rollup_events = [], [], []
+            for (user_id, query), (count, searched_at, search_type) in searches.items():
+                search_history = existing.get((user_id, query))
+                if count:
+                    rollup_events.append(
+                        (
+                            user_id,
+                            query,
+                            count,
+                            searched_at or now,
+                            search_history.last_searched if search_history else None,
+                        )
+                    )
+
+                if search_history is None:
+                    if not count:
+                        continue
+                    created.append(
+                        SearchHistory(
+                            user_id=user_id,
+                            query=query,
+                            search_type=search_type,
+                            search_count=count,
+                            timestamp=searched_at or now,
+                            last_searched=searched_at or now,
+                        )
+                    )
+                    continue
+
+                search_history.search_count += count
+                search_history.search_type = search_type or search_history.search_type
+                search_history.last_searched = searched_at or now
+                updated.append(search_history)
+
+            # Frequencies count the searches of the window, so they are read
+            # from the rollups once these searches are in them
+            SearchUtils.update_rollups(rollup_events)
+            recent_counts = SearchUtils.get_recent_search_counts(
+                [
+                    (search_history.user_id, search_history.query)
+                    for search_history in created + updated
+                ],
+                now,
+            )
+            for search_history in created + updated:
+                search_history.search_frequency = SearchUtils.get_search_frequency(
+                    recent_counts.get(
+                        (search_history.user_id, search_history.query), 0
+                    ),
+                    search_history.timestamp or now,
+                    now,
+                )
+
+            SearchHistory.objects.bulk_create(created, batch_size=1000)
+            SearchHistory.objects.bulk_update(
+                updated,
+                ["search_count", "search_type", "last_searched", "search_frequency"],
+                batch_size=1000,
             )
 
-            if not created:
-                search_history.search_count += 1
-                search_history.search_type = search_type
-                search_history.last_searched = timezone.now()
-                # Update frequency based on recent search history
-                search_history.search_frequency = SearchUtils.calculate_frequency(
-                    user, query
+        return len(created) + len(updated)
+
+    @staticmethod
+    def update_rollups(events) -> None:
+        """
+        Add searches to the hourly and daily rollups. `events` holds
+        (user id, query, count, searched at, previous search of the query by the
+        user) tuples; a user adds to a bucket's unique users unless their
+        previous search of the query already fell in that bucket.
+        """
+        global_rollups, user_rollups = {}, {}
+        for user_id, query, count, searched_at, previously_searched in events:
+            for period in SearchRollupPeriodChoice.values:
+                bucket = SearchUtils.get_bucket(searched_at, period)
+                new_user = previously_searched is None or previously_searched < bucket
+
+                search_count, unique_users, last_searched = global_rollups.get(
+                    (query, period, bucket), (0, 0, searched_at)
+                )
+                global_rollups[(query, period, bucket)] = (
+                    search_count + count,
+                    unique_users + int(new_user),
+                    max(last_searched, searched_at),
                 )
-                search_history.save()
 
-            return search_history
+            bucket = SearchUtils.get_bucket(searched_at, SearchRollupPeriodChoice.HOUR)
+            search_count, last_searched = user_rollups.get(
+                (user_id, query, bucket), (0, searched_at)
+            )
+            user_rollups[(user_id, query, bucket)] = (
+                search_count + count,
+                max(last_searched, searched_at),
+            )
 
-        except Exception as e:
-            print(f"An error occurred while saving the search. {e}")
-            return None
+        SearchUtils.upsert_rollups(
+            SearchRollup,
+            ["query", "period", "bucket"],
+            {
+                key: {
+                    "search_count": search_count,
+                    "unique_users": unique_users,
+                    "last_searched": last_searched,
+                }
+                for key, (
+                    search_count,
+                    unique_users,
+                    last_searched,
+                ) in global_rollups.items()
+            },
+        )
+        SearchUtils.upsert_rollups(
+            UserSearchRollup,
+            ["user_id", "query", "bucket"],
+            {
+                key: {"search_count": search_count, "last_searched": last_searched}
+                for key, (search_count, last_searched) in user_rollups.items()
+            },
+        )
+
+    @staticmethod
+    def upsert_rollups(model, key_fields, increments) -> None:
+        """Add counts to existing rollup rows and create the missing ones."""
+        if not increments:
+            return
+
+        existing = model.objects.select_for_update().filter(
+            **{
+                f"{field}__in": {key[index] for key in increments}
+                for index, field in enumerate(key_fields)
+            }
+        )
+        existing = {
+            tuple(getattr(rollup, field) for field in key_fields): rollup
+            for rollup in existing
+        }
+
+        created, updated = [], []
+        for key, values in increments.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                created.append(model(**dict(zip(key_fields, key)), **values))
+                continue
+
+            for field, value in values.items():
+                if field == "last_searched":
+                    rollup.last_searched = max(rollup.last_searched or value, value)
+                else:
+                    setattr(rollup, field, F(field) + value)
+            updated.append(rollup)
+
+        model.objects.bulk_create(created, batch_size=1000)
+        model.objects.bulk_update(
+            updated, list(next(iter(increments.values()))), batch_size=1000
+        )
+
+    @staticmethod
+    def prune_rollups(hourly_days=7, user_days=90) -> int:
+        """Delete rollups older than needed by trending and pattern queries."""
+        now = timezone.now()
+        deleted, _ = SearchRollup.objects.filter(
+            period=SearchRollupPeriodChoice.HOUR,
+            bucket__lt=now - timedelta(days=hourly_days),
+        ).delete()
+        user_deleted, _ = UserSearchRollup.objects.filter(
+            bucket__lt=now - timedelta(days=user_days)
+        ).delete()
+        return deleted + user_deleted
+
+    @staticmethod
+    def backfill_rollups(batch_size=1000) -> int:
+        """
+        Add the searches of SearchHistory that are missing from the rollups,
+        that is searches made before the rollups existed, and return how many
+        searches were added. History only keeps the first and last time of a
+        query, so the first search is bucketed at its time and the others at
+        the last search made before the query's first rollup. Searches already
+        in a user's rollups are skipped, so running it again adds nothing.
+        """
+        history = SearchHistory.objects.only(
+            "id", "user_id", "query", "timestamp", "search_count", "last_searched"
+        ).order_by("id")
+
+        backfilled, last_id = 0, 0
+        while True:
+            batch = list(history.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            rollups = (
+                UserSearchRollup.objects.filter(
+                    user_id__in={search.user_id for search in batch},
+                    query__in={search.query for search in batch},
+                )
+                .order_by()
+                .values("user_id", "query")
+                .annotate(search_count=Sum("search_count"), first_bucket=Min("bucket"))
+            )
+            rolled_up = {
+                (rollup["user_id"], rollup["query"]): (
+                    rollup["search_count"],
+                    rollup["first_bucket"],
+                )
+                for rollup in rollups
+            }
+
+            events = []
+            for search in batch:
+                search_count, first_bucket = rolled_up.get(
+                    (search.user_id, search.query), (0, None)
+                )
+                missing = search.search_count - search_count
+                if missing <= 0:
+                    continue
+
+                events.append((search.user_id, search.query, 1, search.timestamp, None))
+                if missing > 1:
+                    last_searched = search.last_searched
+                    if first_bucket is not None:
+                        before_rollups = first_bucket - timedelta(microseconds=1)
+                        last_searched = max(
+                            min(last_searched, before_rollups), search.timestamp
+                        )
+                    events.append(
+                        (
+                            search.user_id,
+                            search.query,
+                            missing - 1,
+                            last_searched,
+                            search.timestamp,
+                        )
+                    )
+                backfilled += missing
+
+            with transaction.atomic():
+                SearchUtils.update_rollups(events)
+
+        return backfilled
 
     @staticmethod
     def get_user_search_patterns(user, days=30):
@@ -124,23 +462,25 @@ class SearchUtils:
         end_date = timezone.now()
         start_date = end_date - timedelta(days=days)
 
-        searches = SearchHistory.objects.filter(
-            user=user, timestamp__gte=start_date, deleted=False
-        )
+        rollups = UserSearchRollup.objects.filter(user=user, bucket__gte=start_date)
 
         patterns = {
-            "total_searches": searches.count(),
-            "unique_queries": searches.values("query").distinct().count(),
-            "top_queries": searches.values("query")
-            .annotate(count=Count("id"), avg_frequency=Avg("search_frequency"))
+            "total_searches": rollups.aggregate(total=Sum("search_count"))["total"]
+            or 0,
+            "unique_queries": rollups.values("query").distinct().count(),
+            "top_queries": rollups.values("query")
+            .annotate(count=Sum("search_count"))
+            .annotate(avg_frequency=F("count") * 100 / days)
             .order_by("-count")[:5],
-            "search_times": searches.annotate(hour=ExtractHour("timestamp"))
+            "search_times": rollups.annotate(hour=ExtractHour("bucket"))
             .values("hour")
-            .annotate(count=Count("id"))
+            .annotate(count=Sum("search_count"))
             .order_by("hour"),
-            "most_recent": searches.order_by("-timestamp").values("query", "timestamp")[
-                :5
-            ],
+            "most_recent": SearchHistory.objects.filter(
+                user=user, last_searched__gte=start_date, deleted=False
+            )
+            .order_by("-last_searched")
+            .values("query", "last_searched")[:5],
         }
 
         return patterns
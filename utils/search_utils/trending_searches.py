@@ -0,0 +1,74 @@
+import threading
+from typing import Dict, List, Tuple
+
+from django.utils import timezone
+
+
+class SpaceSavingSketch:
+    """
+    Space-Saving heavy-hitters sketch. Tracks at most `capacity` queries; when a
+    new query arrives while full, it replaces the least counted one and
+    inherits its count, so counts may overestimate by at most that minimum.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, query: str, count: int = 1) -> None:
+        if query in self.counts or len(self.counts) < self.capacity:
+            self.counts[query] = self.counts.get(query, 0) + count
+            return
+
+        evicted = min(self.counts, key=self.counts.get)
+        self.counts[query] = self.counts.pop(evicted) + count
+
+
+class TrendingSearches:
+    """
+    Approximate top searches over the last hour, kept in process memory.
+
+    Searches are counted in one sketch per clock hour. The last-hour count of a
+    query is its count in the current hour plus the previous hour's count
+    weighted by the part of that hour still inside the window.
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._hour = None
+        self._current = SpaceSavingSketch(capacity)
+        self._previous = SpaceSavingSketch(capacity)
+
+    def _rotate(self, now) -> None:
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        if hour == self._hour:
+            return
+
+        if self._hour is not None and (hour - self._hour).total_seconds() == 3600:
+            self._previous = self._current
+        else:
+            self._previous = SpaceSavingSketch(self.capacity)
+        self._current = SpaceSavingSketch(self.capacity)
+        self._hour = hour
+
+    def add(self, query: str, count: int = 1, now=None) -> None:
+        with self._lock:
+            self._rotate(now or timezone.now())
+            self._current.add(query.strip().lower(), count)
+
+    def top(self, limit: int = 10, now=None) -> List[Tuple[str, int]]:
+        now = now or timezone.now()
+        with self._lock:
+            self._rotate(now)
+            previous_weight = 1 - (now.minute * 60 + now.second) / 3600
+
+            estimates = dict(self._current.counts)
+            for query, count in self._previous.counts.items():
+                estimates[query] = estimates.get(query, 0) + count * previous_weight
+
+        ranked = sorted(estimates.items(), key=lambda item: item[1], reverse=True)
+        return [(query, round(count)) for query, count in ranked[:limit] if count >= 1]
+
+
+trending_searches = TrendingSearches()
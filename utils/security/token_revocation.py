@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedTokens:
+    """
+    Revoked JWT access tokens.
+
+    Revocations are appended to a Redis sorted set scored by revocation time,
+    as "<token digest>:<expiry>" members. Every process keeps a local TTL set
+    of digests that it tops up with only the revocations made since its last
+    sync, at most once every `REVOKED_TOKENS_SYNC_INTERVAL` seconds. Checking
+    a token is then an in-memory lookup, and a token revoked by another process
+    is rejected within one sync interval. Revoking a token also adds it locally
+    right away.
+    """
+
+    REDIS_KEY = "revoked-tokens"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # digest -> expiry timestamp
+        self._revoked = {}
+        self._synced_at = None
+        self._synced_until = 0.0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    @property
+    def client(self):
+        from utils.jobs.base import REDIS_CLIENT
+
+        return REDIS_CLIENT
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        digest = self.digest(token)
+        now = time.time()
+
+        with self._lock:
+            self._revoked[digest] = expires_at
+
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.zadd(self.REDIS_KEY, {f"{digest}:{expires_at}": now})
+            # Tokens revoked longer ago than a token can live have all expired
+            pipeline.zremrangebyscore(
+                self.REDIS_KEY,
+                "-inf",
+                now - settings.GRAPHQL_JWT["JWT_EXPIRATION_DELTA"].total_seconds(),
+            )
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not share token revocation: {e}")
+
+    def is_revoked(self, token: str) -> bool:
+        self.sync()
+
+        digest = self.digest(token)
+        with self._lock:
+            expires_at = self._revoked.get(digest)
+            if expires_at is not None and expires_at <= time.time():
+                del self._revoked[digest]
+                return False
+
+        return expires_at is not None
+
+    def sync(self, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if (
+                not force
+                and self._synced_at is not None
+                and now - self._synced_at < settings.REVOKED_TOKENS_SYNC_INTERVAL
+            ):
+                return
+            self._synced_at = now
+            # Overlap the previous window a little to allow for clock skew
+            since = max(self._synced_until - 5, 0)
+
+        try:
+            revocations = self.client.zrangebyscore(
+                self.REDIS_KEY, since, "+inf", withscores=True
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not sync revoked tokens: {e}")
+            return
+
+        current_time = time.time()
+        with self._lock:
+            for member, revoked_at in revocations:
+                digest, expires_at = member.decode().split(":")
+                if float(expires_at) > current_time:
+                    self._revoked[digest] = float(expires_at)
+                self._synced_until = max(self._synced_until, revoked_at)
+
+            self._revoked = {
+                digest: expires_at
+                for digest, expires_at in self._revoked.items()
+                if expires_at > current_time
+            }
+
+
+revoked_tokens = RevokedTokens()
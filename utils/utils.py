@@ -3,13 +3,13 @@ import os
 import uuid
 import pytz
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Count, Q
 from datetime import datetime, timezone
 from accounts.models import User
 from accounts.schema.enums.accounts_enums import SearchTypeEnum
-from products.choices import StatusChoices
-from products.models import Category, Product
+from products.models import CategoryClosure, ProductColor, ProductHashtag
 from products.schema.enums.product_enums import ClientOrderStatusEnum, OrderStatusEnum
+from utils.search_utils.search_backends import search_product_ids
 from utils.search_utils.search_utils import SearchUtils
 from typing import List, Optional
 from asgiref.sync import async_to_sync
@@ -111,7 +111,9 @@ def generate_reference():
     return f"PRELURA-{uuid.uuid4()}-{milli_date()}".lower()
 
 
-def build_product_filter_conditions(user, filters: dict, search: str = None) -> Q:
+def build_product_filter_conditions(
+    user, filters: dict, search: str = None, search_results: List[int] = None
+) -> Q:
     # Initialize filter conditions with deleted=False to exclude deleted items
     filter_conditions = Q(deleted=False)
 
@@ -121,9 +123,9 @@ def build_product_filter_conditions(user, filters: dict, search: str = None) ->
     if "brand" in filters and filters["brand"] is not None:
         filter_conditions &= Q(brand__id=filters["brand"])
     if "parent_category" in filters and filters["parent_category"] is not None:
-        child_categories_ids = Category.objects.filter(
-            slug__startswith=filters["parent_category"].value.lower()
-        ).values_list("id", flat=True)
+        child_categories_ids = CategoryClosure.objects.filter(
+            ancestor__slug=filters["parent_category"].value.lower()
+        ).values("descendant_id")
         filter_conditions &= Q(category__in=child_categories_ids)
     if "category" in filters and filters["category"] is not None:
         filter_conditions &= Q(category__id=filters["category"])
@@ -149,18 +151,26 @@ def build_product_filter_conditions(user, filters: dict, search: str = None) ->
         filter_conditions &= Q(status=filters["status"].value)
     if "discount_price" in filters and filters["discount_price"] is True:
         filter_conditions &= Q(discount_price__gt=0)
-    if "hashtags" in filters:
+    if filters.get("hashtags"):
         filter_conditions &= Q(
-            id__in=get_product_ids_with_hashtags(filters["hashtags"])
+            id__in=get_product_ids_with_hashtags(
+                filters["hashtags"], filters.get("match_all_hashtags", False)
+            )
         )
-    if "colors" in filters:
-        filter_conditions &= Q(color__contains=filters["colors"])
+    if filters.get("colors"):
+        filter_conditions &= Q(id__in=get_product_ids_with_colors(filters["colors"]))
 
     # Add search term filter if provided
     if search:
-        filter_conditions &= Q(name__icontains=search) | Q(
-            brand__name__icontains=search
-        )
+        # Ranked ids from the search backend, or None to match in the database
+        if search_results is None:
+            search_results = search_product_ids(search)
+        if search_results is None:
+            filter_conditions &= Q(name__icontains=search) | Q(
+                brand__name__icontains=search
+            )
+        else:
+            filter_conditions &= Q(id__in=search_results)
         if user:
             SearchUtils.save_search_query(
                 user=user, query=search, search_type=SearchTypeEnum.PRODUCT.value
@@ -232,24 +242,59 @@ def build_albums_filter_conditions(
 
 
 
-def get_product_ids_with_hashtags(hashtags: List[str]) -> List[int]:
+def normalize_hashtag(hashtag: str) -> str:
+    """Normalize a hashtag for the hashtag index, e.g. "#SummerDress" -> "summerdress"."""
+    return hashtag.strip().lstrip("#").lower()[:100]
+
+
+def get_product_ids_with_hashtags(hashtags: List[str], match_all: bool = False):
     """
-    Retrieves product IDs where all specified hashtags exist (case-insensitive).
+    Retrieves product IDs tagged with any (or, with `match_all`, every) of the
+    specified hashtags, case-insensitively, from the hashtag index.
 
     Args:
         hashtags (list of str): List of hashtags to filter products by.
+        match_all (bool): Whether products must have all of the hashtags.
 
     Returns:
-        list: IDs of products that partially match all specified hashtags.
+        QuerySet: IDs of matching products, to be used as a subquery.
     """
-    filters = Q()
+    tags = {normalize_hashtag(hashtag) for hashtag in hashtags} - {""}
 
-    for hashtag in hashtags:
-        filters |= Q(hashtags__icontains=hashtag)
+    postings = ProductHashtag.objects.filter(tag__in=tags).values("product_id")
+    if match_all:
+        postings = postings.annotate(tag_count=Count("tag")).filter(
+            tag_count=len(tags)
+        )
 
-    products_id = Product.objects.filter(filters).values_list("id", flat=True)
+    return postings.values("product_id")
 
-    return products_id
+
+def normalize_color(color: str) -> str:
+    """Normalize a color for the color index, e.g. " Navy Blue " -> "navy blue"."""
+    return " ".join(color.split()).lower()[:50]
+
+
+def get_product_ids_with_colors(colors: List[str]):
+    """
+    Retrieves product IDs that have every one of the specified colors,
+    case-insensitively, from the color index.
+
+    Args:
+        colors (list of str): List of colors to filter products by.
+
+    Returns:
+        QuerySet: IDs of matching products, to be used as a subquery.
+    """
+    colors = {normalize_color(color) for color in colors} - {""}
+
+    return (
+        ProductColor.objects.filter(color__in=colors)
+        .values("product_id")
+        .annotate(color_count=Count("color"))
+        .filter(color_count=len(colors))
+        .values("product_id")
+    )
 
 
 def build_order_filter_conditions(user: User, filters: dict) -> Q:
@@ -440,17 +485,11 @@ def get_cold_start_brands(user_id: int) -> Dict[str, Optional[List[int]]]:
     if not isinstance(user_id, int) or user_id <= 0:
         raise ValidationError("user_id must be a positive integer")
 
+    # The ranking is shared by every user and served from process memory
+    from utils.product_utils.brand_popularity_service import BrandPopularityService
+
     try:
-        # Construct the query, filter out NULL brand_ids, and execute asynchronously
-        query = (
-            Product.objects.filter(status=StatusChoices.ACTIVE, brand_id__isnull=False)
-            .order_by("-likes")
-            .values("brand_id")
-            .distinct()[:20]
-        )
-        # Materialize the QuerySet asynchronously
-        rows = query
-        brand_ids = [row["brand_id"] for row in rows]
+        brand_ids = BrandPopularityService.get_top_brand_ids()
         return {"user_id": user_id, "brand_ids": brand_ids}
     except Exception:
         return {"user_id": user_id, "brand_ids": []}